@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Benchmark of CSV export for site-level methods: the streaming writer used by `Extractor.extract_csv()` against the previous implementation, which built the full CSV by string concatenation.
+    Both time (best of several repeats) and peak Python memory during the export are reported.
+    Uses the bundled SLAC JSON, and synthetic versions of it with the site table replicated over more sites and partitions.
+
+    Usage (from the repository root):
+        python benchmarks/csv_export.py [--scales 1 10 100 1000] [--repeats 3]
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import tracemalloc
+import argparse
+from copy import deepcopy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from phyphy import Extractor
+
+SLAC_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "test_data", "SLAC.json")
+
+
+
+def legacy_sitemethod_csv(extractor, csv, delim = ","):
+    """
+        The previous CSV writer for site-level methods, kept here for comparison.
+    """
+    header, raw_content = extractor._obtain_site_block("AVERAGED")
+    final_header = "site" + delim + delim.join( header )
+    if extractor.npartitions > 1:
+        final_header = "partition" + delim + final_header
+
+    site_count = 1
+    final_content = ""
+    for i in range(extractor.npartitions):
+        for row in raw_content[str(i)]:
+            outrow = str(site_count) + delim + delim.join(str(x) for x in row)
+            if extractor.npartitions > 1:
+                outrow = "\n" + str(i) + delim + outrow
+            else:
+                outrow = "\n" + outrow
+            final_content += outrow
+            site_count += 1
+
+    with open(csv, "w") as f:
+        f.write(final_header + final_content)
+
+
+
+def scaled_slac(scale, outdir):
+    """
+        Write a synthetic SLAC JSON with the site table replicated `scale` times per partition, over min(scale, 4) partitions.
+    """
+    with open(SLAC_JSON, "r") as f:
+        content = json.load(f)
+    npartitions = min(scale, 4)
+    reps = max(1, scale // npartitions)
+
+    content["input"]["partition count"] = npartitions
+    content["input"]["trees"] = dict( (str(i), content["input"]["trees"]["0"]) for i in range(npartitions) )
+    content["branch attributes"] = dict( [(str(i), content["branch attributes"]["0"]) for i in range(npartitions)] + [("attributes", content["branch attributes"]["attributes"])] )
+    partition = deepcopy(content["MLE"]["content"]["0"])
+    for table in partition["by-site"].values():
+        table *= reps
+    content["MLE"]["content"] = dict( (str(i), partition) for i in range(npartitions) )
+
+    path = os.path.join(outdir, "SLAC_x" + str(scale) + ".json")
+    with open(path, "w") as f:
+        json.dump(content, f)
+    return path
+
+
+
+def best_time(function, repeats):
+    times = []
+    for r in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+
+def peak_memory(function):
+    """
+        Return the peak memory (in MB) allocated by Python while running `function`.
+    """
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark CSV export of site-level HyPhy results.")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1, 10, 100, 1000], help = "Replication factors of the SLAC site table (1 is the bundled file).")
+    parser.add_argument("--repeats", type = int, default = 3, help = "Repeats per measurement; the best time is reported.")
+    args = parser.parse_args()
+
+    outdir = tempfile.mkdtemp()
+    csv = os.path.join(outdir, "out.csv")
+    print("{:>8} {:>10} {:>12} {:>12} {:>12} {:>9} {:>12} {:>12}".format("scale", "sites", "legacy (s)", "stream (s)", "gzip (s)", "speedup", "legacy (MB)", "stream (MB)"))
+    for scale in args.scales:
+        path = SLAC_JSON if scale == 1 else scaled_slac(scale, outdir)
+        e = Extractor(path)
+        nsites = sum(len(e.json["MLE"]["content"][str(i)]["by-site"]["AVERAGED"]) for i in range(e.npartitions))
+        legacy = best_time(lambda: legacy_sitemethod_csv(e, csv), args.repeats)
+        stream = best_time(lambda: e.extract_csv(csv), args.repeats)
+        gz = best_time(lambda: e.extract_csv(csv + ".gz"), args.repeats)
+        legacy_mem = peak_memory(lambda: legacy_sitemethod_csv(e, csv))
+        stream_mem = peak_memory(lambda: e.extract_csv(csv))
+        print("{:>8} {:>10} {:>12.4f} {:>12.4f} {:>12.4f} {:>8.2f}x {:>12.1f} {:>12.1f}".format(scale, nsites, legacy, stream, gz, legacy / stream, legacy_mem, stream_mem))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Benchmark of import times: `import phyphy` only sets up lazy names, and `from phyphy import Extractor` imports the Extractor's modules but no optional dependencies (pandas, pyarrow, ete3, sqlite3, multiprocessing).
+    Each statement is timed in a fresh interpreter, and the best of several repeats is reported along with the number of modules it imported.
+
+    Usage (from the repository root):
+        python benchmarks/import_time.py [--repeats 5]
+"""
+
+import sys
+import os
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+STATEMENTS = ["import phyphy", "from phyphy import Extractor", "from phyphy import ExtractorCollection", "from phyphy import ResultsDatabase"]
+
+
+
+def time_import(statement):
+    """
+        Return the seconds taken by an import statement in a fresh interpreter, and the number of modules it added.
+    """
+    code = "import sys, time; before = len(sys.modules); start = time.perf_counter(); " + statement + "; print(time.perf_counter() - start); print(len(sys.modules) - before)"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd = ROOT, env = dict(os.environ, PYTHONPATH = ROOT)).decode().split()
+    return float(output[0]), int(output[1])
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark phyphy import times.")
+    parser.add_argument("--repeats", type = int, default = 5, help = "Fresh interpreters per statement; the best time is reported.")
+    args = parser.parse_args()
+
+    print("{:<42} {:>10} {:>9}".format("statement", "time (ms)", "modules"))
+    for statement in STATEMENTS:
+        results = [time_import(statement) for r in range(args.repeats)]
+        seconds = min(x[0] for x in results)
+        print("{:<42} {:>10.1f} {:>9}".format(statement, 1000. * seconds, results[0][1]))
+
+
+
+if __name__ == "__main__":
+    main()
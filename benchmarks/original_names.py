@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Scaling benchmark of trees with original names, i.e. `Extractor.extract_model_tree(..., original_names = True)`, against the previous implementation, which searched the whole ete3 tree once per renamed node.
+    Uses synthetic FEL JSONs whose trees have the given number of tips, each with an original name that differs from its HyPhy name.
+    The previous implementation is quadratic in the number of nodes, so it is only timed up to `--legacy-max-tips`.
+
+    Usage (from the repository root):
+        python benchmarks/original_names.py [--tips 1000 10000 50000] [--legacy-max-tips 1000]
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import tempfile
+import argparse
+from copy import deepcopy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from phyphy import Extractor
+from tree_writer import random_newick
+
+FEL_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "test_data", "FEL.json")
+MODEL = "Global MG94xREV"
+
+
+
+def legacy_original_names_tree(extractor, model):
+    """
+        The previous way of writing a model tree with original names, kept here for comparison.
+    """
+    t = deepcopy(extractor.input_tree_ete[0])
+    attributes = extractor.branch_attributes[0]
+    for node in t.traverse("postorder"):
+        if not node.is_root():
+            node.dist = attributes[node.name][model]
+    for name in extractor.original_names:
+        itsme = t.search_nodes(name = name)[0]
+        itsme.name = extractor.original_names[name]
+    return t.write(format = 1).strip()
+
+
+
+def synthetic_fel(ntips, outdir):
+    """
+        Write a synthetic FEL JSON whose tree has `ntips` tips. Tips t<i> have the original name "taxon.<i>", and model branch lengths are random.
+    """
+    with open(FEL_JSON, "r") as f:
+        content = json.load(f)
+    newick = random_newick(ntips)
+    content["input"]["trees"] = {"0": newick.rstrip(";")}
+    content["input"]["number of sequences"] = ntips
+
+    rng = random.Random(3)
+    attributes = {}
+    for token in newick.replace("(", ",").replace(")", ",").split(","):
+        name = token.split(":")[0].strip(";")
+        if not name:
+            continue
+        attributes[name] = {"Nucleotide GTR": rng.random(), MODEL: rng.random()}
+        if name.startswith("t"):
+            attributes[name]["original name"] = "taxon." + name[1:]
+    content["branch attributes"]["0"] = attributes
+    content["tested"] = {"0": dict( (name, "test") for name in attributes )}
+
+    path = os.path.join(outdir, "FEL_" + str(ntips) + ".json")
+    with open(path, "w") as f:
+        json.dump(content, f)
+    return path
+
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark writing trees with original names.")
+    parser.add_argument("--tips", type = int, nargs = "+", default = [1000, 10000, 50000], help = "Numbers of tips of the synthetic trees.")
+    parser.add_argument("--legacy-max-tips", type = int, default = 1000, help = "Largest tree for which the previous implementation is timed.")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000) ## ete3 copies trees recursively
+    outdir = tempfile.mkdtemp()
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}".format("tips", "legacy (s)", "first (s)", "repeat (s)", "speedup"))
+    for ntips in args.tips:
+        e = Extractor(synthetic_fel(ntips, outdir))
+        e.input_tree_ete ## parse the tree up front, as both implementations share it
+
+        tree, first = timed(lambda: e.extract_model_tree(MODEL, original_names = True))
+        tree, repeat = timed(lambda: e.extract_model_tree(MODEL, original_names = True))
+        assert("taxon.1:" in tree), "Original names were not applied"
+        if ntips <= args.legacy_max_tips:
+            legacy_tree, legacy = timed(lambda: legacy_original_names_tree(e, MODEL))
+            assert(legacy_tree == tree), "Implementations disagree"
+            print("{:>8} {:>12.4f} {:>12.4f} {:>12.4f} {:>11.0f}x".format(ntips, legacy, first, repeat, legacy / first))
+        else:
+            print("{:>8} {:>12} {:>12.4f} {:>12.4f} {:>12}".format(ntips, "-", first, repeat, "-"))
+
+
+
+if __name__ == "__main__":
+    main()
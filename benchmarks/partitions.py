@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Benchmark of per-partition tree parsing and writing for analyses with many partitions, serially and with thread or process pools (see the `workers` and `pool` arguments of `Extractor`).
+    Uses synthetic FEL JSONs with the given number of partitions, each with its own random tree; `--shared` partitions reuse the first tree, which is then parsed only once.
+    Repeated queries are also timed with the Extractor's persistent worker pool, and with a pool started and shut down for every call (by calling `.close()` after each), which is how pools were previously used.
+
+    Usage (from the repository root):
+        python benchmarks/partitions.py [--partitions 200] [--tips 500] [--shared 0] [--workers 4] [--repeats 20]
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from phyphy import Extractor
+from tree_writer import random_newick
+
+FEL_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "test_data", "FEL.json")
+MODEL = "Global MG94xREV"
+
+
+
+def synthetic_fel(npartitions, ntips, nshared, outdir):
+    """
+        Write a synthetic FEL JSON with `npartitions` partitions of random trees with `ntips` tips; the first `nshared` + 1 partitions have the same tree.
+    """
+    with open(FEL_JSON, "r") as f:
+        content = json.load(f)
+    rng = random.Random(5)
+    trees = {}
+    attributes = {}
+    for i in range(npartitions):
+        newick = random_newick(ntips, seed = 0 if i <= nshared else i)
+        trees[str(i)] = newick.rstrip(";")
+        names = [token.split(":")[0] for token in newick.replace("(", ",").replace(")", ",").split(",")]
+        attributes[str(i)] = dict( (name, {"Nucleotide GTR": rng.random(), MODEL: rng.random(), "original name": name}) for name in names if name and name != ";" )
+    attributes["attributes"] = content["branch attributes"]["attributes"]
+    content["input"]["trees"] = trees
+    content["input"]["partition count"] = npartitions
+    content["branch attributes"] = attributes
+    content["tested"] = dict( (str(i), dict((name, "test") for name in attributes[str(i)])) for i in range(npartitions) )
+    content["MLE"]["content"] = dict( (str(i), content["MLE"]["content"]["0"]) for i in range(npartitions) )
+
+    path = os.path.join(outdir, "FEL_" + str(npartitions) + "x" + str(ntips) + ".json")
+    with open(path, "w") as f:
+        json.dump(content, f)
+    return path
+
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark per-partition tree processing.")
+    parser.add_argument("--partitions", type = int, default = 200, help = "Number of partitions.")
+    parser.add_argument("--tips", type = int, default = 500, help = "Number of tips per tree.")
+    parser.add_argument("--shared", type = int, default = 0, help = "Number of additional partitions which share the first partition's tree.")
+    parser.add_argument("--workers", type = int, default = 4, help = "Number of threads or processes.")
+    parser.add_argument("--repeats", type = int, default = 20, help = "Number of repeated queries for the pool comparison.")
+    args = parser.parse_args()
+
+    path = synthetic_fel(args.partitions, args.tips, args.shared, tempfile.mkdtemp())
+    print("{} partitions of {} tips ({} distinct trees), {} workers".format(args.partitions, args.tips, args.partitions - args.shared, args.workers))
+    print("{:>10} {:>12} {:>12} {:>14}".format("mode", "parse (s)", "map (s)", "features (s)"))
+    reference = None
+    for label, workers, pool in [("serial", 1, "thread"), ("thread", args.workers, "thread"), ("process", args.workers, "process")]:
+        e = Extractor(path, workers = workers, pool = pool)
+        index, parse = timed(lambda: e.extract_node_index())
+        mapped, mapping = timed(lambda: e.map_branch_attribute(MODEL))
+        features, feature = timed(lambda: e.extract_feature_tree(["Nucleotide GTR", MODEL], update_branch_lengths = MODEL))
+        if reference is None:
+            reference = (mapped, features)
+        assert(reference == (mapped, features)), "Modes disagree"
+        print("{:>10} {:>12.4f} {:>12.4f} {:>14.4f}".format(label, parse, mapping, feature))
+        e.close()
+
+    print("\n{} repeated queries".format(args.repeats))
+    print("{:>10} {:>18} {:>18} {:>9}".format("mode", "pool per call (s)", "persistent (s)", "speedup"))
+    for pool in ("thread", "process"):
+        with Extractor(path, workers = args.workers, pool = pool) as e:
+            e.extract_node_index()
+            def per_call():
+                for r in range(args.repeats):
+                    e.extract_model_tree(MODEL, partition = None)
+                    e.close()
+            def persistent():
+                for r in range(args.repeats):
+                    e.extract_model_tree(MODEL, partition = None)
+            ignored, closing = timed(per_call)
+            ignored, reusing = timed(persistent)
+        print("{:>10} {:>18.4f} {:>18.4f} {:>8.1f}x".format(pool, closing, reusing, closing / reusing))
+
+
+
+if __name__ == "__main__":
+    main()
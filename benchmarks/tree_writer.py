@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Benchmark of newick/NHX output: the template writer used by `NodeIndex.write()` against ete3's `write(format = 1, features = ...)` on a copy of the tree, which is how mapped and feature trees were previously produced.
+    Each writer maps new branch lengths and one feature onto synthetic random trees; outputs are checked to be identical before timing.
+
+    Usage (from the repository root):
+        python benchmarks/tree_writer.py [--tips 100 1000 10000] [--repeats 5]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from copy import deepcopy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ete3 import Tree
+from phyphy import NodeIndex
+
+
+
+def random_newick(ntips, seed = 1):
+    """
+        Return a random rooted newick tree with `ntips` tips (named t1, t2, ...), internal nodes named as HyPhy does (Node1, Node2, ...), and random branch lengths.
+    """
+    rng = random.Random(seed)
+    counter = [0]
+    def clade(tips):
+        if len(tips) == 1:
+            return tips[0] + ":%0.6g" % rng.expovariate(10.)
+        split = rng.randint(1, len(tips) - 1)
+        counter[0] += 1
+        name = "Node" + str(counter[0])
+        return "(" + clade(tips[:split]) + "," + clade(tips[split:]) + ")" + name + ":%0.6g" % rng.expovariate(10.)
+    tips = ["t" + str(i+1) for i in range(ntips)]
+    return "(" + clade(tips[:ntips//2]) + "," + clade(tips[ntips//2:]) + ");"
+
+
+
+def ete_write(etree, lengths, values):
+    t = deepcopy(etree)
+    for node, length, value in zip(t.traverse("postorder"), lengths, values):
+        if not node.is_root():
+            node.dist = length
+            node.add_feature("Selected", value)
+    return t.write(format = 1, features = ["Selected"])
+
+
+
+def best_time(function, repeats):
+    times = []
+    for r in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark newick/NHX tree output.")
+    parser.add_argument("--tips", type = int, nargs = "+", default = [100, 1000, 10000], help = "Numbers of tips of the synthetic trees.")
+    parser.add_argument("--repeats", type = int, default = 5, help = "Repeats per measurement; the best time is reported.")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000) ## ete3 copies trees recursively
+    print("{:>8} {:>12} {:>14} {:>9}".format("tips", "ete3 (s)", "template (s)", "speedup"))
+    for ntips in args.tips:
+        etree = Tree(random_newick(ntips), format = 1)
+        index = NodeIndex.from_ete(etree)
+        rng = random.Random(2)
+        lengths = [rng.random() for i in range(len(index))]
+        values = [str(rng.randint(0, 1)) for i in range(len(index))]
+
+        assert(ete_write(etree, lengths, values) == index.write(lengths = lengths, features = [("Selected", values)])), "Writers disagree"
+        ete = best_time(lambda: ete_write(etree, lengths, values), args.repeats)
+        template = best_time(lambda: index.write(lengths = lengths, features = [("Selected", values)]), args.repeats)
+        print("{:>8} {:>12.4f} {:>14.4f} {:>8.1f}x".format(ntips, ete, template, ete / template))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,8 @@ setup(name = 'phyphy',
     package_dir = {'phyphy':'src'},
     packages = ['phyphy'],
     package_data = {'tests': ['test_jsons/*']},
-    install_requires=['ete3>=3.1'],
+    install_requires=['numpy>=1.9'],
+    extras_require = {'ete3': ['ete3>=3.1'], 'pandas': ['pandas'], 'zstd': ['zstandard'], 'arrow': ['pyarrow']},
+    entry_points = {'console_scripts': ['phyphy-export = phyphy.bulk:main']},
     test_suite = "tests"
 )
@@ -11,13 +11,67 @@ The package consists of the following Python modules:
 
 * extractor.py
 
+* attributes.py
+
+* tree.py
+
+* writers.py
+
+* stats.py
+
+* collection.py
+
+* bulk.py
+
+* database.py
+
+* runtime.py
+
 
 
 """
 __version__ = '0.4.3'
-from .hyphy import *
-from .analysis import *
-from .extractor import *
 
+import sys
+import importlib
+
+### The public names of `phyphy`, and the module which defines each. Modules are imported only when one of their names is first used,
+### so that `import phyphy` (e.g. in a worker process or console command) does not pay for modules or dependencies it never uses.
+_PUBLIC_NAMES = {"HyPhy": "hyphy",
+                 "Analysis": "analysis", "FEL": "analysis", "FUBAR": "analysis", "MEME": "analysis", "SLAC": "analysis", "ABSREL": "analysis", "BUSTED": "analysis", "RELAX": "analysis", "LEISR": "analysis",
+                 "JSONFields": "extractor", "AnalysisNames": "extractor", "Genetics": "extractor", "Extractor": "extractor",
+                 "BranchAttributeColumns": "attributes",
+                 "NodeIndex": "tree",
+                 "infer_compression": "writers", "open_output": "writers", "write_delimited": "writers",
+                 "adjust_pvalues": "stats", "chi2_sf": "stats", "lrt_pvalues": "stats", "delta_aicc": "stats", "akaike_weights": "stats", "site_lrt": "stats", "evidence_ratios": "stats",
+                 "ExtractorCollection": "collection",
+                 "find_jsons": "bulk", "bulk_export": "bulk",
+                 "file_hash": "database", "ResultsDatabase": "database",
+                 "RuntimeModel": "runtime"}
+_MODULES = ("hyphy", "analysis", "extractor", "attributes", "tree", "writers", "stats", "collection", "bulk", "database", "runtime")
+
+__all__ = list(_PUBLIC_NAMES.keys()) + list(_MODULES)
+
+
+def __getattr__(name):
+    """
+        Import the module defining a public name on first use (PEP 562).
+    """
+    if name in _PUBLIC_NAMES:
+        value = getattr(importlib.import_module("." + _PUBLIC_NAMES[name], __name__), name)
+    elif name in _MODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError("module 'phyphy' has no attribute '" + name + "'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted( set(globals().keys()) | set(__all__) )
 
 
+### Module-level __getattr__ requires python >= 3.7, so earlier versions import everything up front
+if sys.version_info < (3, 7):
+    for _name in __all__:
+        __getattr__(_name)
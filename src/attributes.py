@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Columnar, typed storage of HyPhy branch attributes.
+"""
+
+import sys
+import numbers
+import numpy as np
+from collections import OrderedDict
+
+if __name__ == "__main__":
+    print("\nThis is the Attributes module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+_FLOAT64_EXACT = 2**53 ### Every integer up to this magnitude is exactly a float64
+_PACKED_MIN_SIZE = 32
+
+
+
+def _packed(value):
+    """
+        Return a parsed JSON value with its large homogeneous lists stored as NumPy arrays, for compact pickling. The value is recovered exactly by :code:`_unpacked()`.
+        Dictionaries keep their keys and order, lists which cannot be stored as arrays are packed item by item, and anything else is left as is. Parsed JSON never holds arrays or tuples, so these mark packed lists unambiguously.
+    """
+    if isinstance(value, dict):
+        return dict( (key, _packed(x)) for key, x in value.items() )
+    if not isinstance(value, list):
+        return value
+    array = _packed_array(value)
+    if array is None:
+        return [_packed(x) for x in value]
+    ### Pickled arrays carry a fixed overhead, so short lists are smaller as they are
+    size = array[0].size if isinstance(array, tuple) else array.size
+    if size < _PACKED_MIN_SIZE:
+        return value
+    if isinstance(array, tuple):
+        ### Integers are kept apart from the floats, in the smallest array which holds them
+        values, integral = array
+        return (integral, values[~integral], _integer_array(values[integral]))
+    return array
+
+
+
+def _packed_array(value):
+    """
+        Return a list as an array, or None if it cannot be stored as one.
+            + Lists of integers become the smallest integer array which holds them, lists of floats become float64 arrays, and lists of ASCII strings become bytes arrays
+            + Lists of integers and floats become a tuple of a float64 array and a boolean array marking the integers (which :code:`_packed()` then splits)
+            + Lists of lists which become arrays of the same kind and shape are stacked into a single array (or tuple)
+    """
+    if not isinstance(value, list) or len(value) == 0:
+        return None
+    kinds = set(map(type, value))
+    if kinds == {int}:
+        return _integer_array(value)
+    if kinds == {float}:
+        return np.array(value, dtype = np.float64)
+    if kinds == {int, float}:
+        if any(type(x) is int and abs(x) > _FLOAT64_EXACT for x in value):
+            return None
+        return (np.array(value, dtype = np.float64), np.array([type(x) is int for x in value], dtype = bool))
+    if kinds == {str}:
+        try:
+            strings = np.array(value, dtype = bytes)
+        except UnicodeEncodeError:
+            return None
+        ### Bytes arrays drop trailing NULs, which would shorten the strings
+        return strings if np.char.str_len(strings).sum() == sum(map(len, value)) else None
+    if kinds == {list}:
+        items = [_packed_array(x) for x in value]
+        first = items[0]
+        if isinstance(first, np.ndarray) and all(isinstance(x, np.ndarray) and x.dtype.kind == first.dtype.kind and x.shape == first.shape for x in items):
+            return np.stack(items)
+        ### Rows of integers, floats, or both are stacked together as floats with a mask of the integers
+        numeric = [_as_mixed(x) for x in items]
+        if all(x is not None and x[0].shape == numeric[0][0].shape for x in numeric):
+            return (np.stack([x[0] for x in numeric]), np.stack([x[1] for x in numeric]))
+    return None
+
+
+
+def _integer_array(values):
+    """
+        Return integers as the smallest integer array which holds them, or None if they do not fit in 64 bits.
+    """
+    low, high = (min(values), max(values)) if len(values) > 0 else (0, 0)
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.array(values, dtype = dtype)
+    return None
+
+
+
+def _as_mixed(array):
+    """
+        Return an array from :code:`_packed_array()` as a tuple of a float64 array and a boolean array marking the integers, or None if it is not numeric.
+    """
+    if isinstance(array, tuple):
+        return array
+    if isinstance(array, np.ndarray) and array.dtype.kind == "f":
+        return (array, np.zeros(array.shape, dtype = bool))
+    if isinstance(array, np.ndarray) and array.dtype.kind == "i" and np.all(np.abs(array) <= _FLOAT64_EXACT):
+        return (array.astype(np.float64), np.ones(array.shape, dtype = bool))
+    return None
+
+
+
+def _unpacked(value):
+    """
+        Return the parsed JSON value stored by :code:`_packed()`.
+    """
+    if isinstance(value, dict):
+        return dict( (key, _unpacked(x)) for key, x in value.items() )
+    if isinstance(value, list):
+        return [_unpacked(x) for x in value]
+    if isinstance(value, tuple):
+        integral, floats, integers = value
+        mixed = np.empty(integral.shape, dtype = object)
+        mixed[~integral] = floats
+        mixed[integral] = integers
+        return mixed.tolist()
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "S":
+            return value.astype(str).tolist()
+        return value.tolist()
+    return value
+
+
+
+class BranchAttributeColumns():
+    """
+        This class stores the branch attributes of a single partition column-wise: one typed NumPy array per attribute, aligned to a shared node order, plus an explicit boolean mask of missing values.
+
+        Attributes are typed as follows:
+            + All integer values: :code:`int64` array (missing entries are 0 and masked)
+            + All numeric values: :code:`float64` array (missing entries are NaN and masked). Which values were integers in the JSON (e.g. a branch length of 0) is kept in :code:`self.integral`, so that the JSON values can be recovered exactly.
+            + Anything else (e.g. node labels, rate distributions): :code:`object` array holding the values as found in the JSON (missing entries are None and masked)
+
+        Extractors serve their branch attribute lookups from this form, built once per partition when the JSON is loaded; the raw `{node: {attribute: value}}` dictionaries can be rebuilt with :code:`.to_dict()`.
+    """
+
+    def __init__(self, nodes, raw_attributes, attribute_names):
+        """
+            Initialize a BranchAttributeColumns instance. Generally this is created for you by an `Extractor`, see :code:`Extractor.extract_branch_columns()`.
+
+            Required arguments:
+                1. **nodes**, a list of node names, defining the row order of every column
+                2. **raw_attributes**, the raw `branch attributes` dictionary for this partition, as `{node: {attribute: value}}`
+                3. **attribute_names**, an iterable of the attribute names to store
+        """
+        self.nodes = [str(x) for x in nodes]
+        self.node_index = dict( (name, i) for i, name in enumerate(self.nodes) )
+        self.values = OrderedDict()
+        self.missing = OrderedDict()
+        self.integral = {}
+
+        for attr in attribute_names:
+            raw_column = []
+            for node in self.nodes:
+                try:
+                    raw_column.append( raw_attributes[node][attr] )
+                except KeyError:
+                    raw_column.append( None )
+            self.values[attr], self.missing[attr], integral = self._typed_column(raw_column)
+            if integral is not None:
+                self.integral[attr] = integral
+
+
+
+    def __getstate__(self):
+        """
+            Private method: Return the state for pickling, with the present values of object columns packed into arrays where possible. The node lookup is rebuilt when unpickled.
+        """
+        state = self.__dict__.copy()
+        del state["node_index"]
+        state["values"] = OrderedDict( (attr, values) for attr, values in self.values.items() if values.dtype != object )
+        state["packed"] = OrderedDict( (attr, _packed(values[~self.missing[attr]].tolist())) for attr, values in self.values.items() if values.dtype == object )
+        return state
+
+
+
+    def __setstate__(self, state):
+        """
+            Private method: Restore from pickled state.
+        """
+        packed = state.pop("packed")
+        self.__dict__.update(state)
+        self.node_index = dict( (name, i) for i, name in enumerate(self.nodes) )
+        for attr, present in packed.items():
+            values = np.empty(len(self.nodes), dtype = object)
+            for i, x in zip(np.flatnonzero(~self.missing[attr]), _unpacked(present)):
+                values[i] = x
+            self.values[attr] = values
+        ### Columns keep the attribute order found in the JSON
+        self.values = OrderedDict( (attr, self.values[attr]) for attr in self.missing )
+
+
+
+    def _typed_column(self, raw_column):
+        """
+            Private method: Convert a list of raw JSON values into a typed array, a missing mask, and (for float columns holding integers) a mask of the integer values.
+            Integers which an array cannot hold exactly are kept as objects.
+        """
+        missing = np.array([x is None for x in raw_column], dtype = bool)
+        present = [x for x in raw_column if x is not None]
+
+        all_numeric = len(present) > 0 and all(isinstance(x, numbers.Real) and not isinstance(x, bool) for x in present)
+        integers = [x for x in present if isinstance(x, numbers.Integral)]
+        if all_numeric and len(integers) == len(present) and all(_INT64_MIN <= x <= _INT64_MAX for x in integers):
+            return np.array([0 if x is None else x for x in raw_column], dtype = np.int64), missing, None
+        elif all_numeric and all(abs(x) <= _FLOAT64_EXACT for x in integers):
+            values = np.array([np.nan if x is None else x for x in raw_column], dtype = np.float64)
+            integral = None
+            if len(integers) > 0:
+                integral = np.array([isinstance(x, numbers.Integral) for x in raw_column], dtype = bool)
+            return values, missing, integral
+        else:
+            values = np.empty(len(raw_column), dtype = object)
+            values[:] = raw_column
+            return values, missing, None
+
+
+
+    def column(self, attribute_name):
+        """
+            Return a tuple of (values, missing) arrays for the given attribute, aligned to :code:`self.nodes`.
+
+            Required arguments:
+                1. **attribute_name**, the name of the attribute to obtain.
+        """
+        assert(attribute_name in self.values), "\n[ERROR]: Specified attribute does not exist in JSON."
+        return self.values[attribute_name], self.missing[attribute_name]
+
+
+
+    def as_list(self, attribute_name):
+        """
+            Return the values of an attribute as a list of Python values, exactly as found in the JSON, aligned to :code:`self.nodes`. Nodes without a value are given None.
+
+            Required arguments:
+                1. **attribute_name**, the name of the attribute to obtain.
+        """
+        values, missing = self.column(attribute_name)
+        values = values.tolist()
+        if attribute_name in self.integral:
+            values = [int(x) if whole else x for x, whole in zip(values, self.integral[attribute_name])]
+        return [None if absent else x for x, absent in zip(values, missing.tolist())]
+
+
+
+    def to_dict(self):
+        """
+            Return the branch attributes as the raw `{node: {attribute: value}}` dictionary found in the JSON. A new dictionary is built on every call.
+        """
+        rows = OrderedDict( (node, OrderedDict()) for node in self.nodes )
+        for attr in self.values:
+            for node, value in zip(self.nodes, self.as_list(attr)):
+                if value is not None:
+                    rows[node][attr] = value
+        return dict( (node, dict(row)) for node, row in rows.items() )
+
+
+
+    def select(self, nodes, attribute_names = None):
+        """
+            Return a new BranchAttributeColumns holding the given nodes (in the given order) and attributes. Nodes absent from these columns have every value missing.
+            Only the rows are copied, so object values (e.g. rate distributions) are shared with these columns.
+
+            Required arguments:
+                1. **nodes**, a list of node names, defining the row order of every column
+
+            Optional keyword arguments:
+                1. **attribute_names**, an iterable of the attribute names to keep. Default: all attributes.
+        """
+        if attribute_names is None:
+            attribute_names = list(self.values)
+        selected = BranchAttributeColumns([], {}, [])
+        selected.nodes = [str(x) for x in nodes]
+        selected.node_index = dict( (name, i) for i, name in enumerate(selected.nodes) )
+        rows = np.array([self.node_index.get(name, -1) for name in selected.nodes], dtype = np.int64)
+        absent = rows < 0
+        for attr in attribute_names:
+            if attr in self.values and len(self.nodes) > 0:
+                values = self.values[attr][np.where(absent, 0, rows)]
+                missing = self.missing[attr][np.where(absent, 0, rows)] | absent
+                if attr in self.integral:
+                    selected.integral[attr] = self.integral[attr][np.where(absent, 0, rows)] & ~missing
+            else:
+                values, missing = np.empty(len(rows), dtype = object), np.ones(len(rows), dtype = bool)
+            ### Missing entries are given the same fill values as when the columns are built
+            if values.dtype == np.int64:
+                values[missing] = 0
+            elif values.dtype == np.float64:
+                values[missing] = np.nan
+            else:
+                values[missing] = None
+            selected.values[attr], selected.missing[attr] = values, missing
+        return selected
+
+
+
+    def freeze(self):
+        """
+            Make every column and missing mask read-only, so that the columns are only ever read from afterwards (e.g. when shared by threads or forked workers). Returns the BranchAttributeColumns itself.
+        """
+        for attr in self.values:
+            self.values[attr].flags.writeable = False
+            self.missing[attr].flags.writeable = False
+        for attr in self.integral:
+            self.integral[attr].flags.writeable = False
+        return self
+
+
+
+    def view(self):
+        """
+            Return a new BranchAttributeColumns sharing these columns as read-only array views, so that callers can never modify the stored columns. Object values (e.g. rate distributions) are shared, not copied.
+        """
+        viewed = BranchAttributeColumns([], {}, [])
+        viewed.nodes = list(self.nodes)
+        viewed.node_index = dict(self.node_index)
+        for name, arrays in ((viewed.values, self.values), (viewed.missing, self.missing), (viewed.integral, self.integral)):
+            for attr, array in arrays.items():
+                name[attr] = array.view()
+                name[attr].flags.writeable = False
+        return viewed
+
+
+
+    def value(self, attribute_name, node):
+        """
+            Return the value of an attribute for a single node, or None if that node has no value.
+
+            Required arguments:
+                1. **attribute_name**, the name of the attribute to obtain.
+                2. **node**, the node name of interest.
+        """
+        values, missing = self.column(attribute_name)
+        i = self.node_index[node]
+        if missing[i]:
+            return None
+        return values[i]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Export a directory of HyPhy output JSONs to CSV in parallel, from Python or with the console command `phyphy-export`.
+"""
+
+import sys
+import os
+import csv
+import fnmatch
+import tempfile
+import time
+import argparse
+import multiprocessing
+from collections import OrderedDict
+
+if __name__ == "__main__":
+    print("\nThis is the Bulk module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+from .extractor import *
+from .writers import *
+
+
+
+def find_jsons(directory, pattern = "*.json", recursive = True):
+    """
+        Return a sorted list of the paths to all files in a directory which match the given pattern.
+
+        Required arguments:
+            1. **directory**, the directory to search
+
+        Optional keyword arguments:
+            1. **pattern**, a shell-style file name pattern. Default: "*.json".
+            2. **recursive**, Boolean to indicate whether subdirectories are also searched. Default: True.
+    """
+    assert(os.path.isdir(directory)), "\n[ERROR]: Directory does not exist."
+    found = []
+    for root, dirs, files in os.walk(directory):
+        found += [os.path.join(root, f) for f in files if fnmatch.fnmatch(f, pattern)]
+        if not recursive:
+            break
+    return sorted(found)
+
+
+
+def _export_one(job):
+    """
+        Private function: Export a single JSON, in a worker process.
+        Returns a tuple of (path, analysis, number of rows, error message, header, rows); the header and rows are only returned when no output file is given, i.e. for a combined table.
+    """
+    path, outfile, options = job
+    try:
+        extractor = Extractor(path)
+        table = extractor._csv_table(original_names = options["original_names"], slac_ancestral_type = options["slac_ancestral_type"])
+        if table is None:
+            return (path, extractor.analysis, 0, "Content from " + extractor.analysis + " is not convertable to CSV.", None, None)
+        header, rows = table
+        if outfile is None:
+            rows = list(rows)
+            return (path, extractor.analysis, len(rows), None, header, rows)
+
+        count = [0]
+        def counting(rows):
+            for row in rows:
+                count[0] += 1
+                yield row
+        directory = os.path.dirname(outfile)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        write_delimited(outfile, header, counting(rows), delim = options["delim"], compression = options["compression"])
+        return (path, extractor.analysis, count[0], None, None, None)
+    except Exception as error:
+        return (path, None, 0, str(error).strip(), None, None)
+
+
+
+def bulk_export(directory, outdir = None, combined = None, workers = None, pattern = "*.json", recursive = True, delim = ",", compression = "infer", extension = ".csv", original_names = True, slac_ancestral_type = "AVERAGED", verbose = False):
+    """
+        Export CSVs (see :code:`Extractor.extract_csv()`) for every HyPhy JSON in a directory, using a pool of worker processes. The analysis of each JSON is determined automatically, and JSONs which cannot be converted to CSV (e.g. BUSTED, or non-HyPhy JSON) are skipped and reported.
+        Exactly one of **outdir** or **combined** must be given.
+
+        Required arguments:
+            1. **directory**, the directory of JSON files to export
+
+        Optional keyword arguments:
+            1. **outdir**, a directory in which to write one CSV per JSON, mirroring the subdirectory structure of `directory`
+            2. **combined**, a file name (or file-like object) for a single table of all results, with an added first column :code:`source` giving each row's JSON path. Columns are the union of all exported columns, in order of first appearance, and are left empty where they do not apply (e.g. `node` for FEL rows). Rows are streamed to a temporary file as each JSON is exported, so only one JSON's rows are held in memory at a time, and are then copied to the output under the final header.
+            3. **workers**, the number of worker processes. Default: the number of CPUs. Use 1 to run in the current process.
+            4. **pattern**, a shell-style file name pattern for JSONs. Default: "*.json".
+            5. **recursive**, Boolean to indicate whether subdirectories are also searched. Default: True.
+            6. **delim**, A different (single-character) delimitor for the output. Default: ","
+            7. **compression**, Compression for output files, see :code:`Extractor.extract_csv()`. Default: "infer"
+            8. **extension**, The file extension for per-JSON CSVs written to `outdir`, e.g. ".csv.gz" for gzip output. Default: ".csv"
+            9. **original_names**, An **ABSREL** specific argument, see :code:`Extractor.extract_csv()`. Default: True
+            10. **slac_ancestral_type**, A **SLAC** specific argument, see :code:`Extractor.extract_csv()`. Default: "AVERAGED"
+            11. **verbose**, Boolean to indicate whether a line should be printed for each JSON. Default: False
+
+        Returns an ordered dictionary summarizing the export: :code:`files` (number of JSONs found), :code:`exported`, :code:`rows`, :code:`seconds`, :code:`files_per_second`, :code:`rows_per_second`, and :code:`skipped` (a list of (path, reason) tuples).
+
+        **Examples:**
+
+           >>> ### One CSV per JSON
+           >>> summary = bulk_export("results/", outdir = "csv/", workers = 8)
+           >>> summary["files_per_second"]
+           41.7
+
+           >>> ### A single table with a `source` column
+           >>> bulk_export("results/", combined = "all_results.csv.gz")
+    """
+    assert((outdir is None) != (combined is None)), "\n[ERROR]: Provide exactly one of `outdir` (one CSV per JSON) or `combined` (a single table)."
+    assert(len(delim) == 1), "\n[ERROR]: Argument `delim` must be a single character."
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    assert(int(workers) >= 1), "\n[ERROR]: Argument `workers` must be at least 1."
+    options = {"original_names": original_names, "slac_ancestral_type": slac_ancestral_type, "delim": delim, "compression": compression}
+
+    start = time.time()
+    paths = find_jsons(directory, pattern = pattern, recursive = recursive)
+    jobs = []
+    for path in paths:
+        outfile = None
+        if outdir is not None:
+            relative = os.path.splitext(os.path.relpath(path, directory))[0]
+            outfile = os.path.join(outdir, relative + extension)
+        jobs.append( (path, outfile, options) )
+
+    summary = OrderedDict([("files", len(paths)), ("exported", 0), ("rows", 0), ("seconds", 0.), ("files_per_second", 0.), ("rows_per_second", 0.), ("skipped", [])])
+    if combined is not None:
+        ### New columns are only ever appended to the union of columns, so each spooled row is aligned to a prefix of the final header
+        columns = []
+        spool = tempfile.TemporaryFile(mode = "w+", newline = "")
+        spooled = csv.writer(spool, delimiter = delim, lineterminator = "\n")
+
+    ### Results are consumed in input order, so a combined table is deterministic
+    if int(workers) == 1 or len(jobs) <= 1:
+        results = map(_export_one, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(int(workers))
+        results = pool.imap(_export_one, jobs)
+    try:
+        for path, analysis, nrows, error, header, rows in results:
+            if error is not None:
+                summary["skipped"].append( (path, error) )
+                if verbose:
+                    print("Skipped " + path + ": " + error)
+                continue
+            summary["exported"] += 1
+            summary["rows"] += nrows
+            if header is not None:
+                columns += [x for x in header if x not in columns]
+                positions = [header.index(x) if x in header else None for x in columns]
+                for row in rows:
+                    spooled.writerow( [path] + ["" if j is None else row[j] for j in positions] )
+            if verbose:
+                print("Exported " + path + " (" + analysis + ", " + str(nrows) + " rows)")
+        if combined is not None:
+            spool.seek(0)
+            width = len(columns) + 1
+            padded = (row + [""] * (width - len(row)) for row in csv.reader(spool, delimiter = delim))
+            write_delimited(combined, ["source"] + columns, padded, delim = delim, compression = compression)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if combined is not None:
+            spool.close()
+
+    summary["seconds"] = time.time() - start
+    if summary["seconds"] > 0:
+        summary["files_per_second"] = summary["exported"] / summary["seconds"]
+        summary["rows_per_second"] = summary["rows"] / summary["seconds"]
+    return summary
+
+
+
+def main(argv = None):
+    """
+        Entry point for the console command `phyphy-export`. Run :code:`phyphy-export --help` for usage.
+    """
+    parser = argparse.ArgumentParser(prog = "phyphy-export", description = "Export a directory of HyPhy JSON results (FEL, SLAC, MEME, FUBAR, LEISR, aBSREL) to CSV, in parallel.")
+    parser.add_argument("directory", help = "Directory of HyPhy JSON files.")
+    output = parser.add_mutually_exclusive_group(required = True)
+    output.add_argument("-o", "--outdir", help = "Write one CSV per JSON into this directory.")
+    output.add_argument("-c", "--combined", help = "Write a single table of all results, with a `source` column, to this file.")
+    parser.add_argument("-j", "--workers", type = int, default = None, help = "Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--pattern", default = "*.json", help = "File name pattern of JSONs (default: *.json).")
+    parser.add_argument("--no-recursive", action = "store_true", help = "Do not search subdirectories.")
+    parser.add_argument("--delim", default = ",", help = "Output delimiter (default: ,).")
+    parser.add_argument("--extension", default = ".csv", help = "Extension of per-JSON outputs, e.g. .csv.gz (default: .csv).")
+    parser.add_argument("--slac-ancestral-type", default = "AVERAGED", choices = ["AVERAGED", "RESOLVED"], help = "SLAC ancestral counting type (default: AVERAGED).")
+    parser.add_argument("--hyphy-names", action = "store_true", help = "Use HyPhy-reformatted node names for aBSREL.")
+    parser.add_argument("-v", "--verbose", action = "store_true", help = "Report each file.")
+    args = parser.parse_args(argv)
+
+    delim = "\t" if args.delim == "\\t" else args.delim
+    summary = bulk_export(args.directory, outdir = args.outdir, combined = args.combined, workers = args.workers, pattern = args.pattern, recursive = not args.no_recursive,
+                          delim = delim, extension = args.extension, original_names = not args.hyphy_names, slac_ancestral_type = args.slac_ancestral_type, verbose = args.verbose)
+
+    print("Exported " + str(summary["exported"]) + " of " + str(summary["files"]) + " JSON files (" + str(summary["rows"]) + " rows) in " + "%0.2f" % summary["seconds"] + " seconds: " + "%0.1f" % summary["files_per_second"] + " files/s, " + "%0.0f" % summary["rows_per_second"] + " rows/s.")
+    for path, reason in summary["skipped"]:
+        print("  Skipped " + path + ": " + reason.replace("\n", " ").strip())
+    return 0 if summary["exported"] > 0 or summary["files"] == 0 else 1
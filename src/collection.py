@@ -0,0 +1,576 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Vectorized parsing of many HyPhy output JSONs at once (e.g., one per gene).
+"""
+
+import sys
+import os
+import numpy as np
+from collections import OrderedDict
+
+if __name__ == "__main__":
+    print("\nThis is the Collection module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+from .extractor import *
+from .stats import *
+
+
+
+class ExtractorCollection():
+    """
+        This class holds many Extractors (e.g., one per gene) and concatenates their results into arrays, so that statistics can be computed across all of them in a single vectorized call.
+
+        Site-level results are aligned to **global site indices**: site tables of each Extractor are stacked in order, so that global index `i` belongs to gene :code:`gene_index()[i]`. The sites of gene `g` are :code:`site_offsets()[g]:site_offsets()[g+1]`.
+
+        JSON files are not held in memory: each is parsed when the collection is created, and parsed again (one at a time) only when a result needs it. Only the arrays gathered from them (e.g. site tables and model fits) are kept. JSON files which cannot be parsed are skipped, and listed in :code:`self.skipped`.
+    """
+
+    def __init__(self, sources, names = None):
+        """
+            Initialize an ExtractorCollection instance.
+
+            Required arguments:
+                1. **sources**, A list of JSON file names and/or Extractor objects (a single one is also accepted). JSON files which cannot be parsed (e.g. unsupported analyses) are skipped, see :code:`self.skipped`.
+
+            Optional keyword arguments:
+                1. **names**, A list of names (e.g. gene names) for each source. Default: the JSON file names, without directory or extension.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json", "/path/to/old.LEISR.json"])
+               >>> c.names
+               ['gene1.FEL', 'gene2.FEL']
+               >>> c.skipped
+               [('/path/to/old.LEISR.json', '[ERROR]: LEISR analysis to parse was produced with HyPhy 2.3.6, which is not supported. Please re-analyze with version >=2.3.7 to use with phyphy.')]
+        """
+        if isinstance(sources, (str, Extractor)):
+            sources = [sources]
+        sources = list(sources)
+        if names is None:
+            names = [os.path.splitext(os.path.basename(x.json_path if isinstance(x, Extractor) else x))[0] for x in sources]
+        else:
+            names = [str(x) for x in names]
+            assert(len(names) == len(sources)), "\n[ERROR]: Provide one name per source."
+
+        ### Each JSON is parsed once here, both to skip those which cannot be and to keep its (small) model fits, runtime, and site table, and is then released
+        self.sources = []
+        self.names = []
+        self.skipped = []
+        self._positions = [] ## of the kept sources, among those given
+        self._fits = []
+        self._runtimes = []
+        site_tables = []
+        for position, (source, name) in enumerate(zip(sources, names)):
+            try:
+                e = source if isinstance(source, Extractor) else Extractor(source)
+                fits = OrderedDict( (model, e.json[e.fields.model_fits][model]) for model in e.fitted_models )
+                runtime = (e.analysis, e.extract_number_sequences(), e.extract_number_sites(), np.mean([len(index) - 1 for index in e._obtain_node_index().values()]), e.extract_total_time())
+            except Exception as error:
+                self.skipped.append( (source, str(error).strip()) )
+                continue
+            try:
+                site_tables.append( e.extract_site_table() )
+            except AssertionError:
+                site_tables.append( None ) ## e.g. BUSTED, which has no site table
+            self.sources.append(source)
+            self.names.append(name)
+            self._positions.append(position)
+            self._fits.append(fits)
+            self._runtimes.append(runtime)
+        assert(len(self.sources) > 0), "\n[ERROR]: Provide at least one JSON file or Extractor which can be parsed."
+        self.ngenes = len(self.sources)
+        self._analyses = [x[0] for x in self._runtimes]
+
+        self._site_tables = {}
+        if all(x is not None for x in site_tables):
+            self._site_tables["AVERAGED"] = site_tables
+        self._model_fits = None
+        self._busted_sites = None
+
+
+
+    def __len__(self):
+        return self.ngenes
+
+
+
+    def __iter__(self):
+        """
+            Iterate over the Extractor of each gene, in order. JSON files are parsed again as they are reached, so that only one is held at a time (unless the caller keeps them).
+        """
+        for source in self.sources:
+            yield source if isinstance(source, Extractor) else Extractor(source)
+
+
+
+    @property
+    def extractors(self):
+        """
+            List of the Extractor of every gene. This parses every JSON file and holds them all at once, so iterate over the collection itself instead where possible.
+        """
+        return list(self)
+
+
+
+    def _obtain_site_tables(self, slac_ancestral_type = "AVERAGED"):
+        """
+            Private method: Return the full site table of each Extractor, as a list of ordered dictionaries of arrays. Default site tables are gathered when the collection is created, and others (e.g. SLAC's resolved tables) in a single pass over the JSON files. These are cached.
+        """
+        key = str(slac_ancestral_type).upper()
+        if key not in self._site_tables:
+            self._site_tables[key] = [e.extract_site_table(slac_ancestral_type = slac_ancestral_type) for e in self]
+        return self._site_tables[key]
+
+
+
+    def _site_column(self, column, slac_ancestral_type = "AVERAGED"):
+        """
+            Private method: Return a single site table column concatenated across all Extractors, in global site order.
+        """
+        tables = self._obtain_site_tables(slac_ancestral_type)
+        for table in tables:
+            assert(column in table), "\n[ERROR]: Site table column `" + str(column) + "` is not available for every Extractor."
+        return np.concatenate([table[column] for table in tables])
+
+
+
+    def site_offsets(self):
+        """
+            Return an int64 array of length `ngenes + 1` giving the boundaries of each gene in the global site order: gene `g` holds global sites :code:`offsets[g]:offsets[g+1]`.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json"])
+               >>> c.site_offsets()
+               array([  0, 187, 374])
+        """
+        counts = [len(table["site"]) for table in self._obtain_site_tables()]
+        return np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+
+
+    def gene_index(self):
+        """
+            Return an int64 array giving, for each global site, the position of its gene in :code:`self.names`.
+        """
+        offsets = self.site_offsets()
+        return np.repeat(np.arange(self.ngenes, dtype = np.int64), np.diff(offsets))
+
+
+
+    def extract_site_table(self, columns = None, slac_ancestral_type = "AVERAGED"):
+        """
+            Return the site tables of all Extractors stacked into one ordered dictionary of arrays, in global site order.
+            Columns are :code:`gene` (the position of the gene in :code:`self.names`), then :code:`partition` and :code:`site` (numbered within each gene), then the requested method-specific columns (see :code:`Extractor.extract_site_table()`).
+
+            Optional keyword arguments:
+                1. **columns**, a list of method-specific columns to include, which must exist for every Extractor. Default: all columns shared by every Extractor.
+                2. **slac_ancestral_type**, A **SLAC** specific argument, either "AVERAGED" (Default) or "RESOLVED".
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene1.MEME.json"])
+               >>> list(c.extract_site_table().keys())
+               ['gene', 'partition', 'site', 'alpha', 'LRT', 'p-value', 'Total_branch_length']
+        """
+        if columns is None:
+            headers = [list(table.keys())[2:] for table in self._obtain_site_tables(slac_ancestral_type)]
+            columns = [x for x in headers[0] if all(x in h for h in headers[1:])]
+        table = OrderedDict()
+        table["gene"] = self.gene_index()
+        for column in ["partition", "site"] + list(columns):
+            table[column] = self._site_column(column, slac_ancestral_type)
+        return table
+
+
+
+    def adjust_pvalues(self, column = "p-value", method = "BH", by_gene = False):
+        """
+            Return multiple-testing corrected P-values for every site of every Extractor, aligned to global site indices. See :code:`stats.adjust_pvalues()` for details.
+
+            Optional keyword arguments:
+                1. **column**, The site table column holding P-values. Default: "p-value" (FEL and MEME).
+                2. **method**, The correction to apply, one of "BH" (Default), "Holm", or "Bonferroni".
+                3. **by_gene**, Boolean to indicate whether each gene is corrected separately (True), or all sites together as one family (False). Default: False.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json"])
+               >>> q = c.adjust_pvalues()
+               >>> top = np.argsort(q)[:10] ## Global indices of the 10 strongest sites
+               >>> c.gene_index()[top], c.extract_site_table(columns = [])["site"][top]
+        """
+        groups = self.gene_index() if by_gene else None
+        return adjust_pvalues(self._site_column(column), method = method, groups = groups)
+
+
+
+    def fubar_selected(self, threshold = 0.9, column = "Prob[alpha<beta]"):
+        """
+            Return a boolean array, aligned to global site indices, of FUBAR sites whose posterior probability meets the given threshold.
+
+            Optional keyword arguments:
+                1. **threshold**, The posterior probability threshold. Default: 0.9.
+                2. **column**, The site table column holding posterior probabilities. Default: "Prob[alpha<beta]" (positive selection). Use "Prob[alpha>beta]" for purifying selection.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FUBAR.json", "/path/to/gene2.FUBAR.json"])
+               >>> c.count_per_gene( c.fubar_selected(threshold = 0.95) )
+               array([2, 0])
+        """
+        assert(0. <= threshold <= 1.), "\n[ERROR]: Argument `threshold` must be a probability."
+        return self._site_column(column) >= threshold
+
+
+
+    def count_per_gene(self, mask):
+        """
+            Return an int64 array with the number of sites in each gene for which `mask` is True.
+
+            Required arguments:
+                1. **mask**, a boolean array aligned to global site indices, e.g. :code:`c.adjust_pvalues() <= 0.05`
+        """
+        mask = np.asarray(mask, dtype = bool)
+        assert(len(mask) == self.site_offsets()[-1]), "\n[ERROR]: Argument `mask` must be aligned to global site indices."
+        return np.bincount(self.gene_index()[mask], minlength = self.ngenes).astype(np.int64)
+
+
+
+    def summarize_sites(self, column = "p-value", alpha = 0.05, method = "BH", by_gene = False):
+        """
+            Return per-gene counts of significant sites, as an ordered dictionary of arrays with columns :code:`gene` (names), :code:`sites`, :code:`tested` (sites with a P-value), and :code:`significant` (corrected P-value at most `alpha`).
+
+            Optional keyword arguments:
+                1. **column**, The site table column holding P-values. Default: "p-value".
+                2. **alpha**, The significance threshold applied to corrected P-values. Default: 0.05.
+                3. **method**, The correction to apply, one of "BH" (Default), "Holm", or "Bonferroni".
+                4. **by_gene**, Boolean to indicate whether each gene is corrected separately. Default: False.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json"])
+               >>> c.summarize_sites(alpha = 0.1)
+               OrderedDict([('gene', array(['gene1.FEL', 'gene2.FEL'], dtype=object)), ('sites', array([187, 187])), ('tested', array([187, 187])), ('significant', array([3, 1]))])
+        """
+        adjusted = self.adjust_pvalues(column = column, method = method, by_gene = by_gene)
+        summary = OrderedDict()
+        summary["gene"] = np.array(self.names, dtype = object)
+        summary["sites"] = np.diff(self.site_offsets())
+        summary["tested"] = self.count_per_gene(~np.isnan(adjusted))
+        summary["significant"] = self.count_per_gene(adjusted <= alpha)
+        return summary
+
+
+
+    def _obtain_model_fits(self):
+        """
+            Private method: Return the log likelihoods, AICc values, and numbers of estimated parameters of every fitted model in every Extractor, as float64 arrays (genes x models, NaN for models a gene does not have) and the list of models, in order of first appearance. These are built from the `fits` fields kept when the collection was created, and cached.
+        """
+        if self._model_fits is None:
+            models = []
+            columns = {}
+            for fits in self._fits:
+                for model in fits:
+                    if model not in columns:
+                        columns[model] = len(models)
+                        models.append(model)
+            json_fields = JSONFields()
+            fields = (json_fields.log_likelihood, json_fields.aicc, json_fields.estimated_parameters)
+            values = np.full((len(fields), self.ngenes, len(models)), np.nan)
+            for g, fits in enumerate(self._fits):
+                for model in fits:
+                    for f, field in enumerate(fields):
+                        if field in fits[model]:
+                            values[f, g, columns[model]] = float(fits[model][field])
+            self._model_fits = (models, values)
+        return self._model_fits
+
+
+
+    def _model_columns(self, models):
+        """
+            Private method: Return the list of models and their column positions in the model fit arrays, checking that each model was fitted by at least one Extractor.
+        """
+        all_models = self._obtain_model_fits()[0]
+        if models is None:
+            models = list(all_models)
+        elif isinstance(models, str):
+            models = [models]
+        for model in models:
+            assert(model in all_models), "\n[ERROR]: Model " + str(model) + " was not fitted by any Extractor."
+        return list(models), [all_models.index(model) for model in models]
+
+
+
+    def extract_model_fits(self, models = None):
+        """
+            Return the model fits of all Extractors as an ordered dictionary of arrays aligned by gene (rows) and model (columns), with keys :code:`gene` (names), :code:`models`, and the float64 arrays :code:`logL`, :code:`AICc`, and :code:`parameters` (number of estimated parameters), each of shape (genes, models). Entries for models which a gene does not have are NaN.
+            This reads the `fits` field of each JSON directly, as kept when the collection was created, rather than calling :code:`Extractor.extract_model_logl()` and friends for each gene and model.
+
+            Optional keyword arguments:
+                1. **models**, a list of model names (columns). Default: every model fitted by any Extractor, in order of first appearance.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json"])
+               >>> fits = c.extract_model_fits()
+               >>> fits["models"]
+               ['Nucleotide GTR', 'Global MG94xREV']
+               >>> fits["logL"][:, 1] ## Global MG94xREV log likelihood of each gene
+               array([-3466.77493494, -3472.01935113])
+        """
+        models, columns = self._model_columns(models)
+        values = self._obtain_model_fits()[1][:, :, columns]
+        fits = OrderedDict()
+        fits["gene"] = np.array(self.names, dtype = object)
+        fits["models"] = models
+        fits["logL"] = values[0]
+        fits["AICc"] = values[1]
+        fits["parameters"] = values[2]
+        return fits
+
+
+
+    def compare_models(self, null, alternative, df = None):
+        """
+            Perform a likelihood ratio test of two nested models for every Extractor at once, returning an ordered dictionary of arrays aligned by gene with keys :code:`gene` (names), :code:`LRT` (the test statistic, :code:`2 * (logL alternative - logL null)`, with negative values set to 0), :code:`df`, and :code:`p-value` (chi-squared; see :code:`stats.lrt_pvalues()`). Genes which lack either model have NaN entries.
+
+            Required arguments:
+                1. **null**, the name of the null model
+                2. **alternative**, the name of the alternative model
+
+            Optional keyword arguments:
+                1. **df**, the degrees of freedom of the test, either an integer or an array aligned by gene. Default: the difference in the models' numbers of estimated parameters for each gene, where genes for which this is not positive get NaN statistics and P-values. Note that some analyses use other conventions, e.g. BUSTED's P-value uses 2 degrees of freedom.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.RELAX.json", "/path/to/gene2.RELAX.json"])
+               >>> c.compare_models("RELAX null", "RELAX alternative")["p-value"]
+               array([0.00141972, 0.2764123 ])
+        """
+        fits = self.extract_model_fits([null, alternative])
+        if df is None:
+            df = fits["parameters"][:, 1] - fits["parameters"][:, 0]
+            ### Genes whose models are not nested (i.e. the alternative does not have more parameters) cannot be tested
+            df = np.where(df > 0, df, np.nan)
+        lrt, pvalues = lrt_pvalues(fits["logL"][:, 0], fits["logL"][:, 1], df)
+        comparison = OrderedDict()
+        comparison["gene"] = fits["gene"]
+        comparison["LRT"] = lrt
+        comparison["df"] = np.broadcast_to(np.asarray(df, dtype = np.float64), lrt.shape).copy()
+        comparison["p-value"] = pvalues
+        return comparison
+
+
+
+    def akaike_weights(self, models = None):
+        """
+            Return the AICc differences and Akaike weights of a set of models for every Extractor at once, as an ordered dictionary of arrays aligned by gene (rows) and model (columns) with keys :code:`gene` (names), :code:`models`, :code:`delta AICc` (each model's AICc minus the smallest AICc of that gene), and :code:`weights` (see :code:`stats.akaike_weights()`). Models which a gene does not have are NaN, and do not count towards its weights.
+
+            Optional keyword arguments:
+                1. **models**, a list of model names to compare. Default: every model fitted by any Extractor.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.BUSTED.json", "/path/to/gene2.BUSTED.json"])
+               >>> w = c.akaike_weights(["Unconstrained model", "Constrained model"])
+               >>> w["weights"][:, 0] ## Weight of the unconstrained model for each gene
+               array([0.99592674, 0.41217645])
+        """
+        fits = self.extract_model_fits(models)
+        aicc = fits["AICc"]
+        weights = OrderedDict()
+        weights["gene"] = fits["gene"]
+        weights["models"] = fits["models"]
+        weights["delta AICc"] = delta_aicc(aicc, axis = 1)
+        weights["weights"] = akaike_weights(aicc, axis = 1)
+        return weights
+
+
+
+    def extract_runtime_table(self, cpus = 1):
+        """
+            Return the input dimensions and total wall-clock times of all Extractors, as an ordered dictionary of arrays aligned by gene, e.g. to train a :code:`runtime.RuntimeModel`. Keys are:
+                + :code:`gene`, the names of the genes
+                + :code:`method`, the analysis of each Extractor (e.g. "FEL")
+                + :code:`sequences` and :code:`sites`, the numbers of sequences and sites (see :code:`Extractor.extract_number_sequences()` and :code:`Extractor.extract_number_sites()`)
+                + :code:`branches`, the number of branches in the input tree, averaged over partitions
+                + :code:`cpus`, the number of CPUs each analysis was run with
+                + :code:`seconds`, the total wall-clock time (see :code:`Extractor.extract_total_time()`), NaN for JSONs without timers
+
+            Optional keyword arguments:
+                1. **cpus**, the number of CPUs the analyses were run with, which HyPhy does not record, either an integer or a list aligned by gene. Default: 1.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene1.MEME.json"])
+               >>> c.extract_runtime_table(cpus = [4, 8])["seconds"]
+               array([  196., 13821.])
+        """
+        cpus = np.broadcast_to(np.asarray(cpus, dtype = np.float64), (self.ngenes,)).copy()
+        assert(np.all(cpus >= 1)), "\n[ERROR]: Argument `cpus` must be at least 1."
+        runtimes = OrderedDict()
+        runtimes["gene"] = np.array(self.names, dtype = object)
+        runtimes["method"] = np.array([x[0] for x in self._runtimes], dtype = object)
+        runtimes["sequences"] = np.array([x[1] for x in self._runtimes], dtype = np.float64)
+        runtimes["sites"] = np.array([x[2] for x in self._runtimes], dtype = np.float64)
+        runtimes["branches"] = np.array([x[3] for x in self._runtimes], dtype = np.float64)
+        runtimes["cpus"] = cpus
+        runtimes["seconds"] = np.array([np.nan if x[4] is None else x[4] for x in self._runtimes], dtype = np.float64)
+        return runtimes
+
+
+
+    def extract_rate_distribution_table(self, models = None):
+        """
+            Return the rate distributions of all Extractors stacked into one tidy ordered dictionary of arrays, with columns :code:`gene` (the position of the gene in :code:`self.names`), then the columns of :code:`Extractor.extract_rate_distribution_table()`.
+
+            Optional keyword arguments:
+                1. **models**, a list of model names. Each gene contributes the models it has. Default: all fitted models of each gene.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json"])
+               >>> rates = c.extract_rate_distribution_table(["Global MG94xREV"])
+               >>> rates["gene"], rates["value"] ## dN/dS of each gene
+               (array([0, 1]), array([0.98607965, 0.25923363]))
+        """
+        if isinstance(models, str):
+            models = [models]
+        tables = []
+        for e in self:
+            gene_models = None if models is None else [m for m in models if m in e.fitted_models]
+            tables.append( e.extract_rate_distribution_table(gene_models) )
+        stacked = OrderedDict()
+        stacked["gene"] = np.repeat(np.arange(self.ngenes, dtype = np.int64), [len(t["model"]) for t in tables])
+        for column in tables[0]:
+            stacked[column] = np.concatenate([t[column] for t in tables])
+        return stacked
+
+
+
+    def extract_absrel_rate_classes(self, original_names = False):
+        """
+            Return the omega rate classes of every branch of every Extractor as ragged arrays, as an ordered dictionary with keys :code:`gene` (the position of each branch's gene in :code:`self.names`), :code:`node`, :code:`offsets`, :code:`omega`, and :code:`proportion`. Branches of all genes are stacked in order, and the rate classes of global branch `i` are :code:`offsets[i]:offsets[i+1]` (see :code:`Extractor.extract_absrel_rate_classes()`). **aBSREL only.**
+
+            Optional keyword arguments:
+                1. **original_names**, Boolean to indicate if the `node` array should contain original names (True) or HyPhy-reformatted names (False). Default: False.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.ABSREL.json", "/path/to/gene2.ABSREL.json"])
+               >>> classes = c.extract_absrel_rate_classes()
+               >>> counts = np.diff(classes["offsets"])
+               >>> np.bincount(classes["gene"], weights = counts > 1) ## Branches with more than one rate class, per gene
+               array([6., 2.])
+        """
+        assert(all(x == AnalysisNames().absrel for x in self._analyses)), "\n[ERROR]: Per-branch rate classes are only available for aBSREL."
+        tables = [e.extract_absrel_rate_classes(original_names = original_names) for e in self]
+        starts = np.cumsum([0] + [t["offsets"][-1] for t in tables[:-1]]).astype(np.int64)
+        classes = OrderedDict()
+        classes["gene"] = np.repeat(np.arange(self.ngenes, dtype = np.int64), [len(t["node"]) for t in tables])
+        classes["node"] = np.concatenate([t["node"] for t in tables])
+        classes["offsets"] = np.concatenate([t["offsets"][:-1] + start for t, start in zip(tables, starts)] + [[starts[-1] + tables[-1]["offsets"][-1]]]).astype(np.int64)
+        classes["omega"] = np.concatenate([t["omega"] for t in tables])
+        classes["proportion"] = np.concatenate([t["proportion"] for t in tables])
+        return classes
+
+
+
+    def _obtain_busted_sites(self):
+        """
+            Private method: Return the BUSTED site log likelihoods of every Extractor concatenated along sites, as a tuple of (models, float64 array of shape (models, global sites), int64 offsets of length `ngenes + 1`). Only models shared by every Extractor are kept. These are cached after first use.
+        """
+        if self._busted_sites is None:
+            assert(all(x == AnalysisNames().busted for x in self._analyses)), "\n[ERROR]: Site Log Likelihoods are specific to BUSTED."
+            blocks = [e.extract_site_logl_array() for e in self]
+            models = [m for m in blocks[0]["models"] if all(m in b["models"] for b in blocks[1:])]
+            values = np.concatenate([b["values"][[b["models"].index(m) for m in models]] for b in blocks], axis = 1)
+            offsets = np.concatenate(([0], np.cumsum([b["values"].shape[1] for b in blocks]))).astype(np.int64)
+            self._busted_sites = (models, values, offsets)
+        return self._busted_sites
+
+
+
+    def extract_busted_site_logl(self):
+        """
+            Return the BUSTED site log likelihoods of all Extractors as one array, in an ordered dictionary with keys **BUSTED only.**
+                + :code:`models`, the models (rows) shared by every Extractor
+                + :code:`gene`, an int64 array giving the position in :code:`self.names` of each global site's gene
+                + :code:`offsets`, an int64 array of length `ngenes + 1`: the sites of gene `g` are columns :code:`offsets[g]:offsets[g+1]`
+                + :code:`values`, a float64 array of shape (models, global sites)
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.BUSTED.json", "/path/to/gene2.BUSTED.json"])
+               >>> logl = c.extract_busted_site_logl()
+               >>> logl["values"].shape
+               (3, 1898)
+        """
+        models, values, offsets = self._obtain_busted_sites()
+        logl = OrderedDict()
+        logl["models"] = list(models)
+        logl["gene"] = np.repeat(np.arange(self.ngenes, dtype = np.int64), np.diff(offsets))
+        logl["offsets"] = offsets
+        logl["values"] = values
+        return logl
+
+
+
+    def busted_site_evidence(self, null = "constrained", alternative = "unconstrained", threshold = 10.):
+        """
+            Compare two BUSTED models at every site of every Extractor at once, for genome-wide scans. Returns an ordered dictionary with **BUSTED only.**
+                + :code:`LRT`, the per-site statistics :code:`2 * (logL alternative - logL null)`, aligned to global sites (see :code:`stats.site_lrt()`)
+                + :code:`ER`, the per-site evidence ratios, :code:`exp(logL alternative - logL null)`, aligned to global sites (see :code:`stats.evidence_ratios()`)
+                + :code:`gene`, the gene names
+                + :code:`sites`, the number of sites of each gene
+                + :code:`max_ER`, the largest evidence ratio of each gene, ignoring NaN (NaN if every ratio of the gene is NaN)
+                + :code:`max_site`, the site (from 1, within its gene) with the largest evidence ratio, or -1 if every ratio of the gene is NaN
+                + :code:`sites_above`, the number of sites of each gene whose evidence ratio is at least `threshold`
+            Note that evidence ratios are **descriptive** measures of selection, NOT statistical tests.
+
+            Optional keyword arguments:
+                1. **null**, the null model (as named in the site log likelihoods). Default: "constrained".
+                2. **alternative**, the alternative model. Default: "unconstrained".
+                3. **threshold**, the evidence ratio threshold for :code:`sites_above`. Default: 10.
+
+            **Examples:**
+
+               >>> c = ExtractorCollection(["/path/to/gene1.BUSTED.json", "/path/to/gene2.BUSTED.json"])
+               >>> evidence = c.busted_site_evidence(threshold = 100)
+               >>> evidence["sites_above"], evidence["max_site"]
+               (array([2, 0]), array([432, 17]))
+        """
+        models, values, offsets = self._obtain_busted_sites()
+        assert(null in models and alternative in models), "\n[ERROR]: Models must be one of: " + ", ".join(models)
+        sites = np.diff(offsets)
+        assert((sites > 0).all()), "\n[ERROR]: Every Extractor must have site log likelihoods."
+        alternative_logl = values[models.index(alternative)]
+        null_logl = values[models.index(null)]
+        ratios = evidence_ratios(alternative_logl, null_logl)
+
+        ### Largest ratio per gene, ignoring NaN: reduce each gene's segment, then find the first site which attains it. Genes whose ratios are all NaN have no such site, given as -1.
+        max_ratio = np.fmax.reduceat(ratios, offsets[:-1])
+        gene = np.repeat(np.arange(self.ngenes, dtype = np.int64), sites)
+        at_max = np.flatnonzero(ratios == max_ratio[gene])
+        found, first = np.unique(gene[at_max], return_index = True)
+        max_site = np.full(self.ngenes, -1, dtype = np.int64)
+        max_site[found] = at_max[first] - offsets[found] + 1
+
+        evidence = OrderedDict()
+        evidence["LRT"] = site_lrt(alternative_logl, null_logl)
+        evidence["ER"] = ratios
+        evidence["gene"] = np.array(self.names, dtype = object)
+        evidence["sites"] = sites
+        evidence["max_ER"] = max_ratio
+        evidence["max_site"] = max_site
+        evidence["sites_above"] = np.bincount(gene[ratios >= threshold], minlength = self.ngenes).astype(np.int64)
+        return evidence
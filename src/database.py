@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Incremental SQLite database of parsed HyPhy results, for fast repeated queries across many JSONs.
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import numpy as np
+from collections import OrderedDict
+
+if __name__ == "__main__":
+    print("\nThis is the Database module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+from .extractor import *
+from .bulk import find_jsons
+
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY,
+    path        TEXT NOT NULL,
+    hash        TEXT NOT NULL,
+    gene        TEXT NOT NULL,
+    method      TEXT NOT NULL,
+    version     TEXT,
+    input_file  TEXT,
+    npartitions INTEGER,
+    nsequences  INTEGER,
+    nsites      INTEGER,
+    ingested    REAL,
+    UNIQUE (path, hash)
+);
+CREATE TABLE IF NOT EXISTS fits (
+    run_id               INTEGER NOT NULL REFERENCES runs(run_id),
+    model                TEXT NOT NULL,
+    logl                 REAL,
+    estimated_parameters INTEGER,
+    aicc                 REAL
+);
+CREATE TABLE IF NOT EXISTS sites (
+    run_id    INTEGER NOT NULL REFERENCES runs(run_id),
+    gene      TEXT NOT NULL,
+    method    TEXT NOT NULL,
+    partition INTEGER NOT NULL,
+    site      INTEGER NOT NULL,
+    pvalue    REAL,
+    data      TEXT
+);
+CREATE TABLE IF NOT EXISTS branches (
+    run_id        INTEGER NOT NULL REFERENCES runs(run_id),
+    gene          TEXT NOT NULL,
+    method        TEXT NOT NULL,
+    partition     INTEGER NOT NULL,
+    node          TEXT NOT NULL,
+    original_name TEXT,
+    pvalue        REAL,
+    data          TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_path ON runs (path);
+CREATE INDEX IF NOT EXISTS fits_run ON fits (run_id);
+CREATE INDEX IF NOT EXISTS sites_gene_method_site ON sites (gene, method, site);
+CREATE INDEX IF NOT EXISTS sites_method_pvalue ON sites (method, pvalue);
+CREATE INDEX IF NOT EXISTS sites_run ON sites (run_id);
+CREATE INDEX IF NOT EXISTS branches_gene_method_node ON branches (gene, method, node);
+CREATE INDEX IF NOT EXISTS branches_method_pvalue ON branches (method, pvalue);
+CREATE INDEX IF NOT EXISTS branches_run ON branches (run_id);
+"""
+
+### The site table column stored as `sites.pvalue` for each method. Other methods (FUBAR, LEISR) have no site P-value.
+_SITE_PVALUES = {"FEL": "p-value", "MEME": "p-value", "SLAC": "P_[dN/dS_>_1]"}
+
+
+
+def file_hash(path):
+    """
+        Return the SHA-256 hex digest of a file's contents.
+
+        Required arguments:
+            1. **path**, the file to hash
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+
+class ResultsDatabase():
+    """
+        This class stores the results of many HyPhy analyses in a local SQLite database, so that questions across thousands of JSONs (e.g., "all MEME sites with P < 0.05 in genes X through Y") are answered by indexed lookups instead of re-parsing.
+
+        The database has four tables:
+            + **runs**, one row per ingested JSON: :code:`run_id, path, hash, gene, method, version, input_file, npartitions, nsequences, nsites, ingested`
+            + **fits**, one row per fitted model: :code:`run_id, model, logl, estimated_parameters, aicc`
+            + **sites**, one row per site of site-level methods: :code:`run_id, gene, method, partition, site, pvalue, data`. The :code:`pvalue` is the method's P-value for selection (FEL and MEME "p-value", SLAC "P_[dN/dS_>_1]"; NULL for FUBAR and LEISR).
+            + **branches**, one row per branch: :code:`run_id, gene, method, partition, node, original_name, pvalue, data`. The :code:`pvalue` is the aBSREL corrected P-value (NULL for other methods).
+        The :code:`data` columns hold all other values of the row as JSON text (e.g. the full site table row, or all scalar branch attributes), which can be queried with SQLite's :code:`json_extract()`. Non-scalar branch attributes (lists and dictionaries, e.g. aBSREL rate distributions or SLAC substitution counts) are **not** stored.
+        Sites are indexed by (gene, method, site) and (method, pvalue), and branches by (gene, method, node) and (method, pvalue).
+    """
+
+    def __init__(self, path):
+        """
+            Initialize a ResultsDatabase instance, creating the database file and tables if needed.
+
+            Required arguments:
+                1. **path**, the SQLite database file (or ":memory:")
+
+            **Examples:**
+
+               >>> db = ResultsDatabase("results.sqlite")
+               >>> db.ingest("results/") ## Ingest all JSONs in a directory
+               >>> db.query_sites(method = "MEME", max_pvalue = 0.05, gene_range = ("geneA", "geneM"))
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        self.connection.commit()
+
+
+
+    def __enter__(self):
+        return self
+
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+
+    def close(self):
+        """
+            Close the database connection.
+        """
+        self.connection.close()
+
+
+
+    def _insert_run(self, extractor, path, digest, gene):
+        """
+            Private method: Insert all rows for a single Extractor, returning the number of site and branch rows. Must be called inside a transaction.
+        """
+        cursor = self.connection.execute("INSERT INTO runs (path, hash, gene, method, version, input_file, npartitions, nsequences, nsites, ingested) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                         (path, digest, gene, extractor.analysis, extractor.extract_analysis_version(), extractor.extract_input_file(),
+                                          extractor.npartitions, extractor.extract_number_sequences(), extractor.extract_number_sites(), time.time()))
+        run_id = cursor.lastrowid
+        method = extractor.analysis
+
+        fits = extractor.extract_model_fit_table()
+        self.connection.executemany("INSERT INTO fits VALUES (?, ?, ?, ?, ?)",
+                                    zip([run_id] * len(fits["model"]), fits["model"].tolist(), fits["logl"].tolist(), fits["estimated_parameters"].tolist(), fits["AICc"].tolist()))
+
+        nsites = 0
+        if method in extractor.analysis_names.site_analyses:
+            header, raw_content = extractor._obtain_site_block(extractor.analysis_names.slac_ancestral_type[0])
+            column = header.index(_SITE_PVALUES[method]) if method in _SITE_PVALUES else None
+            def site_rows():
+                site = 1
+                for i in range(extractor.npartitions):
+                    for row in raw_content[str(i)]:
+                        yield (run_id, gene, method, i, site, None if column is None else row[column], json.dumps(OrderedDict(zip(header, row))))
+                        site += 1
+            cursor = self.connection.executemany("INSERT INTO sites VALUES (?, ?, ?, ?, ?, ?, ?)", site_rows())
+            nsites = cursor.rowcount
+
+        def branch_rows():
+            for i in range(extractor.npartitions):
+                ### Branch attributes are read from the typed columns, one attribute at a time; list and dictionary values are not stored
+                columns = extractor._attribute_columns[i]
+                values = [(name, columns.as_list(name)) for name in columns.values]
+                for j, node in enumerate(columns.nodes):
+                    scalars = OrderedDict((name, column[j]) for name, column in values if column[j] is not None and not isinstance(column[j], (list, dict)))
+                    pvalue = scalars.get(extractor.fields.corrected_p) if method == extractor.analysis_names.absrel else None
+                    yield (run_id, gene, method, i, str(node), scalars.get(extractor.fields.original_name), pvalue, json.dumps(scalars))
+        cursor = self.connection.executemany("INSERT INTO branches VALUES (?, ?, ?, ?, ?, ?, ?, ?)", branch_rows())
+        return nsites, cursor.rowcount
+
+
+
+    def _delete_run(self, run_id):
+        """
+            Private method: Delete all rows for a run. Must be called inside a transaction.
+        """
+        for table in ("fits", "sites", "branches", "runs"):
+            self.connection.execute("DELETE FROM " + table + " WHERE run_id = ?", (run_id,))
+
+
+
+    def ingest(self, sources, genes = None, pattern = "*.json", verbose = False):
+        """
+            Add HyPhy JSON results to the database. Ingest is **incremental**: a JSON whose path and contents (SHA-256 hash) are already in the database is skipped, and a JSON whose contents have changed since it was ingested replaces its previous rows.
+            Each JSON is added in its own transaction, so an interrupted ingest never leaves partial results.
+
+            Required arguments:
+                1. **sources**, A directory (searched recursively for JSONs), a JSON file name, or a list of JSON file names
+
+            Optional keyword arguments:
+                1. **genes**, A list of gene names, one per JSON (only when a list of JSONs is given). Default: the JSON file name up to its first ".", e.g. "geneA" for "geneA.FEL.json", so that all methods run on a gene share its name.
+                2. **pattern**, a shell-style file name pattern for JSONs, when a directory is given. Default: "*.json".
+                3. **verbose**, Boolean to indicate whether a line should be printed for each JSON. Default: False.
+
+            Returns an ordered dictionary summarizing the ingest: :code:`ingested`, :code:`replaced`, :code:`unchanged` (lists of paths), :code:`failed` (a list of (path, reason) tuples), :code:`sites`, :code:`branches`, and :code:`seconds`.
+
+            **Examples:**
+
+               >>> db = ResultsDatabase("results.sqlite")
+               >>> db.ingest("results/")["ingested"][:2]
+               ['results/geneA.FEL.json', 'results/geneA.MEME.json']
+               >>> db.ingest("results/")["unchanged"][:2] ## Second ingest skips everything
+               ['results/geneA.FEL.json', 'results/geneA.MEME.json']
+        """
+        start = time.time()
+        if isinstance(sources, str):
+            sources = find_jsons(sources, pattern = pattern) if os.path.isdir(sources) else [sources]
+        sources = list(sources)
+        if genes is None:
+            genes = [os.path.basename(x).split(".")[0] for x in sources]
+        else:
+            genes = [str(x) for x in genes]
+            assert(len(genes) == len(sources)), "\n[ERROR]: Provide one gene name per JSON."
+
+        summary = OrderedDict([("ingested", []), ("replaced", []), ("unchanged", []), ("failed", []), ("sites", 0), ("branches", 0), ("seconds", 0.)])
+        for source, gene in zip(sources, genes):
+            path = os.path.abspath(source)
+            try:
+                ### Missing or unreadable files are recorded as failures, like any JSON which cannot be parsed
+                digest = file_hash(path)
+                previous = self.connection.execute("SELECT run_id, hash FROM runs WHERE path = ?", (path,)).fetchall()
+                if any(h == digest for run_id, h in previous):
+                    summary["unchanged"].append(source)
+                    continue
+                extractor = Extractor(path)
+                with self.connection:
+                    for run_id, h in previous:
+                        self._delete_run(run_id)
+                    nsites, nbranches = self._insert_run(extractor, path, digest, gene)
+            except Exception as error:
+                summary["failed"].append( (source, str(error).strip()) )
+                if verbose:
+                    print("Failed " + source + ": " + str(error).strip())
+                continue
+            summary["replaced" if len(previous) > 0 else "ingested"].append(source)
+            summary["sites"] += nsites
+            summary["branches"] += nbranches
+            if verbose:
+                print("Ingested " + source + " (" + extractor.analysis + ", gene " + gene + ")")
+        summary["seconds"] = time.time() - start
+        return summary
+
+
+
+    def query_sites(self, method = None, genes = None, gene_range = None, max_pvalue = None, sites = None, fields = None):
+        """
+            Return sites matching all of the given criteria, as an ordered dictionary of NumPy arrays with columns :code:`gene`, :code:`method`, :code:`partition`, :code:`site`, :code:`pvalue`, plus any requested `fields`. Rows are ordered by gene, method, and site.
+
+            Optional keyword arguments:
+                1. **method**, Only sites from this method, e.g. "MEME"
+                2. **genes**, Only sites from these genes (a list of names)
+                3. **gene_range**, Only sites from genes whose names fall between (first, last), inclusive
+                4. **max_pvalue**, Only sites with a P-value at most this value (see the class description for which P-value is stored per method)
+                5. **sites**, Only these site numbers (a list of integers)
+                6. **fields**, A list of site table columns (as in :code:`Extractor.extract_site_table()`) to also return, as float arrays, e.g. ["beta", "LRT"]
+
+            **Examples:**
+
+               >>> db = ResultsDatabase("results.sqlite")
+               >>> hits = db.query_sites(method = "MEME", max_pvalue = 0.05, gene_range = ("geneA", "geneM"), fields = ["beta_pos"])
+               >>> hits["gene"][:2], hits["site"][:2], hits["beta_pos"][:2]
+               (array(['geneA', 'geneA'], dtype=object), array([18, 102]), array([ 4.12, 15.9 ]))
+        """
+        fields = [] if fields is None else [str(x) for x in fields]
+        select = ["gene", "method", "partition", "site", "pvalue"] + ["json_extract(data, ?)"] * len(fields)
+        params = ['$."' + x + '"' for x in fields]
+        where = []
+        if method is not None:
+            where.append("method = ?")
+            params.append(str(method))
+        if genes is not None:
+            genes = [str(x) for x in genes]
+            where.append("gene IN (" + ", ".join("?" * len(genes)) + ")")
+            params += genes
+        if gene_range is not None:
+            where.append("gene BETWEEN ? AND ?")
+            params += [str(gene_range[0]), str(gene_range[1])]
+        if max_pvalue is not None:
+            where.append("pvalue <= ?")
+            params.append(float(max_pvalue))
+        if sites is not None:
+            sites = [int(x) for x in sites]
+            where.append("site IN (" + ", ".join("?" * len(sites)) + ")")
+            params += sites
+
+        sql = "SELECT " + ", ".join(select) + " FROM sites"
+        if len(where) > 0:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY gene, method, site"
+        rows = self.connection.execute(sql, params).fetchall()
+
+        names = ["gene", "method", "partition", "site", "pvalue"] + fields
+        types = [object, object, np.int64, np.int64, np.float64] + [np.float64] * len(fields)
+        columns = list(zip(*rows)) if len(rows) > 0 else [[] for x in names]
+        result = OrderedDict()
+        for name, dtype, values in zip(names, types, columns):
+            if dtype is np.float64:
+                values = [np.nan if x is None else x for x in values]
+            result[name] = np.array(values, dtype = dtype)
+        return result
+
+
+
+    def execute(self, sql, parameters = ()):
+        """
+            Run any SQL query on the database, returning all rows as a list of tuples.
+
+            Required arguments:
+                1. **sql**, the SQL query, optionally with "?" placeholders
+
+            Optional keyword arguments:
+                1. **parameters**, values for the placeholders
+
+            **Examples:**
+
+               >>> db = ResultsDatabase("results.sqlite")
+               >>> db.execute("SELECT gene, node FROM branches WHERE method = 'ABSREL' AND pvalue <= ?", (0.05,))
+               [('geneB', 'Node12')]
+        """
+        return self.connection.execute(sql, parameters).fetchall()
@@ -13,14 +13,27 @@ import sys
 import os
 import re
 import json
-from ete3 import Tree
-from copy import deepcopy
+import copy
+import zlib
+import pickle
+import threading
+import numpy as np
+from collections import OrderedDict
 
 if __name__ == "__main__":
     print("\nThis is the Extractor module in `phyphy`. Please consult docs for `phyphy` usage." )
     sys.exit()
     
 from .analysis import *
+from .attributes import *
+from .attributes import _packed, _unpacked
+from .tree import *
+from .writers import *
+
+
+### Patterns for rate distribution keys, compiled once and shared by every `JSONFields` instance
+_SUBSTITUTION_RATE    = re.compile(r"Substitution rate from [\w-]+ (\w) to [\w-]+ (\w)")
+_NONSYN_SYN_RATIO_FOR = re.compile(re.escape("non-synonymous/synonymous rate ratio for") + r" \*(\w+)\*")
 
 
 class JSONFields():
@@ -44,7 +57,7 @@ class JSONFields():
         self.analysis_description_info    = "info"
         self.analysis_description_version = "version"
         
-        self.substitution_rate    = re.compile(r"Substitution rate from [\w-]+ (\w) to [\w-]+ (\w)")
+        self.substitution_rate    = _SUBSTITUTION_RATE
         
         self.model_fits           = "fits"
         self.log_likelihood       =  "Log Likelihood"
@@ -58,6 +71,7 @@ class JSONFields():
         self.proportion           = "proportion"
         self.rate_distributions   = "Rate Distributions"
         self.nonsyn_syn_ratio_for = "non-synonymous/synonymous rate ratio for"
+        self.nonsyn_syn_ratio_set = _NONSYN_SYN_RATIO_FOR ## captures the branch set from "<nonsyn_syn_ratio_for> *<set>*"
 
         self.MLE                       = "MLE"
         self.MLE_headers               = "headers"
@@ -87,6 +101,10 @@ class JSONFields():
         self.display_order = "display order"
         
         self.slac_by_site = "by-site"
+        self.slac_by_branch = "by-branch"
+        self.slac_branch_names = "NAMES"
+        self.synonymous_count = "synonymous substitution count"
+        self.nonsynonymous_count = "nonsynonymous substitution count"
         
         self.relax_alternative = "RELAX alternative" ## use to check json for relax bug
 
@@ -142,12 +160,36 @@ class Genetics():
  
     
 
+def _parse_newick(newick):
+    """
+        Private function: Parse a single newick tree into a `NodeIndex`, in the calling thread or a worker process.
+    """
+    return NodeIndex.from_newick(newick)
+
+
+
+def _write_tree(job):
+    """
+        Private function: Write a single tree from a tuple of (NodeIndex, lengths, names, features, root features), in the calling thread or a worker process.
+    """
+    node_index, lengths, names, features, root_features = job
+    return node_index.write(lengths = lengths, names = names, features = features, root_features = root_features)
+
+
+
 class Extractor():
     """
         This class parses JSON output and contains a variety of methods for pulling out various pieces of information.
     """    
     
-    def __init__(self, content):
+    ### Attributes which are derived from the core JSON content. These are never pickled, and are instead rebuilt on first use (under `self._lock`, so that threads may share an Extractor).
+    _derived_attributes = ("_input_tree_ete", "_node_index", "_branch_columns", "_original_node_names", "_attribute_cache", "_corrected_pvalues")
+    ### Attributes which belong to this process only (the lock, and the worker pool). These are never pickled.
+    _process_attributes = ("_lock", "_pool")
+    ### Attributes which are pickled as they are, alongside the packed JSON. Everything else is rebuilt when unpickled.
+    _pickled_attributes = ("json_path", "workers", "pool", "analysis", "npartitions", "fitted_models", "input_tree", "_frozen")
+    
+    def __init__(self, content, workers = 1, pool = "thread", frozen = False):
         """
             Initialize a Extractor instance.
             
@@ -155,6 +197,11 @@ class Extractor():
                 1. **content**, The input content to parse. Two types of input may be provided here, EITHER:
                     + The path to a JSON file to parse, provided as a string
                     + A phyphy `Analysis` (i.e. `BUSTED`, `SLAC`, `FEL`, etc.) object which has been used to execute a HyPhy analysis through the phyphy interface
+
+            Optional keyword arguments:
+                1. **workers**, The number of threads or processes used to parse and write the trees of analyses with multiple partitions, one partition per task. Default: 1, i.e. partitions are processed serially.
+                2. **pool**, The kind of worker pool used when `workers` is above 1, either "thread" (Default) or "process". Processes avoid the interpreter lock for very large trees, but must copy each tree to and from the workers. The pool is started on first use and reused by every later call, until :code:`.close()`.
+                3. **frozen**, Boolean to indicate whether the Extractor should be frozen once loaded (see :code:`.freeze()`). Default: False.
         
             **Examples:**
 
@@ -167,7 +214,24 @@ class Extractor():
                >>> myfel = FEL(data = "/path/to/data.fna")
                >>> myfel.run_analysis()
                >>> e = Extractor(myfel)
+
+               >>> ### Parse and write the trees of a many-partition analysis with 8 threads
+               >>> e = Extractor("/path/to/json.json", workers = 8)
+               >>> ### ... or, to shut the pool down when done
+               >>> with Extractor("/path/to/json.json", workers = 8) as e:
+               ...     trees = e.map_branch_attribute("Global MG94xREV")
+
+               >>> ### Define a read-only Extractor, to be shared by threads or forked workers
+               >>> e = Extractor("/path/to/json.json", frozen = True)
         """
+        self._lock = threading.RLock()
+        self._pool = None
+        self._frozen = False
+        assert(int(workers) >= 1), "\n[ERROR]: Argument `workers` must be at least 1."
+        assert(pool in ("thread", "process")), "\n[ERROR]: Argument `pool` must be either 'thread' or 'process'."
+        self.workers = int(workers)
+        self.pool = pool
+
         self.fields = JSONFields()
         self.genetics = Genetics()
         
@@ -188,8 +252,10 @@ class Extractor():
         self._determine_analysis_from_json() ### ---> self.analysis
         self._count_partitions()             ### ---> self.npartitions        
         self._obtain_input_tree()            ### ---> self.input_tree, self.input_tree_ete
-        self._obtain_branch_attributes()     ### ---> self.branch_attributes, self.attribute_names
+        self._obtain_branch_attributes()     ### ---> self.branch_attributes, self._attribute_columns, self.attribute_names
         self._obtain_original_names()        ### ---> self.original_names
+        if frozen:
+            self.freeze()
     ############################## PRIVATE FUNCTIONS #################################### 
     def _unpack_json(self):
         """
@@ -246,10 +312,147 @@ class Extractor():
         """
         tree_field = self.json[ self.fields.input ][ self.fields.input_trees ]
         self.input_tree = {}
-        self.input_tree_ete = {}
         for i in range(len(tree_field)):
             self.input_tree[i] = str(tree_field[str(i)]) + ";"
-            self.input_tree_ete[i] = Tree(self.input_tree[i], format = 1)     
+        self._input_tree_ete = None
+        self._node_index = None
+        self._original_node_names = None
+
+
+    @property
+    def input_tree_ete(self):
+        """
+            Dictionary of the input tree(s) as ete3 `Tree` objects, keyed by partition. These are parsed from `self.input_tree` on first access.
+            `phyphy` itself does not need ete3, which is only imported here, so it is required only for ete3 trees.
+        """
+        with self._lock:
+            if self._input_tree_ete is None:
+                try:
+                    from ete3 import Tree
+                except ImportError:
+                    raise AssertionError("\n[ERROR]: ete3 trees require the `ete3` package. Please install it (e.g. `pip install ete3`).")
+                self._input_tree_ete = dict( (i, Tree(self.input_tree[i], format = 1)) for i in self.input_tree )
+            return self._input_tree_ete
+
+
+    def _obtain_node_index(self):
+        """
+            Private method: Return the integer node index (postorder) for each partition's tree, as a dictionary of `NodeIndex` keyed by partition. These are built on first use.
+        """
+        with self._lock:
+            if self._node_index is None:
+                ### Partitions with identical trees share a single (never modified) NodeIndex, so each distinct tree is parsed once
+                distinct = list(OrderedDict.fromkeys(self.input_tree.values()))
+                parsed = dict( zip(distinct, self._map_partitions(_parse_newick, distinct)) )
+                self._node_index = dict( (i, parsed[self.input_tree[i]]) for i in self.input_tree )
+            return self._node_index
+
+
+    def _map_partitions(self, function, jobs):
+        """
+            Private method: Return :code:`[function(job) for job in jobs]`, in order. When `self.workers` is above 1 and there are several jobs, they are run in a pool of threads or processes (see `self.pool`).
+
+            Required arguments:
+                1. **function**, a module-level function, so that it can be sent to worker processes
+                2. **jobs**, a list of arguments, one per call
+        """
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [function(job) for job in jobs]
+        return self._obtain_pool().map(function, jobs)
+
+
+    def _obtain_pool(self):
+        """
+            Private method: Return the pool of `self.workers` threads or processes (see `self.pool`). This is started on first use and then shared by every call, as starting a pool costs more than the small per-partition jobs it runs.
+        """
+        with self._lock:
+            if self._pool is None:
+                import multiprocessing
+                import multiprocessing.pool
+                if self.pool == "process":
+                    self._pool = multiprocessing.Pool(self.workers)
+                else:
+                    self._pool = multiprocessing.pool.ThreadPool(self.workers)
+            return self._pool
+
+
+    def close(self):
+        """
+            Shut down the worker pool of this Extractor, if one was started (see the `workers` argument). The Extractor remains usable, and a new pool is started if one is needed again.
+            Extractors may also be used as context managers, which call this method on exit.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/json.json", workers = 8)
+               >>> trees = e.map_branch_attribute("Global MG94xREV")
+               >>> e.close()
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+
+    def __getstate__(self):
+        """
+            Private method: Return the compact core state for pickling: the parsed JSON with its large lists packed into arrays, the input trees as newick strings, and the few fields found when loading. Branch attribute columns are rebuilt from the JSON when unpickled.
+            Derived structures (e.g. ete3 trees), the lock, and any worker pool are dropped.
+        """
+        state = dict( (attr, self.__dict__[attr]) for attr in self._pickled_attributes )
+        state["json"] = _packed(self.json)
+        return state
+
+
+    def __setstate__(self, state):
+        """
+            Private method: Restore from pickled state. Derived structures are rebuilt lazily on first use, or straight away for a frozen Extractor.
+        """
+        state = dict(state)
+        frozen = state.pop("_frozen", False)
+        self.__dict__["_frozen"] = False
+        self.__dict__["_lock"] = threading.RLock()
+        self.__dict__["_pool"] = None
+        self.__dict__["json"] = _unpacked(state.pop("json"))
+        self.__dict__.update(state)
+        for attr in self._derived_attributes:
+            self.__dict__[attr] = None
+
+        self.fields = JSONFields()
+        self.genetics = Genetics()
+        self.analysis_names = AnalysisNames()
+        self.allowed_analyses = self.analysis_names.all_analyses
+        self._obtain_branch_attributes()
+        self._obtain_original_names()
+        if frozen:
+            self.freeze()
+
+
+    def __setattr__(self, name, value):
+        """
+            Private method: Set an attribute, unless the Extractor is frozen. Derived structures may still be built lazily (e.g. ete3 trees), as they never change the extracted content.
+        """
+        if self.__dict__.get("_frozen", False) and name not in self._derived_attributes and name not in self._process_attributes:
+            raise AttributeError("\n[ERROR]: This Extractor is frozen and cannot be modified.")
+        object.__setattr__(self, name, value)
+
+
+    def __delattr__(self, name):
+        """
+            Private method: Delete an attribute, unless the Extractor is frozen.
+        """
+        if self.__dict__.get("_frozen", False):
+            raise AttributeError("\n[ERROR]: This Extractor is frozen and cannot be modified.")
+        object.__delattr__(self, name)
 
 
     def _obtain_fitted_models(self):
@@ -269,8 +472,9 @@ class Extractor():
 
     def _obtain_branch_attributes(self):
         """
-            Private method: Obtain two things:
+            Private method: Obtain three things:
                 - the full branch attributes dictionary (sans attributes part), self.branch_attributes
+                - the branch attributes of each partition as typed columns (`BranchAttributeColumns`) in JSON node order, self._attribute_columns, from which attribute lookups are served
                 - dictionary of attribute names, as attributes:attribute_type, self.attribute_names
         """
         raw = self.json[ self.fields.branch_attributes ]
@@ -280,25 +484,110 @@ class Extractor():
                 self.branch_attributes[int(key)] = raw[key]
             except:
                 pass
-                
+
         self.attribute_names = {}
         for x in raw[ self.fields.attributes ]:
             if x == self.fields.display_order:
                 continue
             else:
                 self.attribute_names[x] = str(raw[ self.fields.attributes ][x][self.fields.attribute_type])      
-        
 
-    def _extract_slac_sitetable(self, raw):
+        self._attribute_columns = {}
+        for partition, attributes in self.branch_attributes.items():
+            ### Every attribute found is stored, in the order first seen, as nodes may carry attributes which are not declared
+            names = OrderedDict()
+            for node in attributes:
+                names.update( (x, None) for x in attributes[node] )
+            self._attribute_columns[partition] = BranchAttributeColumns(list(attributes.keys()), attributes, list(names))
+        self._reset_attribute_caches()
+
+
+    def _reset_attribute_caches(self):
+        """
+            Private method: Discard everything derived from the branch attributes (aligned columns and memoized lookups). This must be called whenever `self._attribute_columns` or `self.attribute_names` change.
+        """
+        self._branch_columns = None
+        self._attribute_cache = None
+        self._corrected_pvalues = None
+
+
+    def _partition_attribute(self, attribute_name, partition):
+        """
+            Private method: Return the dictionary of (string) values for a single attribute and partition, keyed by node. Results are memoized by (attribute, partition), and must not be modified by callers.
+
+            Required arguments:
+                1. **attribute_name**, the attribute of interest
+                2. **partition**, the partition of interest
+        """
+        key = (attribute_name, partition)
+        with self._lock:
+            if self._attribute_cache is None:
+                self._attribute_cache = {}
+            if key not in self._attribute_cache:
+                columns = self._attribute_columns[partition]
+                values = columns.as_list(attribute_name) if attribute_name in columns.values else [None] * len(columns.nodes)
+                partition_attr = {}
+                for node, attribute_value in zip(columns.nodes, values):
+                    if attribute_value is None:
+                        assert(attribute_name == self.fields.original_name), "\n[ERROR] Could not extract branch attribute."
+                    else:
+                        partition_attr[node] = str( attribute_value )
+                self._attribute_cache[key] = partition_attr
+            return self._attribute_cache[key]
+
+
+    def _obtain_branch_columns(self):
+        """
+            Private method: Return the columnar (typed array) branch attributes aligned to each partition's tree, as a dictionary of `BranchAttributeColumns` keyed by partition. These are selected from the stored columns on first use.
+        """
+        with self._lock:
+            if self._branch_columns is None:
+                node_index = self._obtain_node_index()
+                columns = {}
+                for x in range(self.npartitions):
+                    ### Rows follow the node index, so columns can be joined to the tree by position. Any attribute nodes absent from the tree are appended.
+                    stored = self._attribute_columns[x]
+                    nodes = list(node_index[x].names)
+                    nodes += [node for node in stored.nodes if node not in node_index[x].index]
+                    columns[x] = stored.select(nodes, self.attribute_names)
+                self._branch_columns = columns
+            return self._branch_columns
+
+
+    def _attribute_key(self, attribute_name):
+        """
+            Private method: Return the attribute name as it appears in the JSON `branch attributes` field.
+            
+            BUSTED, at least, has a JSON bug which cannot be dealt with in HyPhy: "Unconstrained model" in fits --> "unconstrained" attribute, and similarly "Constrained model"  --> "constrained"
+            This hack will just swap the names.
+        """
+        if self.analysis == self.analysis_names.busted:
+            try:
+                attribute_name = self.fields.busted_fit_to_attr[attribute_name]
+                #print("\n PLEASE NOTE: In the BUSTED JSON file, the model fit names `(Un)constrained model` are matched with the attribute names `(un)constrained`. Phyphy will take care of this mapping for you if/when you provide `(Un)constrained model` to attribute extraction.")
+            except KeyError:
+                pass
+        return attribute_name
+
+    def _extract_slac_sitetable(self, raw, slac_ancestral_type):
         """
             Private method: Extract the specific SLAC tables of interest for parsing to CSV.
         """
         final = {}
         for x in range(self.npartitions):
             part = raw[str(x)]
-            subset = part[self.fields.slac_by_site][self.slac_ancestral_type]
+            subset = part[self.fields.slac_by_site][slac_ancestral_type]
             final[str(x)] = subset
         return final          
+
+
+    def _check_slac_ancestral_type(self, slac_ancestral_type):
+        """
+            Private method: Validate and return the (upper-case) SLAC ancestral type.
+        """
+        slac_ancestral_type = slac_ancestral_type.upper() 
+        assert(slac_ancestral_type in self.analysis_names.slac_ancestral_type), "\n[ERROR]: Argument `slac_ancestral_type` must be either 'AVERAGED' or 'RESOLVED' (case insensitive)."
+        return slac_ancestral_type
        
        
     
@@ -326,70 +615,66 @@ class Extractor():
         
 
 
-    def _parse_sitemethod_to_csv(self, delim):
+    def _obtain_site_block(self, slac_ancestral_type):
         """
-            Private method: Extract a CSV from a **site-level** method JSON, including FEL, SLAC, MEME, FUBAR, LEISR.
+            Private method: Return the cleaned column names and the raw per-partition rows of a **site-level** method JSON, including FEL, SLAC, MEME, FUBAR, LEISR.
+            Column names have spaces replaced with underscores, and MEME html removed.
         """
+        assert(self.analysis in self.analysis_names.site_analyses), "\n[ERROR]: Site tables are only available for site-level methods (" + ", ".join(self.analysis_names.site_analyses) + ")."
         site_block =  self.json[ self.fields.MLE ]
         raw_header = site_block[ self.fields.MLE_headers ]
         raw_header = [str(x[0]) for x in raw_header]
         raw_content = site_block[ self.fields.MLE_content]
         
         if self.analysis == self.analysis_names.slac:
-            raw_content = self._extract_slac_sitetable(raw_content)
+            raw_content = self._extract_slac_sitetable(raw_content, slac_ancestral_type)
         if self.analysis == self.analysis_names.meme:
             raw_header = self._clean_meme_html_header(raw_header)
 
-        final_header = "site" + delim + delim.join( [x.replace(" ","_") for x in raw_header] )
-            
-        if self.npartitions > 1:
-            final_header = "partition" + delim + final_header
-        
+        return [x.replace(" ","_") for x in raw_header], raw_content
+
+
+
+    def _sitemethod_csv_rows(self, raw_content):
+        """
+            Private method: Generate the CSV rows of a **site-level** method, one at a time. Values are written as they appear in the JSON.
+        """
         site_count = 1
-        final_content = ""
         for i in range(self.npartitions):
+            prefix = [i] if self.npartitions > 1 else []
             for row in raw_content[str(i)]:
-                outrow = str(site_count) + delim + delim.join(str(x) for x in row)
-                if self.npartitions > 1:
-                    outrow = "\n" + str(i) + delim + outrow
-                else:
-                    outrow = "\n" + outrow
-                final_content += outrow
+                ### csv.writer writes floats exactly as str() does, so only missing values need converting
+                if None in row:
+                    row = [str(x) for x in row]
+                yield prefix + [site_count] + row
                 site_count += 1
-        
-        with open(self.csv, "w") as f:
-            f.write(final_header + final_content)
+                
+                
+                
+    def _sitemethod_csv_table(self, slac_ancestral_type):
+        """
+            Private method: Return the CSV header and a generator of CSV rows from a **site-level** method JSON, including FEL, SLAC, MEME, FUBAR, LEISR.
+        """
+        header, raw_content = self._obtain_site_block(slac_ancestral_type)
+        final_header = ["site"] + header
+        if self.npartitions > 1:
+            final_header.insert(0, "partition")
+        return final_header, self._sitemethod_csv_rows(raw_content)
 
 
 
-    def _parse_absrel_to_csv(self, delim, original_names):
+    def _absrel_csv_rows(self, original_names):
         """
-            Private method: Extract a CSV from an aBSREL JSON. 
-            CSV contents:
-                Node name, Baseline MG94 omega, Number of inferred rate classes, Tested (bool), Proportion of selected sites, LRT, uncorrected P, bonferroni-holm P
+            Private method: Generate the CSV rows of an aBSREL JSON, one node at a time.
         """
+        columns = self._attribute_columns[0] ## Only allowed single partition for ABSREL
+        names = [self.fields.rate_distributions, self.fields.baseline_omega, self.fields.rate_classes, self.fields.LRT, self.fields.uncorrected_p, self.fields.corrected_p]
+        try:
+            rows = zip(columns.nodes, *[columns.as_list(x) for x in names])
+        except AssertionError:
+            raise KeyError("\n[ERROR]: Unable to parse JSON.")
         
-        header = delim.join( ["node", "baseline_omega", "number_rate_classes", "tested", "prop_sites_selected", "LRT", "uncorrected_P", "corrected_P"] )
-        attr = self.json[ self.fields.branch_attributes ]["0"] ## Only allowed single partition for ABSREL
-        node_names = list( self.json[ self.fields.branch_attributes ]["0"].keys())  
-        
-        full_rows = ""
-        for node in node_names:           
-            try:
-                d = attr[str(node)]
-            except:
-                raise KeyError("\n[ERROR]: Unable to parse JSON.")
-                
-            if original_names is True:
-                try:
-                    outnode = str( d[self.fields.original_name] )
-                except:
-                    outnode = node
-            else:
-                outnode = node
-                
-                
-            rates = d[self.fields.rate_distributions]
+        for node, rates, omega, rate_classes, lrt, uncorrected_p, corrected_p in rows:
             if len(rates) > 1:
                 for pair in rates:
                     if pair[0] > 1.:
@@ -398,23 +683,49 @@ class Extractor():
             else:
                 prop = "0"
             
-            if d[ self.fields.LRT ] == 1 and d[ self.fields.uncorrected_p ] ==  1 and d[ self.fields.corrected_p ] == 1:
+            if lrt == 1 and uncorrected_p ==  1 and corrected_p == 1:
                 run = "0"
             else:
                 run  = "1"
                 
-            row = "\n" + delim.join([node, 
-                                    str(d[self.fields.baseline_omega]), 
-                                    str(d[self.fields.rate_classes]), 
-                                    run,
-                                    prop,
-                                    str(d[self.fields.LRT]), 
-                                    str(d[self.fields.uncorrected_p]), 
-                                    str(d[self.fields.corrected_p]) ])
-            full_rows += row
-        
-        with open(self.csv, "w") as f:
-            f.write(header + full_rows)       
+            yield [node, 
+                   str(omega), 
+                   str(rate_classes), 
+                   run,
+                   prop,
+                   str(lrt), 
+                   str(uncorrected_p), 
+                   str(corrected_p) ]
+        
+        
+        
+    def _absrel_csv_table(self, original_names):
+        """
+            Private method: Return the CSV header and a generator of CSV rows from an aBSREL JSON. 
+            CSV contents:
+                Node name, Baseline MG94 omega, Number of inferred rate classes, Tested (bool), Proportion of selected sites, LRT, uncorrected P, bonferroni-holm P
+        """
+        header = ["node", "baseline_omega", "number_rate_classes", "tested", "prop_sites_selected", "LRT", "uncorrected_P", "corrected_P"]
+        return header, self._absrel_csv_rows(original_names)
+
+
+
+    def _csv_table(self, original_names = True, slac_ancestral_type = "AVERAGED"):
+        """
+            Private method: Return the CSV header and a generator of CSV rows for this analysis, or None if the analysis is not convertable to CSV.
+        """
+        ### FEL, MEME, SLAC, FUBAR, LEISR ###
+        if self.analysis in self.analysis_names.site_analyses:
+            slac_ancestral_type = self._check_slac_ancestral_type(slac_ancestral_type)
+            return self._sitemethod_csv_table(slac_ancestral_type)
+       
+        ### aBSREL ###
+        elif self.analysis == self.analysis_names.absrel:
+            assert(type(original_names) == bool), "\n[ERROR]: Argument `original_names` must be boolean."
+            return self._absrel_csv_table(original_names)
+        
+        else:
+            return None
         
     
     def _reform_rate_phrase(self, phrase):
@@ -424,7 +735,7 @@ class Extractor():
             Required arguments:
                 1. **phrase**, the key to reform
         """
-        find = re.search(self.fields.substitution_rate, phrase)
+        find = self.fields.substitution_rate.search(phrase)
         if find:
             source = find.group(1).upper()
             target = find.group(2).upper()
@@ -436,35 +747,66 @@ class Extractor():
 
 
 
-    def _replace_tree_branch_length(self, etree, bl_dict):
+    def _aligned_attribute(self, attribute_name, partition):
         """
-            Private method: 
-            Replacing the branch length for a given node with the provided value (ie, replace <stuff> in :Node<stuff>)
-                            
+            Private method: Return a list of the (string) attribute values for a partition, aligned to that partition's node index. Nodes without a value are given "".
+            
             Required arguments:
-                1. **etree**, the single ete tree to manipulate
-                2. **bl_dict**, dictionary of new branch lengths
+                1. **attribute_name**, the attribute of interest
+                2. **partition**, the partition of interest
+        """
+        return self._aligned_attributes([attribute_name], partition)[0]
+
+
+
+    def _aligned_attributes(self, attribute_names, partition):
         """
-        for node in etree.traverse("postorder"):
-            if not node.is_root():
-                node.dist = bl_dict[node.name]     
-        return etree
+            Private method: Return a list with, for each given attribute, the list of its (string) values for a partition, aligned to that partition's node index. Nodes without a value are given "".
+            All attributes are gathered in a single pass over the nodes.
+
+            Required arguments:
+                1. **attribute_names**, a list of the attributes of interest
+                2. **partition**, the partition of interest
+        """
+        attribute_names = [self._attribute_key(attribute_name) for attribute_name in attribute_names]
+        for attribute_name in attribute_names:
+            assert(attribute_name in self.attribute_names), "\n[ERROR]: Specified attribute does not exist in JSON."
+        lookups = [self._partition_attribute(attribute_name, partition) for attribute_name in attribute_names]
+        rows = [[lookup.get(name, "") for lookup in lookups] for name in self._obtain_node_index()[partition].names]
+        return [list(column) for column in zip(*rows)]
         
                 
 
-    def _tree_to_original_names(self, etree):
+    def _detached(self, value):
         """
-            Private method: 
-            Convert node names in a tree to original names
-            
+            Private method: Return a value taken from the parsed JSON for a caller. Frozen Extractors return a deep copy of lists and dictionaries, so that callers can never modify the JSON which every thread shares.
+        """
+        if self._frozen and isinstance(value, (list, dict)):
+            return copy.deepcopy(value)
+        return value
+
+
+
+    def _node_names(self, partition, original_names = False):
+        """
+            Private method: Return the node names of a partition's tree, aligned to its node index, as HyPhy names or as original names.
+            Original names are found in a single pass over the node index, and are built only once per partition.
+
             Required arguments:
-                1. **etree**, the single ete tree to manipulate
+                1. **partition**, the partition of interest
 
+            Optional keyword arguments:
+                1. **original_names**, Boolean to indicate whether original names should be used. Default: False.
         """
-        for name in self.original_names:
-            itsme = etree.search_nodes(name=name)[0]
-            itsme.name = self.original_names[name]
-        return etree
+        names = self._obtain_node_index()[partition].names
+        if original_names is True:
+            with self._lock:
+                if self._original_node_names is None:
+                    self._original_node_names = {}
+                if partition not in self._original_node_names:
+                    self._original_node_names[partition] = [self.original_names.get(name, name) for name in names]
+                names = self._original_node_names[partition]
+        return names
     ############################################## PUBLIC FUNCTIONS ################################################### 
 
 
@@ -519,6 +861,26 @@ class Extractor():
     
     
     
+    def extract_analysis_version(self):
+        """
+            Return the version of the analysis (e.g. FEL or aBSREL) that produced the JSON, as a string, or None if the JSON does not record it (e.g. RELAX in HyPhy 2.3.7).
+            Note that HyPhy itself does not record its own version in the JSON.
+
+            No arguments are required.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> e.extract_analysis_version()
+               '2.00'
+        """
+        try:
+            return str( self.json[ self.fields.analysis_description ][ self.fields.analysis_description_version ] )
+        except KeyError:
+            return None
+    
+    
+    
     def extract_partition_count(self):
         """
             Return the number of partitions in the analysis.
@@ -535,6 +897,37 @@ class Extractor():
 
 
 
+    def extract_node_index(self, partition = None):
+        """
+            Return the integer node index of the input tree, as a `NodeIndex` object. Nodes are numbered densely in **postorder** (the root is last), and the index provides parent and child arrays.
+            Per-node arrays returned by other methods (e.g. :code:`.extract_branch_attribute_array()` and :code:`.extract_branch_set_labels()`) are aligned to this order, so they can be joined by integer position.
+            For analyses with multiple partitions, returns a *dictionary* of `NodeIndex` objects unless a partition is specified.
+            
+            Optional keyword arguments:
+                1. **partition**, Integer indicating which partition's index to return if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is ignored for single-partitioned analyses.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> idx = e.extract_node_index()
+               >>> idx.names[:4]
+               ['Pig', 'Cow', 'Node3', 'Horse']
+               >>> idx.parent[:4]
+               array([2, 2, 5, 5])
+               >>> idx.position("Node3")
+               2
+        """
+        node_index = self._obtain_node_index()
+        if self.npartitions == 1:
+            return node_index[0]
+        else:
+            if partition is None:
+                return dict(node_index)
+            else:
+                return node_index[int(partition)]
+
+
+
     def extract_input_tree(self, partition = None, original_names = False, node_labels=False):
         """
             Return the inputted newick phylogeny, whose nodes have been labeled by HyPhy (if node labels were not present).
@@ -563,21 +956,24 @@ class Extractor():
                (((((AF231119:0.00307476,AF231115:1e-10)Node4:1e-10,((AF082576:0.00309362,AF231113:1e-10)Node8:0.0031872,AF231114:0.013292)Node7:0.0030793)Node3:0.00310106,(AF231117:0.00396728,AF231118:0.0665375)Node12:0.00249394)Node2:0.00637034,(AF186242:1e-10,(AF186243:1e-10,AF234767:0.0278842)Node17:0.00311418)Node15:0.00307177)Node1:1e-10,(AF186241:0.00306598,AF231116:1e-10)Node20:1e-10,AF187824:0.00632863);
         """
         
+        if partition is None:
+            partitions = list(self.input_tree.keys())
+        else:
+            partitions = [int(partition)]
+
         if original_names is True:
-            original_tree = {}
-            for key in self.input_tree_ete:
-                t = deepcopy(self.input_tree_ete[key])
-                t = self._tree_to_original_names(t)
-                original_tree[key] = t.write(format = 1).strip()
-        else:      
-            original_tree = self.input_tree
+            node_index = self._obtain_node_index()
+            jobs = [(node_index[key], None, self._node_names(key, original_names = True), None, None) for key in partitions]
+            trees = dict( zip(partitions, self._map_partitions(_write_tree, jobs)) )
+        else:
+            trees = dict( (key, self.input_tree[key]) for key in partitions )
         if partition is None:
             if self.npartitions == 1:
-                return original_tree[0]
+                return trees[0]
             else:
-                return original_tree
+                return trees
         else:
-            return original_tree[int(partition)] 
+            return trees[int(partition)]
     
     
     
@@ -626,7 +1022,7 @@ class Extractor():
         except: 
             raise KeyError("\n[ERROR]: Invalid model component.")
             
-        return component
+        return self._detached(component)
 
 
     def extract_model_logl(self, model_name):
@@ -708,7 +1104,7 @@ class Extractor():
             else:
                 rates = {}
                 for k,v in rawrates.items():
-                    find = re.search(r""+self.fields.nonsyn_syn_ratio_for +" \*(\w+)\*", k)
+                    find = self.fields.nonsyn_syn_ratio_set.search(k)
                     if find:
                         rates[str(find.group(1))] = {self.fields.omega: v[0][0], self.fields.proportion: 1.0}
                     else:
@@ -716,7 +1112,36 @@ class Extractor():
         else:
             for rr in rawrates:
                 rates[str(rr)] = rawrates[rr]
-        return rates
+        return self._detached(rates)
+
+
+
+    def _rate_distribution_rows(self, model_name):
+        """
+            Private method: Return the rate distributions of a given model as a list of tidy rows, `(branch set, rate, rate class, value, proportion)`. See :code:`.extract_rate_distribution_table()` for the layout.
+
+            Required arguments:
+                1. **model_name**, the name of the model of interest
+        """
+        rawrates = self.extract_model_component(model_name, self.fields.rate_distributions)
+        rows = []
+        for k, v in rawrates.items():
+            rate_phrase = self.fields.substitution_rate.search(k)
+            ratio_set = self.fields.nonsyn_syn_ratio_set.search(k)
+            if rate_phrase:
+                rows.append( ("", rate_phrase.group(1).upper() + rate_phrase.group(2).upper(), 0, float(v), np.nan) )
+            elif ratio_set:
+                rows.append( (str(ratio_set.group(1)), self.fields.omega, 0, float(v[0][0]), 1.) )
+            elif isinstance(v, dict):
+                ### Either omega rate classes of a branch set (e.g. {"Test": {"0": {"omega": w, "proportion": p}}}), or summaries (e.g. aBSREL's "Per-branch omega")
+                for rate_class, entry in v.items():
+                    if isinstance(entry, dict):
+                        rows.append( (str(k), self.fields.omega, int(rate_class), float(entry[self.fields.omega]), float(entry[self.fields.proportion])) )
+                    else:
+                        rows.append( (str(k), str(rate_class), 0, float(entry), np.nan) )
+            else:
+                rows.append( ("", str(k), 0, float(v), np.nan) )
+        return rows
 
 
 
@@ -794,6 +1219,31 @@ class Extractor():
                 else:
                     final_branch_sets[str(v)] = [str(k)]
         return final_branch_sets
+
+
+
+    def extract_branch_set_labels(self, partition = None):
+        """
+            Return branch set designations as an array aligned to the node index (see :code:`.extract_node_index()`), with "" for nodes which belong to no branch set (e.g. the root).
+            NOTE: As for :code:`.extract_branch_sets()`, assumes that all partitions share the same branch sets.
+            
+            Optional keyword arguments:
+                1. **partition**, Integer indicating which partition's node order to use if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is ignored for single-partitioned analyses.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/BUSTED.json") ## Define a BUSTED Extractor, for example
+               >>> e.extract_branch_set_labels()[:4]
+               array(['test', 'test', 'test', 'test'], dtype=object)
+        """
+        branch_sets = self.extract_branch_sets()
+        if self.npartitions == 1:
+            partition = 0
+        assert(partition is not None), "\n[ERROR]: Please specify a partition."
+        node_index = self._obtain_node_index()[int(partition)]
+        labels = np.empty(len(node_index), dtype = object)
+        labels[:] = node_index.align(branch_sets, default = "")
+        return labels
      ###################################################################################################################
 
 
@@ -844,53 +1294,94 @@ class Extractor():
                {'0557_7': '1', '0557_4': '1', 'Node29': '1', '0564_13': '1', 'Node25': '1', 'Node20': '1', 'Node23': '1', '0557_11': '1', '0557_12': '1', '0557_13': '1', '0564_22': '1', '0564_21': '1', '0564_15': '2', 'Node9': '1', '0564_1': '1', '0564_3': '2', 'Separator': '2', '0564_5': '1', '0564_6': '1', '0564_7': '1', '0564_9': '1', '0557_24': '1', 'Node7': '1', 'Node6': '1', '0557_9': '1', 'Node17': '1', 'Node16': '1', 'Node19': '1', 'Node32': '1', 'Node30': '1', '0557_6': '1', 'Node36': '1', 'Node35': '2', '0557_5': '1', '0557_2': '1', '0564_11': '2', '0564_17': '1', 'Node18': '1', '0557_25': '1', '0564_4': '2', 'Node8': '1', '0557_26': '1', '0557_21': '1', 'Node53': '1'}
 
         """
-        #### BUSTED, at least, has a JSON bug which cannot be dealt with in HyPhy: "Unconstrained model" in fits --> "unconstrained" attribute, and similarly "Constrained model"  --> "constrained"
-        #### This hack will just swap the names.
-        if self.analysis == self.analysis_names.busted:
-            try:
-                attribute_name = self.fields.busted_fit_to_attr[attribute_name]
-                #print("\n PLEASE NOTE: In the BUSTED JSON file, the model fit names `(Un)constrained model` are matched with the attribute names `(un)constrained`. Phyphy will take care of this mapping for you if/when you provide `(Un)constrained model` to attribute extraction.")
-            except KeyError:
-                pass
-        ##################################################################     
-              
+        attribute_name = self._attribute_key(attribute_name)
         assert(attribute_name in self.attribute_names), "\n[ERROR]: Specified attribute does not exist in JSON."
+        ### Lookups are memoized, so callers are given copies
         if self.npartitions == 1:
-            partition = 0
+            return dict( self._partition_attribute(attribute_name, 0) )
+        else:
+            if partition is None:
+                return dict( (x, dict(self._partition_attribute(attribute_name, x))) for x in range(self.npartitions) )
+            else:
+                return dict( self._partition_attribute(attribute_name, int(partition)) )
+
+
+
+    def extract_branch_columns(self, partition = None):
+        """
+            Return the branch attributes in columnar form, as a `BranchAttributeColumns` object holding one typed NumPy array per attribute (plus a missing-value mask), aligned to a shared node order.
+            Unlike :code:`.extract_branch_attribute()`, values are **not** converted to strings, and repeated queries are simple array lookups. Arrays are read-only views of the columns the Extractor keeps.
+            If there are multiple partitions, default returns a dictionary of `BranchAttributeColumns` for all partitions.
             
-        attr_dict = {}
-        for x in range(self.npartitions):
-            partition_attr = {}
-            for node in self.branch_attributes[x]:
-                try:
-                    attribute_value = str( self.branch_attributes[x][node][attribute_name] )
-                    partition_attr[str(node)] = attribute_value
-                except:
-                    assert(attribute_name == self.fields.original_name), "\n[ERROR] Could not extract branch attribute."
-            attr_dict[x] = partition_attr   
+            Optional keyword arguments:
+                1. **partition**, Integer indicating which partition's columns to return if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is **ignored** for single-partitioned analyses.      
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/ABSREL.json") ## Define an ABSREL Extractor, for example
+               >>> columns = e.extract_branch_columns()
+               >>> columns.nodes[:3]
+               ['0564_7', '0564_11', '0564_4']
+               >>> values, missing = columns.column("Rate classes")
+               >>> values[:3]
+               array([1, 2, 2])
+        """
+        columns = self._obtain_branch_columns()
         if self.npartitions == 1:
-            return attr_dict[0]
+            return columns[0].view()
         else:
             if partition is None:
-                return attr_dict
+                return dict( (x, columns[x].view()) for x in columns )
             else:
-                return attr_dict[int(partition)]
-        
-        
-        
+                return columns[int(partition)].view()
         
-    def map_branch_attribute(self, attribute_name, original_names = False, partition = None):
+
+
+    def extract_branch_attribute_array(self, attribute_name, partition = None):
         """
-            Return the newick phylogeny with specified attribute mapped into the phylogeny **as branch lengths**.
-            If there are multiple partitions, default returns a dictionary of mapped trees for all partitions. 
-            If partition is specified, only the attribute for the given partition will be returned. NOTE: PARTITION STARTS FROM 0.            
+            Return a typed NumPy array of the given attribute and a boolean array indicating which nodes have no value, as a tuple :code:`(values, missing)`. 
+            Arrays are read-only, and aligned to the node order given by :code:`.extract_branch_columns(partition).nodes`.
+            If there are multiple partitions, default returns a dictionary of tuples for all partitions. 
 
             Required positional arguments:
                 1. **attribute_name**, the name of the attribute to obtain. Attribute names available can be revealed with the method `.reveal_branch_attributes()`.
                 
             Optional keyword arguments:
-                1. **partition**, Integer indicating which partition's tree to return (as a string) if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is ignored for single-partitioned analyses.      
-                2. **original_names**, reformat the tree with the original names (as opposed to hyphy-friendly names with forbidden characters replaced). In most cases hyphy and original names are identical. Default: False.
+                1. **partition**, Integer indicating which partition's attribute to return if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is **ignored** for single-partitioned analyses.      
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> values, missing = e.extract_branch_attribute_array("Nucleotide GTR")
+               >>> values[:3]
+               array([0.20913991, 0.01783411, 0.24828667])
+        """
+        attribute_name = self._attribute_key(attribute_name)
+        assert(attribute_name in self.attribute_names), "\n[ERROR]: Specified attribute does not exist in JSON."
+        columns = self._obtain_branch_columns()
+        if self.npartitions == 1:
+            return columns[0].view().column(attribute_name)
+        else:
+            if partition is None:
+                return dict( (x, columns[x].view().column(attribute_name)) for x in columns )
+            else:
+                return columns[int(partition)].view().column(attribute_name)
+        
+        
+        
+        
+    def map_branch_attribute(self, attribute_name, original_names = False, partition = None):
+        """
+            Return the newick phylogeny with specified attribute mapped into the phylogeny **as branch lengths**.
+            If there are multiple partitions, default returns a dictionary of mapped trees for all partitions. 
+            If partition is specified, only the attribute for the given partition will be returned. NOTE: PARTITION STARTS FROM 0.            
+
+            Required positional arguments:
+                1. **attribute_name**, the name of the attribute to obtain. Attribute names available can be revealed with the method `.reveal_branch_attributes()`.
+                
+            Optional keyword arguments:
+                1. **partition**, Integer indicating which partition's tree to return (as a string) if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is ignored for single-partitioned analyses.      
+                2. **original_names**, reformat the tree with the original names (as opposed to hyphy-friendly names with forbidden characters replaced). In most cases hyphy and original names are identical. Default: False.
 
             **Examples:**
 
@@ -901,16 +1392,17 @@ class Extractor():
         """
 
         assert(attribute_name != self.fields.rate_distributions), "\n[ERROR]: Cannot map rate distributions onto a tree."
-        etree = deepcopy( self.input_tree_ete )
-        
-        mapped_trees = {}
-        for key in etree:
-            t = etree[key]
-            attr_dict = self.extract_branch_attribute(attribute_name, partition = key)
-            t = self._replace_tree_branch_length( t, attr_dict )
-            if original_names is True:
-                t = self._tree_to_original_names(t)
-            mapped_trees[key] = t.write(format=1).strip()
+        if self.npartitions == 1:
+            partitions = [0]
+        elif partition is None:
+            partitions = list(self.input_tree.keys())
+        else:
+            partitions = [int(partition)]
+
+        ### The shared node index is rendered with per-call branch lengths and names; no tree is copied or modified
+        node_index = self._obtain_node_index()
+        jobs = [(node_index[key], self._aligned_attribute(attribute_name, key), self._node_names(key, original_names), None, None) for key in partitions]
+        mapped_trees = dict( zip(partitions, self._map_partitions(_write_tree, jobs)) )
         if self.npartitions == 1:
             return mapped_trees[0]
         else:
@@ -954,6 +1446,136 @@ class Extractor():
 
 
 
+    def _model_list(self, models):
+        """
+            Private method: Return the list of fitted models which have branch lengths, checking any requested models.
+
+            Required arguments:
+                1. **models**, a list of model names, a single model name, or None for all fitted models with branch lengths
+        """
+        if models is None:
+            return [model for model in self.fitted_models if self._attribute_key(model) in self.attribute_names]
+        if type(models) is str:
+            models = [models]
+        for model in models:
+            assert(model in self.fitted_models and self._attribute_key(model) in self.attribute_names), "\n[ERROR]: Model " + str(model) + " is not a fitted model with branch lengths."
+        return list(models)
+
+
+
+    def _branch_length_matrix(self, models, partition):
+        """
+            Private method: Return a float64 array (branches x models) of branch lengths for a partition, with rows in node index order (the root is excluded) and NaN for missing lengths, plus the matching boolean mask of missing lengths.
+
+            Required arguments:
+                1. **models**, list of model names
+                2. **partition**, the partition of interest
+        """
+        nbranches = len(self._obtain_node_index()[partition]) - 1
+        columns = self._obtain_branch_columns()[partition]
+        lengths = np.empty((nbranches, len(models)), dtype = np.float64)
+        missing = np.empty((nbranches, len(models)), dtype = bool)
+        for j, model in enumerate(models):
+            values, absent = columns.column( self._attribute_key(model) )
+            lengths[:,j] = values[:nbranches]
+            missing[:,j] = absent[:nbranches]
+        lengths[missing] = np.nan
+        return lengths, missing
+
+
+
+    def extract_branch_length_matrix(self, models = None, partition = None):
+        """
+            Return the branch lengths of several fitted models as a single matrix, with one row per branch and one column per model, for numeric work (e.g. comparing models' tree lengths).
+            Returns a dictionary with keys:
+                + :code:`models`, the list of models (columns)
+                + :code:`branches`, the list of branch (node) names (rows), in node index order, i.e. postorder without the root (see :code:`.extract_node_index()`)
+                + :code:`lengths`, a float64 array of shape (branches, models). Missing lengths are NaN.
+            If there are multiple partitions, default returns a dictionary of these for all partitions.
+
+            Optional keyword arguments:
+                1. **models**, a list of model names (columns). Default: all fitted models with branch lengths (see :code:`.reveal_fitted_models()`).
+                2. **partition**, Integer indicating which partition's matrix to return if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is **ignored** for single-partitioned analyses.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> m = e.extract_branch_length_matrix()
+               >>> m["models"]
+               ['Nucleotide GTR', 'Global MG94xREV']
+               >>> m["lengths"].sum(axis = 0) ## Tree length under each model
+               array([1.6948108 , 1.72388368])
+        """
+        models = self._model_list(models)
+        if self.npartitions == 1:
+            partitions = [0]
+        elif partition is None:
+            partitions = list(self.input_tree.keys())
+        else:
+            partitions = [int(partition)]
+
+        matrices = {}
+        for key in partitions:
+            names = self._obtain_node_index()[key].names
+            matrices[key] = {"models": list(models), "branches": names[:-1], "lengths": self._branch_length_matrix(models, key)[0]}
+        if self.npartitions == 1:
+            return matrices[0]
+        else:
+            if partition is None:
+                return matrices
+            else:
+                return matrices[int(partition)]
+
+
+
+    def extract_model_trees(self, models = None, partition = None, original_names = False):
+        """
+            Return newick phylogenies fitted to several models at once, as an ordered dictionary keyed by model. Each value is the same as :code:`.extract_model_tree()` returns for that model, i.e. a dictionary of trees keyed by partition if there are multiple partitions and no partition is specified.
+            All trees are written in one pass, from the branch length matrix (see :code:`.extract_branch_length_matrix()`) and the shared node index.
+
+            Optional keyword arguments:
+                1. **models**, a list of model names. Default: all fitted models with branch lengths (see :code:`.reveal_fitted_models()`).
+                2. **partition**, Integer indicating which partition's trees to return if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is ignored for single-partitioned analyses.
+                3. **original_names**, reformat the trees with the original names (as opposed to hyphy-friendly names with forbidden characters replaced). In most cases hyphy and original names are identical. Default: False.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> trees = e.extract_model_trees()
+               >>> list(trees.keys())
+               ['Nucleotide GTR', 'Global MG94xREV']
+               >>> trees["Global MG94xREV"] == e.extract_model_tree("Global MG94xREV")
+               True
+        """
+        models = self._model_list(models)
+        if self.npartitions == 1:
+            partitions = [0]
+        elif partition is None:
+            partitions = list(self.input_tree.keys())
+        else:
+            partitions = [int(partition)]
+
+        node_index = self._obtain_node_index()
+        jobs = []
+        for key in partitions:
+            names = self._node_names(key, original_names)
+            lengths, missing = self._branch_length_matrix(models, key)
+            for j, model in enumerate(models):
+                assert(not missing[:,j].any()), "\n[ERROR]: Model " + model + " is missing branch lengths in partition " + str(key) + "."
+                jobs.append( (node_index[key], np.append(lengths[:,j], np.nan), names, None, None) )
+        written = self._map_partitions(_write_tree, jobs)
+
+        trees = OrderedDict()
+        for j, model in enumerate(models):
+            model_trees = dict( (key, written[i * len(models) + j]) for i, key in enumerate(partitions) )
+            if self.npartitions == 1 or partition is not None:
+                trees[model] = model_trees[partitions[0]]
+            else:
+                trees[model] = model_trees
+        return trees
+
+
+
     def extract_absrel_tree(self, original_names = False, update_branch_lengths = None, p = 0.05, labels = None):
         """
             Return newick phylogeny in **Extended Newick Format** (:code:`ete`-style features) as selection *indicators* (Default is 0 for not selected, 1 for selected) at the specified p threshold. **aBSREL only.**
@@ -992,24 +1614,85 @@ class Extractor():
         assert(self.analysis == self.analysis_names.absrel), "\n [ERROR]: The method .extract_absrel_tree() can only be used with an aBSREL JSON."
         
         if labels is None:
-            self.selected_labels = ("1", "0")
+            selected_labels = ("1", "0")
         else:
             assert(len(labels) == 2), "\n [ERROR]: Improper labels suppled to extract_absrel_tree. Must be a list or tuple of length two, for [selected, not selected]"
-            self.selected_labels = tuple([str(x) for x in labels])
+            selected_labels = tuple([str(x) for x in labels])
         assert( p >= 0 and p <= 1), "\n [ERROR]: Argument `p` must be a float between 0-1, for calling selection."
-        self.p_selected = p
-        
-        ### Add selection to attributes with value based on p and labels.
-        self.attribute_names[self.fields.selected] = self.fields.phyphy_label
-        for part in self.branch_attributes:
-            for node in self.branch_attributes[part]:               
-                if float(self.branch_attributes[part][node][self.fields.corrected_p]) <= self.p_selected:
-                    self.branch_attributes[part][node][self.fields.selected] = self.selected_labels[0]
-                else:
-                    self.branch_attributes[part][node][self.fields.selected] = self.selected_labels[1]
+        
+        ### Selection indicators come from the cached corrected P-values and are passed straight to the writer, so the Extractor is not modified
+        selected = self.extract_absrel_selection([p])["selected"][:,0]
+        return self._absrel_selection_tree(selected, selected_labels, original_names, update_branch_lengths)
+
+
+
+    def _corrected_pvalue_array(self):
+        """
+            Private method: Return the aBSREL corrected P-values as a float64 array in node index order (the root, which is last, is NaN). This is built once from the typed branch attribute columns, and must not be modified by callers.
+        """
+        with self._lock:
+            if self._corrected_pvalues is None:
+                pvalues, missing = self._obtain_branch_columns()[0].column(self.fields.corrected_p) ## Only allowed single partition for ABSREL
+                pvalues = pvalues.astype(np.float64)
+                pvalues[missing] = np.nan
+                pvalues.flags.writeable = False
+                self._corrected_pvalues = pvalues
+            return self._corrected_pvalues
+
+
+
+    def _absrel_selection_tree(self, selected, selected_labels, original_names, update_branch_lengths):
+        """
+            Private method: Return the aBSREL feature tree with a `Selected` feature for each branch, written from the shared node index.
+
+            Required arguments:
+                1. **selected**, a boolean array of selection calls for each branch, in node index order (without the root)
+                2. **selected_labels**, a tuple of the labels for (selected, not selected)
+                3. **original_names**, Boolean to indicate if the tree should have original names
+                4. **update_branch_lengths**, a model name whose branch lengths are used, or None
+        """
+        if update_branch_lengths is not None:
+            assert(update_branch_lengths in self.fitted_models and update_branch_lengths in self.reveal_branch_attributes()), "\n [ERROR]: Specified model for updating branch lengths is not available."
+            lengths = self._aligned_attribute(update_branch_lengths, 0)
+        else:
+            lengths = None
+        values = [selected_labels[0] if x else selected_labels[1] for x in selected] + [""]
+        node_index = self._obtain_node_index()[0]
+        return _write_tree( (node_index, lengths, self._node_names(0, original_names), [(self.fields.selected, values)], [(self.fields.selected, 0)]) )
+
+
+
+    def extract_absrel_selection(self, thresholds, original_names = False):
+        """
+            Call selection on each aBSREL branch at several P-value thresholds at once, returning an ordered dictionary with keys **aBSREL only.**
+                + :code:`node`, the branch names, in the node order of :code:`.extract_node_index()` (i.e. postorder, without the root)
+                + :code:`thresholds`, the float64 array of thresholds
+                + :code:`selected`, a boolean array of shape (branches, thresholds), True where the branch's corrected P-value is at most the threshold
+            The corrected P-values are parsed once and cached, so repeated calls (e.g. for a sensitivity analysis) only compare arrays. Trees for a given threshold are available from :code:`.extract_absrel_tree()`.
+
+            Required arguments:
+                1. **thresholds**, a list or array of P-value thresholds between 0 and 1 (a single number is also accepted)
 
-        ## Send to feature extractor
-        return self.extract_feature_tree(self.fields.selected, original_names = original_names, update_branch_lengths = update_branch_lengths)
+            Optional keyword arguments:
+                1. **original_names**, Boolean to indicate if the `node` array should contain original names (True) or HyPhy-reformatted names (False). Default: False.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/ABSREL.json")
+               >>> calls = e.extract_absrel_selection([0.01, 0.05, 0.3])
+               >>> calls["selected"].sum(axis = 0) ## Number of selected branches at each threshold
+               array([1, 3, 4])
+        """
+        assert(self.analysis == self.analysis_names.absrel), "\n [ERROR]: Selection calls are only available for aBSREL."
+        thresholds = np.atleast_1d( np.asarray(thresholds, dtype = np.float64) )
+        assert(thresholds.ndim == 1 and ((thresholds >= 0) & (thresholds <= 1)).all()), "\n [ERROR]: Thresholds must be floats between 0-1, for calling selection."
+        pvalues = self._corrected_pvalue_array()[:-1]
+
+        calls = OrderedDict()
+        calls["node"] = np.array(self._node_names(0, original_names)[:-1], dtype = object)
+        calls["thresholds"] = thresholds
+        calls["selected"] = pvalues[:, None] <= thresholds[None, :] ## NaN (missing) P-values are never selected
+        return calls
 
 
 
@@ -1048,41 +1731,44 @@ class Extractor():
         
         if type(feature) is str:
             feature = [feature]
+        feature = list(feature)
 
         if update_branch_lengths is not None:
             assert(update_branch_lengths in self.fitted_models and update_branch_lengths in self.reveal_branch_attributes()), "\n [ERROR]: Specified model for updating branch lengths is not available."
-            bl_dict = self.extract_branch_attribute(update_branch_lengths, partition = partition)
 
-        etree = deepcopy( self.input_tree_ete )
-        
-        feature_trees = {}
-        for key in etree:
-            t = etree[key]
-            if update_branch_lengths is not None:
-                t = self._replace_tree_branch_length( t, bl_dict )
-            if original_names is True:
-                t = self._tree_to_original_names(t) 
-                
-            out_features = []
-            for feat in feature:
-                outfeat = re.sub("\s+", "", feat) ## Remove all whitespace from features.
-                out_features.append(outfeat)
-                assert(feat in self.attribute_names), "\n[ERROR]: Specified feature is not an available attribute."
-                
-                feat_dict = self.extract_branch_attribute(feat, partition = partition)
-                for node in t.traverse("postorder"):
-                    if not node.is_root():
-                        ## in case
-                        if feat == self.fields.original_name and not node.is_tip():
-                            node.add_feature(outfeat, "")
-                        else:
-                            node.add_feature(outfeat, feat_dict[node.name])        
-               
-            treestring = t.write(format=1, features = out_features).strip()
+        out_features = []
+        for feat in feature:
+            assert(feat in self.attribute_names), "\n[ERROR]: Specified feature is not an available attribute."
+            out_features.append( re.sub("\\s+", "", feat) ) ## Remove all whitespace from features.
+
+        if self.npartitions == 1:
+            partitions = [0]
+        elif partition is None:
+            partitions = list(self.input_tree.keys())
+        else:
+            partitions = [int(partition)]
+
+        ### The shared node index is rendered with per-call branch lengths, names, and features; no tree is copied or modified
+        node_index = self._obtain_node_index()
+        jobs = []
+        for key in partitions:
+            ### Branch lengths and all features are gathered in one pass over the nodes
+            if update_branch_lengths is None:
+                values = self._aligned_attributes(feature, key)
+                lengths = None
+            else:
+                values = self._aligned_attributes([update_branch_lengths] + feature, key)
+                lengths = values.pop(0)
+            features = []
+            for feat, outfeat, feat_values in zip(feature, out_features, values):
+                if feat == self.fields.original_name:
+                    ## in case
+                    feat_values = [value if is_tip else "" for value, is_tip in zip(feat_values, node_index[key].is_tip)]
+                features.append( (outfeat, feat_values) )
             ## Some vix engines require root to have feature, so we add a dummy feature here
-            rootstring = ":".join( [x + "=0" for x in out_features] )
-            treestring = treestring.strip(";") + "[&&NHX:" + rootstring + "];"
-            feature_trees[key] = treestring
+            root_features = [(x, 0) for x in out_features]
+            jobs.append( (node_index[key], lengths, self._node_names(key, original_names), features, root_features) )
+        feature_trees = dict( zip(partitions, self._map_partitions(_write_tree, jobs)) )
         if self.npartitions == 1:
             return feature_trees[0]
         else:
@@ -1117,7 +1803,7 @@ class Extractor():
         
         
 
-    def extract_csv(self, csv, delim = ",", original_names = True, slac_ancestral_type = "AVERAGED"):
+    def extract_csv(self, csv, delim = ",", original_names = True, slac_ancestral_type = "AVERAGED", compression = "infer"):
         """
             
             Extract a CSV from JSON, for certain methods:
@@ -1189,13 +1875,16 @@ class Extractor():
                 
                 
             
+            Rows are streamed to the output as they are produced, so the full CSV is never held in memory. With a single-character delimiter, fields containing the delimiter are quoted (:code:`csv.writer` semantics); see :code:`writers.write_delimited()`.
+            
             Required positional arguments:
-                1. **csv**, File name for output CSV
+                1. **csv**, File name for output CSV, or an open file-like object (which is written to but not closed)
                 
             Optional keyword arguments:
                 1. **delim**, A different delimitor for the output, e.g. "\t" for tab
                 2. **original_names**, An **ABSREL** specific boolean argument to indicate whether HyPhy-reformatted branch should be used in output csv (False), or original names as present in the input data alignment should be used (True). Default: True
                 3. **slac_ancestral_type**, A **SLAC** specific argument, either "AVERAGED" (Default) or "RESOLVED" (case insensitive) to indicate whether reported results should be from calculations done on either type of ancestral counting.
+                4. **compression**, Compression for the output file, one of "infer" (Default, determined from a `.gz` or `.zst` file extension), "gzip", "zstd", or None. Zstandard output requires the `zstandard` package.
 
 
             **Examples:**
@@ -1218,27 +1907,193 @@ class Extractor():
                >>> e.extract_csv("slac.csv")
                >>> ### Specify to export ancestral RESOLVED inferences  
                >>> e.extract_csv("slac.csv", slac_ancestral_type = "RESOLVED")
+               >>> ### Compressed output, and output to an open file
+               >>> e.extract_csv("slac.csv.gz")
+               >>> with open("slac.csv", "w") as f:
+               ...     e.extract_csv(f)
         """       
         
-        self.csv = csv
-        
-        ### FEL, MEME, SLAC, FUBAR, LEISR ###
         if self.analysis in self.analysis_names.site_analyses:
-            slac_ancestral_type = slac_ancestral_type.upper() 
-            assert(slac_ancestral_type in self.analysis_names.slac_ancestral_type), "\n[ERROR]: Argument `slac_ancestral_type` must be either 'AVERAGED' or 'RESOLVED' (case insensitive)."
-            self.slac_ancestral_type = slac_ancestral_type
-            self._parse_sitemethod_to_csv(delim)
-       
-        ### aBSREL ###
-        elif self.analysis == self.analysis_names.absrel:
-            assert(type(original_names) == bool), "\n[ERROR]: Argument `original_names` must be boolean."
-            self._parse_absrel_to_csv(delim, original_names)
-
+            slac_ancestral_type = self._check_slac_ancestral_type(slac_ancestral_type)
+        
+        table = self._csv_table(original_names = original_names, slac_ancestral_type = slac_ancestral_type)
+        if table is None:
+            print("\nContent from provided analysis is not convertable to CSV.")
+        else:
+            header, rows = table
+            write_delimited(csv, header, rows, delim = delim, compression = compression)
+ 
+ 
+    def extract_site_table(self, columns = None, slac_ancestral_type = "AVERAGED", as_structured = False):
+        """
+            Return the site-level results of FEL, SLAC, MEME, FUBAR, or LEISR as NumPy arrays, without going through a CSV.
+            By default, returns an ordered dictionary of column name to array. Columns are:
+                + :code:`partition`, the partition (from 0) of each site, as integers
+                + :code:`site`, the global site number (from 1, counting across partitions), as integers
+                + One float column per method-specific result, named as in the CSV output (see :code:`.extract_csv()`). Missing values (e.g. undefined SLAC rates) are NaN.
             
+            Optional keyword arguments:
+                1. **columns**, a list of method-specific columns to include. Only these columns (plus :code:`partition` and :code:`site`) are materialized. Default: all columns.
+                2. **slac_ancestral_type**, A **SLAC** specific argument, either "AVERAGED" (Default) or "RESOLVED" (case insensitive) to indicate whether reported results should be from calculations done on either type of ancestral counting.
+                3. **as_structured**, Boolean to indicate if the table should be returned as a single NumPy structured array instead of a dictionary. Default: False.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> table = e.extract_site_table()
+               >>> list(table.keys())
+               ['partition', 'site', 'alpha', 'beta', 'alpha=beta', 'LRT', 'p-value', 'Total_branch_length']
+               >>> table["p-value"][:3]
+               array([0.41759108, 1.        , 1.        ])
+
+               >>> ### Only materialize the columns of interest, as a structured array
+               >>> e.extract_site_table(columns = ["beta", "p-value"], as_structured = True)[:2]
+               array([(0, 1, 14.2190387, 0.41759108), (0, 2,  0.       , 1.        )], dtype=[('partition', '<i8'), ('site', '<i8'), ('beta', '<f8'), ('p-value', '<f8')])
+        """
+        slac_ancestral_type = self._check_slac_ancestral_type(slac_ancestral_type)
+        header, raw_content = self._obtain_site_block(slac_ancestral_type)
+        if columns is None:
+            columns = list(header)
         else:
-            print("\nContent from provided analysis is not convertable to CSV.")
+            columns = [str(x) for x in columns]
+            for col in columns:
+                assert(col in header), "\n[ERROR]: Column `" + col + "` is not in the site table. Available columns are: " + ", ".join(header)
+        positions = [header.index(col) for col in columns]
+
+        partition_arrays = []
+        column_arrays = dict( (col, []) for col in columns )
+        for i in range(self.npartitions):
+            rows = raw_content[str(i)]
+            partition_arrays.append( np.full(len(rows), i, dtype = np.int64) )
+            if len(positions) == len(header):
+                block = np.array(rows, dtype = np.float64).reshape(len(rows), len(header))
+                for col, j in zip(columns, positions):
+                    column_arrays[col].append( block[:,j] )
+            else:
+                for col, j in zip(columns, positions):
+                    column_arrays[col].append( np.array([row[j] for row in rows], dtype = np.float64) )
+        
+        table = OrderedDict()
+        table["partition"] = np.concatenate(partition_arrays)
+        table["site"] = np.arange(1, len(table["partition"]) + 1, dtype = np.int64)
+        for col in columns:
+            table[col] = np.ascontiguousarray( np.concatenate(column_arrays[col]) )
+
+        if as_structured:
+            structured = np.empty(len(table["site"]), dtype = [(str(name), arr.dtype) for name, arr in table.items()])
+            for name, arr in table.items():
+                structured[name] = arr
+            return structured
+        return table
+        
  
  
+    def extract_slac_site_tensor(self):
+        """
+            Return the SLAC by-site tables for **both** ancestral counting types and all partitions, as a single dense float64 array. **SLAC only.**
+            Returns an ordered dictionary with:
+                + :code:`fields`, the list of field names (as in :code:`.extract_site_table()`, e.g. "ES", "dN")
+                + :code:`ancestral_type`, the list ["AVERAGED", "RESOLVED"], giving the order of the first axis
+                + :code:`nsites`, an int64 array of the number of sites in each partition
+                + :code:`values`, a float64 array of shape (ancestral types, partitions, sites, fields). Partitions with fewer sites than the largest are padded with NaN, as are missing values.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/SLAC.json")
+               >>> tensor = e.extract_slac_site_tensor()
+               >>> tensor["values"].shape
+               (2, 1, 566, 11)
+               >>> ### Total synonymous substitutions per site, under AVERAGED counting
+               >>> tensor["values"][0, 0, :, tensor["fields"].index("S")][:3]
+               array([0., 1., 0.])
+        """
+        assert(self.analysis == self.analysis_names.slac), "\n[ERROR]: SLAC tensors are only available for SLAC."
+        fields, site_rows = self._obtain_site_block(self.analysis_names.slac_ancestral_type[0])
+        types = list(self.analysis_names.slac_ancestral_type)
+        content = self.json[ self.fields.MLE ][ self.fields.MLE_content ]
+
+        nsites = np.array([len(content[str(i)][self.fields.slac_by_site][types[0]]) for i in range(self.npartitions)], dtype = np.int64)
+        values = np.full((len(types), self.npartitions, nsites.max(), len(fields)), np.nan)
+        for t, ancestral_type in enumerate(types):
+            for i in range(self.npartitions):
+                rows = content[str(i)][self.fields.slac_by_site][ancestral_type]
+                values[t, i, :nsites[i]] = np.array(rows, dtype = np.float64).reshape(nsites[i], len(fields))
+        
+        tensor = OrderedDict()
+        tensor["fields"] = fields
+        tensor["ancestral_type"] = types
+        tensor["nsites"] = nsites
+        tensor["values"] = values
+        return tensor
+
+
+
+    def extract_slac_branch_tensor(self, partition = None):
+        """
+            Return the SLAC by-branch tables and per-site, per-branch substitution counts as dense arrays. **SLAC only.**
+            Returns an ordered dictionary with:
+                + :code:`fields`, the list of by-branch field names (as for by-site, e.g. "S", "N", "dN")
+                + :code:`ancestral_type`, the list ["AVERAGED", "RESOLVED"], giving the order of the first axis of :code:`values`
+                + :code:`branches`, an array of branch names, giving the order of the branch axes
+                + :code:`values`, a float64 array of the by-branch tables, of shape (ancestral types, branches, fields)
+                + :code:`substitution_fields`, the list ["synonymous", "nonsynonymous"]
+                + :code:`substitutions`, a float64 array of the inferred substitution counts at every site along every branch, of shape (sites, branches, 2)
+            If there are multiple partitions, default returns a dictionary of these for all partitions, since each partition has its own tree.
+            
+            Optional keyword arguments:
+                1. **partition**, Integer indicating which partition's tensors to return if multiple partitions exist. NOTE: PARTITIONS ARE ORDERED FROM 0. This argument is **ignored** for single-partitioned analyses.      
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/SLAC.json")
+               >>> tensor = e.extract_slac_branch_tensor()
+               >>> tensor["values"].shape, tensor["substitutions"].shape
+               ((2, 323, 11), (566, 323, 2))
+               >>> ### Sites with any nonsynonymous substitution, on any branch
+               >>> (tensor["substitutions"][:, :, 1].sum(axis = 1) > 0).sum()
+               143
+        """
+        assert(self.analysis == self.analysis_names.slac), "\n[ERROR]: SLAC tensors are only available for SLAC."
+        fields, site_rows = self._obtain_site_block(self.analysis_names.slac_ancestral_type[0])
+        types = list(self.analysis_names.slac_ancestral_type)
+        content = self.json[ self.fields.MLE ][ self.fields.MLE_content ]
+        
+        tensors = {}
+        for i in range(self.npartitions):
+            by_branch = content[str(i)][self.fields.slac_by_branch]
+            branches = [str(x[0]) for x in by_branch[ self.fields.slac_branch_names ]]
+            values = np.array([by_branch[t] for t in types], dtype = np.float64).reshape(len(types), len(branches), len(fields))
+            
+            ### Counts are aligned to the by-branch order, and branches without counts are given NaN
+            count_names = [self.fields.synonymous_count, self.fields.nonsynonymous_count]
+            counts = self._attribute_columns[i].select(branches, count_names)
+            substitutions = np.full((len(site_rows[str(i)]), len(branches), len(count_names)), np.nan)
+            for k, name in enumerate(count_names):
+                count_values, missing = counts.column(name)
+                present = ~missing
+                if present.any():
+                    ### (branches, 1, sites) --> (sites, branches)
+                    substitutions[:, present, k] = np.array(count_values[present].tolist(), dtype = np.float64).reshape(present.sum(), -1).T
+
+            tensor = OrderedDict()
+            tensor["fields"] = fields
+            tensor["ancestral_type"] = types
+            tensor["branches"] = np.array(branches, dtype = object)
+            tensor["values"] = values
+            tensor["substitution_fields"] = ["synonymous", "nonsynonymous"]
+            tensor["substitutions"] = substitutions
+            tensors[i] = tensor
+        
+        if self.npartitions == 1:
+            return tensors[0]
+        else:
+            if partition is None:
+                return tensors
+            else:
+                return tensors[int(partition)]
+        
+        
+        
     def extract_timers(self):
         """
             Extract dictionary of timers, with display order removed
@@ -1253,10 +2108,31 @@ class Extractor():
         raw = self.json[self.fields.timers]
         final = {}
         for step in raw:
-            del raw[step][self.fields.order]
             for k,v in raw[step].items():
-                final[str(step)] = float(v)
+                if k != self.fields.order:
+                    final[str(step)] = float(v)
         return final
+
+
+
+    def extract_total_time(self):
+        """
+            Return the total wall-clock time of the analysis in seconds, i.e. the timer which HyPhy displays first (e.g. "Overall" or "Total time"), or None if the JSON has no timers.
+
+            No arguments are required.
+
+            **Examples:**
+
+               >>> ### Define an ABSREL Extractor, for example
+               >>> e = Extractor("/path/to/ABSREL.json") 
+               >>> e.extract_total_time()
+               451.0
+        """
+        raw = self.json.get(self.fields.timers)
+        if not raw:
+            return None
+        first = min(raw, key = lambda step: raw[step].get(self.fields.order, len(raw)))
+        return [float(v) for k,v in raw[first].items() if k != self.fields.order][0]
         
  
 
@@ -1278,7 +2154,7 @@ class Extractor():
         for k,v in raw.items():
             site_logl[str(k)] = v[0]
         
-        return site_logl
+        return self._detached(site_logl)
     
     
     def extract_evidence_ratios(self):
@@ -1292,16 +2168,508 @@ class Extractor():
                >>> e.extract_evidence_ratios() ## output below abbreviated for visual purposes
                {'constrained': [0.9960544265766805, 0.9960908296179645, 0.9962555861651011, ...], 'optimized null': [0.9998285996183979, 0.9983412268057609, 0.9995755396409283, ...]} 
         """                    
-        assert(self.analysis == self.analysis_names.busted), "\n[ERROR]: Site Log Likelihoods are specific to BUSTED."
+        if not self._has_evidence_ratios():
+            return None
         raw = self.json[self.fields.evidence_ratios]
-        if len(raw) == 0:
+        ev_ratios = {}
+        for k,v in raw.items():
+            ev_ratios[str(k)] = v[0]
+        return self._detached(ev_ratios)
+
+
+
+    def _has_evidence_ratios(self):
+        """
+            Private method: Return whether BUSTED evidence ratios were computed, printing a warning if they were not.
+        """
+        assert(self.analysis == self.analysis_names.busted), "\n[ERROR]: Site Log Likelihoods are specific to BUSTED."
+        if len(self.json[self.fields.evidence_ratios]) == 0:
             print("\n[Warning] Evidence ratios are only computed for BUSTED models with significant tests for selection. Note further that they should be interpretted only as **descriptive** measures of selection, NOT statistical tests.")
+            return False
+        return True
+
+
+
+    def _busted_site_array(self, field):
+        """
+            Private method: Return a BUSTED per-site block (site log likelihoods or evidence ratios) as an ordered dictionary of the model names and a float64 array (models x sites).
+
+            Required arguments:
+                1. **field**, the JSON field of the block
+        """
+        assert(self.analysis == self.analysis_names.busted), "\n[ERROR]: Site Log Likelihoods are specific to BUSTED."
+        raw = self.json[field]
+        block = OrderedDict()
+        block["models"] = [str(k) for k in raw]
+        block["values"] = np.array([v[0] for v in raw.values()], dtype = np.float64).reshape(len(raw), -1 if len(raw) > 0 else 0)
+        return block
+
+
+    def extract_site_logl_array(self):
+        """
+            Return BUSTED site log likelihoods as a single NumPy array, in an ordered dictionary with keys :code:`models` (the list of models, i.e. rows) and :code:`values` (a float64 array of shape (models, sites)). Sites (columns) are in alignment order.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/BUSTED.json") 
+               >>> logl = e.extract_site_logl_array()
+               >>> logl["models"]
+               ['unconstrained', 'constrained', 'optimized null']
+               >>> logl["values"].shape
+               (3, 949)
+               >>> ### Per-site LRT of the unconstrained against the constrained model
+               >>> site_lrt(logl["values"][0], logl["values"][1])[:3]
+               array([-0.00790676, -0.00783366, -0.00750288])
+        """
+        return self._busted_site_array(self.fields.site_logl)
+
+
+    def extract_evidence_ratio_array(self):
+        """
+            Return BUSTED evidence ratios as a single NumPy array, in an ordered dictionary with keys :code:`models` (the list of models, i.e. rows) and :code:`values` (a float64 array of shape (models, sites)). Returns None if evidence ratios were not computed (see :code:`.extract_evidence_ratios()`).
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/BUSTED.json") 
+               >>> ratios = e.extract_evidence_ratio_array()
+               >>> ratios["models"]
+               ['constrained', 'optimized null']
+               >>> (ratios["values"] >= 10).sum(axis = 1) ## Sites with ER of at least 10, for each model
+               array([2, 2])
+        """
+        if not self._has_evidence_ratios():
             return None
-        else:
-            ev_ratios = {}
-            for k,v in raw.items():
-                ev_ratios[str(k)] = v[0]
-        return ev_ratios
+        return self._busted_site_array(self.fields.evidence_ratios)
+    ###################################################################################################################
+
+
+
+    ################################################### TABLES ##########################################################
+
+    def _obtain_table(self, table = None, **kwargs):
+        """
+            Private method: Return the table name and its ordered dictionary of columns, for table exporters. If no table name is given, the default for this analysis is used.
+        """
+        if table is None:
+            if self.analysis in self.analysis_names.site_analyses:
+                table = "sites"
+            elif self.analysis == self.analysis_names.absrel:
+                table = "branches"
+            elif self.analysis == self.analysis_names.busted:
+                table = "site_logl"
+            else:
+                table = "fits"
+        tables = {"sites": self.extract_site_table, 
+                  "branches": self.extract_absrel_table, 
+                  "fits": self.extract_model_fit_table, 
+                  "site_logl": self.extract_site_logl_table,
+                  "rates": self.extract_rate_distribution_table}
+        assert(table in tables), "\n[ERROR]: Argument `table` must be one of: " + ", ".join(sorted(tables))
+        return table, tables[table](**kwargs)
+        
+        
+        
+
+    def extract_absrel_table(self, original_names = False):
+        """
+            Return the aBSREL branch-level results as an ordered dictionary of NumPy arrays, with the same columns as the aBSREL CSV (see :code:`.extract_csv()`). **aBSREL only.**
+            Values are taken from the typed branch attribute columns (see :code:`.extract_branch_columns()`), so no values are converted to strings. Rows follow the node order of :code:`.extract_node_index()`.
+
+            Optional keyword arguments:
+                1. **original_names**, Boolean to indicate if the `node` column should contain original names (True) or HyPhy-reformatted names (False). Default: False.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/ABSREL.json")
+               >>> table = e.extract_absrel_table()
+               >>> list(table.keys())
+               ['node', 'baseline_omega', 'number_rate_classes', 'tested', 'prop_sites_selected', 'LRT', 'uncorrected_P', 'corrected_P']
+               >>> table["corrected_P"][:3]
+               array([0.2, 1. , 1. ])
+        """
+        assert(self.analysis == self.analysis_names.absrel), "\n[ERROR]: Branch tables are only available for aBSREL."
+        columns = self._obtain_branch_columns()[0] ## Only allowed single partition for ABSREL
+        
+        lrt, absent = columns.column(self.fields.LRT)
+        keep = ~absent
+        uncorrected = columns.column(self.fields.uncorrected_p)[0][keep].astype(np.float64)
+        corrected = columns.column(self.fields.corrected_p)[0][keep].astype(np.float64)
+        lrt = lrt[keep].astype(np.float64)
+        
+        prop_selected = []
+        for rates in columns.column(self.fields.rate_distributions)[0][keep]:
+            prop = 0.
+            if len(rates) > 1:
+                for pair in rates:
+                    if pair[0] > 1.:
+                        prop = pair[1]
+                        break
+            prop_selected.append(prop)
+        
+        nodes = np.array(columns.nodes, dtype = object)[keep]
+        if original_names is True:
+            names, missing = columns.column(self.fields.original_name)
+            names = names[keep]
+            nodes = np.where(missing[keep], nodes, names)
+        
+        table = OrderedDict()
+        table["node"] = nodes
+        table["baseline_omega"] = columns.column(self.fields.baseline_omega)[0][keep].astype(np.float64)
+        table["number_rate_classes"] = columns.column(self.fields.rate_classes)[0][keep].astype(np.int64)
+        table["tested"] = ~((lrt == 1) & (uncorrected == 1) & (corrected == 1))
+        table["prop_sites_selected"] = np.array(prop_selected, dtype = np.float64)
+        table["LRT"] = lrt
+        table["uncorrected_P"] = uncorrected
+        table["corrected_P"] = corrected
+        return table
+        
+        
+        
+    def extract_absrel_rate_classes(self, original_names = False):
+        """
+            Return the omega rate classes of every aBSREL branch (the branch attribute "Rate Distributions") as ragged arrays, i.e. an ordered dictionary of NumPy arrays with keys as follows. **aBSREL only.**
+                + :code:`node`, the branch names, in the node order of :code:`.extract_node_index()`
+                + :code:`offsets`, an int64 array of length (branches + 1): the rate classes of branch `i` are :code:`offsets[i]:offsets[i+1]`
+                + :code:`omega`, a float64 array of the omega ratio of every rate class of every branch
+                + :code:`proportion`, a float64 array of the matching proportions of sites
+
+            Optional keyword arguments:
+                1. **original_names**, Boolean to indicate if the `node` array should contain original names (True) or HyPhy-reformatted names (False). Default: False.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/ABSREL.json")
+               >>> classes = e.extract_absrel_rate_classes()
+               >>> np.diff(classes["offsets"])[:5] ## Number of rate classes for each branch
+               array([1, 2, 2, 1, 1])
+               >>> i = list(classes["node"]).index("0564_3")
+               >>> classes["omega"][classes["offsets"][i]:classes["offsets"][i+1]]
+               array([  0.        , 127.65848285])
+        """
+        assert(self.analysis == self.analysis_names.absrel), "\n[ERROR]: Per-branch rate classes are only available for aBSREL."
+        columns = self._obtain_branch_columns()[0] ## Only allowed single partition for ABSREL
+        rates, absent = columns.column(self.fields.rate_distributions)
+        keep = ~absent
+
+        counts = np.array([len(r) for r in rates[keep]], dtype = np.int64)
+        pairs = np.array([pair for r in rates[keep] for pair in r], dtype = np.float64).reshape(-1, 2)
+
+        nodes = np.array(columns.nodes, dtype = object)[keep]
+        if original_names is True:
+            names, missing = columns.column(self.fields.original_name)
+            nodes = np.where(missing[keep], nodes, names[keep])
+
+        classes = OrderedDict()
+        classes["node"] = nodes
+        classes["offsets"] = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        classes["omega"] = pairs[:, 0].copy()
+        classes["proportion"] = pairs[:, 1].copy()
+        return classes
+
+
+
+    def extract_model_fit_table(self):
+        """
+            Return all fitted models as an ordered dictionary of NumPy arrays, with columns `model`, `logl`, `estimated_parameters`, and `AICc`. Rows follow :code:`.reveal_fitted_models()`.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> e.extract_model_fit_table()
+               OrderedDict([('model', array(['Nucleotide GTR', 'Global MG94xREV'], dtype=object)), ('logl', array([-3531.96378073, -3466.77493494])), ('estimated_parameters', array([24, 31])), ('AICc', array([7112.57796796, 6933.54986989]))])
+        """
+        models = self.reveal_fitted_models()
+        table = OrderedDict()
+        table["model"] = np.array(models, dtype = object)
+        table["logl"] = np.array([self.extract_model_logl(m) for m in models], dtype = np.float64)
+        table["estimated_parameters"] = np.array([self.extract_model_estimated_parameters(m) for m in models], dtype = np.int64)
+        table["AICc"] = np.array([self.extract_model_aicc(m) for m in models], dtype = np.float64)
+        return table
+        
+        
+        
+    def extract_rate_distribution_table(self, models = None):
+        """
+            Return the rate distributions of fitted models as a tidy ordered dictionary of NumPy arrays, with one row per rate:
+                + :code:`model`, the model name
+                + :code:`branch_set`, the branch set of an omega rate (e.g. "test", or "Reference"), or the name of a group of summaries (e.g. aBSREL's "Per-branch omega"), or "" for model-wide rates
+                + :code:`rate`, the rate name: nucleotide substitution rates are abbreviated as in :code:`.extract_model_rate_distributions()` (e.g. "AC"), omega ratios are "omega", and other rates (e.g. "Gamma distribution shape parameter", or "Median" in a group of summaries) keep their JSON names
+                + :code:`rate_class`, the (int64) index of the rate class within a mixture of omega ratios, or 0
+                + :code:`value`, the (float64) rate
+                + :code:`proportion`, the (float64) proportion of the rate class (1 for a single omega ratio), or NaN for other rates
+
+            Optional keyword arguments:
+                1. **models**, a list of model names. Default: all fitted models (see :code:`.reveal_fitted_models()`).
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/BUSTED.json")
+               >>> table = e.extract_rate_distribution_table(["Unconstrained model"])
+               >>> table["rate_class"], table["value"], table["proportion"]
+               (array([0, 1, 2]), array([1.95105361e-02, 1.01421773e-01, 1.18862254e+02]), array([9.32326986e-01, 6.73074688e-02, 3.65544831e-04]))
+        """
+        if models is None:
+            models = self.reveal_fitted_models()
+        elif isinstance(models, str):
+            models = [models]
+        model_column = []
+        rows = []
+        for model in models:
+            model_rows = self._rate_distribution_rows(model)
+            model_column += [str(model)] * len(model_rows)
+            rows += model_rows
+
+        table = OrderedDict()
+        table["model"] = np.array(model_column, dtype = object)
+        table["branch_set"] = np.array([row[0] for row in rows], dtype = object)
+        table["rate"] = np.array([row[1] for row in rows], dtype = object)
+        table["rate_class"] = np.array([row[2] for row in rows], dtype = np.int64)
+        table["value"] = np.array([row[3] for row in rows], dtype = np.float64)
+        table["proportion"] = np.array([row[4] for row in rows], dtype = np.float64)
+        return table
+
+
+
+    def extract_site_logl_table(self):
+        """
+            Return BUSTED site log likelihoods as an ordered dictionary of NumPy arrays: the `site` (from 1), and one float array per model. **BUSTED only.**
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/BUSTED.json") 
+               >>> table = e.extract_site_logl_table()
+               >>> list(table.keys())
+               ['site', 'unconstrained', 'constrained', 'optimized null']
+               >>> table["constrained"][:3]
+               array([-3.81613097, -5.29029241, -3.7400778 ])
+        """
+        block = self._busted_site_array(self.fields.site_logl)
+        table = OrderedDict()
+        table["site"] = np.arange(1, block["values"].shape[1] + 1, dtype = np.int64)
+        for model, values in zip(block["models"], block["values"]):
+            table[model] = values
+        return table
+        
+        
+        
+    def to_dataframe(self, table = None, **kwargs):
+        """
+            Return a results table as a :code:`pandas.DataFrame`, built directly from the NumPy arrays (no CSV is written or parsed, and column types are preserved). Requires `pandas`.
+
+            Optional keyword arguments:
+                1. **table**, Which table to return, one of:
+                    + "sites", the site-level table of FEL, SLAC, MEME, FUBAR, or LEISR (see :code:`.extract_site_table()`)
+                    + "branches", the aBSREL branch table (see :code:`.extract_absrel_table()`)
+                    + "fits", the fitted model table (see :code:`.extract_model_fit_table()`)
+                    + "site_logl", the BUSTED site log likelihoods (see :code:`.extract_site_logl_table()`)
+                   Default: "sites" for site-level methods, "branches" for aBSREL, "site_logl" for BUSTED, and "fits" otherwise.
+                2. Any further keyword arguments are passed to the respective table method, e.g. :code:`columns` and :code:`slac_ancestral_type` for "sites", or :code:`original_names` for "branches".
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> df = e.to_dataframe()
+               >>> df.dtypes[:3]
+               partition      int64
+               site           int64
+               alpha        float64
+               dtype: object
+
+               >>> e.to_dataframe("fits")
+                            model         logl  estimated_parameters         AICc
+               0   Nucleotide GTR -3531.963781                    24  7112.577968
+               1  Global MG94xREV -3466.774935                    31  6933.549870
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            raise AssertionError("\n[ERROR]: The `pandas` package is required for `.to_dataframe()`.")
+        columns = self._obtain_table(table, **kwargs)[1]
+        return pd.DataFrame(columns, columns = list(columns.keys()), copy = False)
+        
+        
+        
+    def to_arrow(self, table = None, **kwargs):
+        """
+            Return a results table as a :code:`pyarrow.Table`, with typed columns built directly from the NumPy arrays. Requires `pyarrow`.
+            The following columns are prepended, so that tables from many analyses can be stored together:
+                + :code:`method`, the analysis name (e.g. "FEL")
+                + :code:`version`, the analysis version (see :code:`.extract_analysis_version()`)
+                + :code:`input_file`, the analyzed dataset (see :code:`.extract_input_file()`)
+                + :code:`partition`, the partition (from 0) of each row, for the tables whose rows belong to a single partition ("sites" and "branches"). The "fits", "rates", and "site_logl" tables span all partitions, and have no such column.
+
+            Optional keyword arguments:
+                1. **table**, Which table to return: "sites", "branches", "fits", or "site_logl". See :code:`.to_dataframe()` for details and defaults.
+                2. Any further keyword arguments are passed to the respective table method.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> t = e.to_arrow()
+               >>> t.column_names[:6]
+               ['method', 'version', 'input_file', 'partition', 'site', 'alpha']
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise AssertionError("\n[ERROR]: The `pyarrow` package is required for `.to_arrow()`.")
+        table, columns = self._obtain_table(table, **kwargs)
+        nrows = len(next(iter(columns.values())))
+        
+        ### Constant columns are dictionary-encoded, storing the value only once
+        def constant(value):
+            return pa.DictionaryArray.from_arrays(pa.array(np.zeros(nrows, dtype = np.int32)), pa.array([value], type = pa.string()))
+        
+        names = ["method", "version", "input_file"]
+        arrays = [constant(self.analysis), constant(self.extract_analysis_version()), constant(self.extract_input_file())]
+        ### Site tables already carry their partitions, and aBSREL (the only branch table) allows a single partition
+        if table == "branches":
+            names.append("partition")
+            arrays.append( pa.array(np.zeros(nrows, dtype = np.int64)) )
+        for name, values in columns.items():
+            names.append(name)
+            if values.dtype == object:
+                arrays.append( pa.array(values.tolist(), type = pa.string()) )
+            else:
+                arrays.append( pa.array(values) )
+        return pa.Table.from_arrays(arrays, names = names)
+        
+        
+        
+    def extract_parquet(self, parquet, table = None, **kwargs):
+        """
+            Write a results table to a Parquet file, with the columns of :code:`.to_arrow()`. Requires `pyarrow`.
+            To collect many results into a single dataset, see :code:`Extractor.extract_parquet_dataset()`.
+
+            Required arguments:
+                1. **parquet**, File name (or writable file-like object) for the output Parquet
+
+            Optional keyword arguments:
+                1. **table**, Which table to write: "sites", "branches", "fits", or "site_logl". See :code:`.to_dataframe()` for details and defaults.
+                2. Any further keyword arguments are passed to the respective table method.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/ABSREL.json")
+               >>> e.extract_parquet("absrel.parquet")
+               >>> e.extract_parquet("absrel_fits.parquet", table = "fits")
+        """
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise AssertionError("\n[ERROR]: The `pyarrow` package is required for `.extract_parquet()`.")
+        pq.write_table(self.to_arrow(table, **kwargs), parquet)
+        
+        
+        
+    @staticmethod
+    def extract_parquet_dataset(sources, root, table = None, partition_cols = ("method",), **kwargs):
+        """
+            Append the results tables of many analyses into one partitioned Parquet dataset (a directory of Parquet files, one subdirectory per value of the partitioning columns), with the columns of :code:`.to_arrow()`. Requires `pyarrow`.
+            Each source is written as soon as it is parsed, so only one JSON is held in memory at a time. Files are given unique names, so repeated calls add to an existing dataset.
+
+            Required arguments:
+                1. **sources**, An iterable of JSON file names and/or Extractor objects
+                2. **root**, The root directory of the dataset
+
+            Optional keyword arguments:
+                1. **table**, Which table to write for each source: "sites", "branches", "fits", or "site_logl". Default: each source's own default (see :code:`.to_dataframe()`).
+                2. **partition_cols**, List of columns to partition the dataset by. Default: ("method",), so that each method's (differently-shaped) tables are stored separately.
+                3. Any further keyword arguments are passed to the respective table method.
+
+            **Examples:**
+
+               >>> Extractor.extract_parquet_dataset(["/path/to/gene1.FEL.json", "/path/to/gene2.FEL.json", "/path/to/gene1.MEME.json"], "results/")
+               >>> ### Each method's tables have their own columns, so read them per method
+               >>> import pyarrow.parquet as pq
+               >>> pq.read_table("results/method=FEL").num_rows
+               374
+        """
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise AssertionError("\n[ERROR]: The `pyarrow` package is required for `.extract_parquet_dataset()`.")
+        for source in sources:
+            extractor = source if isinstance(source, Extractor) else Extractor(source)
+            pq.write_to_dataset(extractor.to_arrow(table, **kwargs), root, partition_cols = list(partition_cols))
+    ###################################################################################################################
+
+
+
+    ################################################### SERIALIZATION ##########################################################
+
+    def to_bytes(self):
+        """
+            Return a compact binary serialization of this Extractor, e.g. for sending to a worker process.
+            Only the core data are included: the JSON content with its large lists stored as typed arrays, the typed branch attribute columns, and trees as newick strings. Derived structures (e.g. ete3 trees) are rebuilt lazily after :code:`Extractor.from_bytes()`. The result is compressed with zlib.
+            Note that standard :code:`pickle` uses the same (uncompressed) state, so Extractor objects may also be passed directly to :code:`multiprocessing`.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json") ## Define a FEL Extractor, for example
+               >>> payload = e.to_bytes()
+               >>> e2 = Extractor.from_bytes(payload)
+               >>> e2.extract_model_logl("Nucleotide GTR")
+               -3531.96378073
+        """
+        return zlib.compress(pickle.dumps(self, protocol = pickle.HIGHEST_PROTOCOL))
+
+
+    @staticmethod
+    def from_bytes(payload):
+        """
+            Return an Extractor rebuilt from the output of :code:`.to_bytes()`. As with any pickled data, only load payloads from a trusted source.
+
+            Required arguments:
+                1. **payload**, bytes produced by :code:`.to_bytes()`
+        """
+        extractor = pickle.loads(zlib.decompress(payload))
+        assert(isinstance(extractor, Extractor)), "\n[ERROR]: Payload does not contain an Extractor."
+        return extractor
+
+
+    @property
+    def frozen(self):
+        """
+            Boolean indicating whether this Extractor has been frozen (see :code:`.freeze()`).
+        """
+        return self._frozen
+
+
+    def freeze(self):
+        """
+            Freeze this Extractor, and return it.
+            Every derived structure used by the extraction methods (node indices and their newick templates, typed branch attribute columns, attribute lookups, original names, and aBSREL corrected P-values) is built straight away and made read-only, and any later attempt to set or delete an attribute of the Extractor raises AttributeError. Frozen Extractors remain frozen when pickled (see :code:`.to_bytes()`).
+
+            Extraction methods never modify an Extractor, and derived structures are built under a lock, so a single Extractor may always be queried from several threads. Freezing additionally means that queries only ever read from it: freeze before forking worker processes, and they will share one loaded Extractor copy-on-write instead of each building their own. Results which hold lists or dictionaries taken straight from the parsed JSON (e.g. :code:`.extract_model_component()`, :code:`.extract_model_rate_distributions()`, and :code:`.extract_site_logl()`) are returned as copies by a frozen Extractor, so that no caller can change what other threads see, and cached arrays are read-only. ete3 trees (:code:`.input_tree_ete`) are not needed by any extraction method, and are still only parsed on first use.
+
+            **Examples:**
+
+               >>> e = Extractor("/path/to/FEL.json").freeze() ## Define a frozen FEL Extractor, for example
+               >>> e.frozen
+               True
+               >>> from multiprocessing.pool import ThreadPool
+               >>> ThreadPool(4).map(e.extract_model_logl, ["Nucleotide GTR", "Global MG94xREV"])
+               [-3531.96378073, -3466.77493494]
+        """
+        with self._lock:
+            if self._frozen:
+                return self
+            for node_index in self._obtain_node_index().values():
+                node_index.freeze()
+            for columns in list(self._attribute_columns.values()) + list(self._obtain_branch_columns().values()):
+                columns.freeze()
+            for x in range(self.npartitions):
+                self._node_names(x, original_names = True)
+                for attribute_name in list(self.attribute_names) + [self.fields.original_name]:
+                    try:
+                        self._partition_attribute(attribute_name, x)
+                    except AssertionError:
+                        pass ## Attributes which some nodes lack raise on every lookup, and so are never cached
+            if self.analysis == self.analysis_names.absrel and self.fields.corrected_p in self.attribute_names:
+                self._corrected_pvalue_array()
+            self._frozen = True
+        return self
     ###################################################################################################################
     
 
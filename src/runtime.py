@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Prediction of HyPhy analysis runtimes from the timers of past results, for planning batches of analyses.
+"""
+
+import sys
+import heapq
+import numpy as np
+from collections import OrderedDict
+
+if __name__ == "__main__":
+    print("\nThis is the Runtime module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+from .collection import *
+
+
+
+class RuntimeModel():
+    """
+        This class predicts the wall-clock time of HyPhy analyses from their input dimensions, as learned from the timers of past results.
+
+        Runtimes are modeled on the log scale, as :code:`log(seconds) = intercept + slopes . log([sequences, sites, branches, cpus])` (features are centered on the training runs). Each method (e.g. "FEL") has its own intercept and slopes. The slopes of each method are shrunk towards slopes shared by all methods, so that methods with only a few past runs borrow the scaling learned from the others.
+        Features which never vary across the training runs (e.g., if every run used the same number of CPUs) have no effect on predictions.
+    """
+
+    features = ("sequences", "sites", "branches", "cpus")
+
+    def __init__(self, sources, cpus = 1, shrinkage = 1.):
+        """
+            Initialize a RuntimeModel instance, trained on past results.
+
+            Required arguments:
+                1. **sources**, the past results, either an `ExtractorCollection`, a list of JSON file names and/or Extractor objects, or a table from :code:`ExtractorCollection.extract_runtime_table()`. Results without timers are ignored, and JSON files which cannot be parsed are skipped and listed in :code:`self.skipped`, as (file, reason) tuples.
+
+            Optional keyword arguments:
+                1. **cpus**, the number of CPUs the past analyses were run with, which HyPhy does not record, either an integer or a list aligned with `sources`. Ignored when `sources` is already a table. Default: 1.
+                2. **shrinkage**, the strength with which each method's slopes are pulled towards the shared slopes. Larger values give more similar slopes. Default: 1.
+
+            **Examples:**
+
+               >>> model = RuntimeModel(phyphy.find_jsons("results/"), cpus = 4)
+               >>> model.methods
+               ['ABSREL', 'BUSTED', 'FEL', 'MEME', 'RELAX', 'SLAC']
+        """
+        assert(shrinkage > 0), "\n[ERROR]: Argument `shrinkage` must be positive."
+        self.skipped = []
+        if isinstance(sources, dict):
+            table = sources
+        else:
+            if not isinstance(sources, ExtractorCollection):
+                if np.ndim(cpus) > 0:
+                    assert(len(cpus) == len(sources)), "\n[ERROR]: Provide one number of CPUs per source."
+                sources = ExtractorCollection(sources)
+                ### Only the CPUs of sources which could be parsed are kept
+                if np.ndim(cpus) > 0:
+                    cpus = np.asarray(cpus)[sources._positions]
+            self.skipped = list(sources.skipped)
+            table = sources.extract_runtime_table(cpus = cpus)
+
+        seconds = np.asarray(table["seconds"], dtype = np.float64)
+        timed = np.isfinite(seconds)
+        assert(np.any(timed)), "\n[ERROR]: None of the provided results have timers."
+        ### HyPhy times in whole seconds, so shorter runs are counted as one second
+        response = np.log(np.maximum(seconds[timed], 1.))
+        methods = np.array([str(x).upper() for x in np.asarray(table["method"])[timed]], dtype = object)
+        logged = np.log(np.column_stack([np.asarray(table[x], dtype = np.float64)[timed] for x in self.features]))
+
+        self.methods = sorted(set(methods))
+        self.nruns = np.array([np.sum(methods == m) for m in self.methods], dtype = np.int64)
+        self._center = logged.mean(axis = 0)
+        centered = logged - self._center
+
+        ### Least squares on [method intercepts, shared slopes, per-method slope deviations], with ridge rows penalizing the deviations
+        nmethods = len(self.methods)
+        nfeatures = len(self.features)
+        membership = np.array([[x == m for m in self.methods] for x in methods], dtype = np.float64)
+        deviations = (membership[:, :, None] * centered[:, None, :]).reshape(len(response), nmethods * nfeatures)
+        design = np.hstack([membership, centered, deviations])
+        penalty = np.hstack([np.zeros((nmethods * nfeatures, nmethods + nfeatures)), np.sqrt(shrinkage) * np.eye(nmethods * nfeatures)])
+        coefficients = np.linalg.lstsq(np.vstack([design, penalty]), np.concatenate([response, np.zeros(nmethods * nfeatures)]), rcond = None)[0]
+
+        self.intercepts = coefficients[:nmethods]
+        self.slopes = coefficients[nmethods:nmethods + nfeatures] + coefficients[nmethods + nfeatures:].reshape(nmethods, nfeatures)
+        self.residuals = response - self._log_predict(methods, logged)
+
+
+
+    def _log_predict(self, methods, logged):
+        """
+            Private method: Return the predicted log seconds for arrays of (upper-case) method names and log features.
+        """
+        lookup = dict( (m, i) for i, m in enumerate(self.methods) )
+        for m in set(methods):
+            assert(m in lookup), "\n[ERROR]: No past runs of method `" + str(m) + "`. Known methods are: " + ", ".join(self.methods)
+        rows = np.array([lookup[m] for m in methods], dtype = np.int64)
+        return self.intercepts[rows] + np.sum(self.slopes[rows] * (logged - self._center), axis = 1)
+
+
+
+    def predict(self, method, sequences, sites, branches = None, cpus = 1):
+        """
+            Return the predicted wall-clock time, in seconds, of analyses with the given dimensions.
+            Arguments may be single values or arrays (which are broadcast together), and an array of predictions is returned for arrays.
+
+            Required arguments:
+                1. **method**, the analysis name(s), e.g. "FEL" (case insensitive)
+                2. **sequences**, the number(s) of sequences
+                3. **sites**, the number(s) of sites (codons, for codon analyses)
+
+            Optional keyword arguments:
+                1. **branches**, the number(s) of branches in the tree. Default: that of an unrooted binary tree of the sequences, :code:`2 * sequences - 3`.
+                2. **cpus**, the number(s) of CPUs each analysis will run with. Default: 1.
+
+            **Examples:**
+
+               >>> model = RuntimeModel(phyphy.find_jsons("results/"))
+               >>> model.predict("FEL", 10, 187)
+               205.85662708
+               >>> model.predict(["FEL", "MEME"], [40, 40], [500, 500])
+               array([2311.31031655, 1277.42443369])
+        """
+        sequences = np.asarray(sequences, dtype = np.float64)
+        if branches is None:
+            branches = np.maximum(2. * sequences - 3., 1.)
+        method, sequences, sites, branches, cpus = np.broadcast_arrays(np.asarray(method, dtype = object), sequences, np.asarray(sites, dtype = np.float64), np.asarray(branches, dtype = np.float64), np.asarray(cpus, dtype = np.float64))
+        dimensions = np.column_stack([x.ravel() for x in (sequences, sites, branches, cpus)])
+        assert(np.all(dimensions > 0)), "\n[ERROR]: Numbers of sequences, sites, branches, and CPUs must be positive."
+        methods = np.array([str(x).upper() for x in method.ravel()], dtype = object)
+        seconds = np.exp(self._log_predict(methods, np.log(dimensions))).reshape(method.shape)
+        if seconds.ndim == 0:
+            return float(seconds)
+        return seconds
+
+
+
+    def plan(self, method, sequences, sites, branches = None, cpus = 1, workers = 1):
+        """
+            Plan a batch of analyses, run shortest-job-first on a number of workers (e.g. queue slots), from their predicted runtimes.
+            Jobs are started in order of increasing predicted time, each on the first worker to become free. Returns an ordered dictionary of arrays with keys:
+                + :code:`order`, the job positions (in the input order) sorted shortest-job-first
+                + :code:`seconds`, the predicted time of each job
+                + :code:`worker`, the worker (from 0) which runs each job
+                + :code:`start` and :code:`finish`, the predicted start and finish time of each job, in seconds from the start of the batch
+            All but :code:`order` are aligned with the input jobs. The predicted duration of the whole batch is :code:`finish.max()`.
+
+            Required arguments:
+                1. **method**, **sequences**, **sites**, the dimensions of each job, as for :code:`.predict()`
+
+            Optional keyword arguments:
+                1. **branches**, **cpus**, as for :code:`.predict()`
+                2. **workers**, the number of jobs which run at once. Default: 1.
+
+            **Examples:**
+
+               >>> model = RuntimeModel(phyphy.find_jsons("results/"))
+               >>> batch = model.plan(["MEME", "FEL", "FEL"], [40, 40, 12], [500, 500, 300], workers = 2)
+               >>> batch["order"]
+               array([2, 0, 1])
+               >>> batch["finish"].max()
+               2596.14614142
+        """
+        assert(int(workers) >= 1), "\n[ERROR]: Argument `workers` must be at least 1."
+        seconds = np.atleast_1d(self.predict(method, sequences, sites, branches = branches, cpus = cpus))
+        order = np.argsort(seconds, kind = "mergesort")
+        worker = np.zeros(len(seconds), dtype = np.int64)
+        start = np.zeros(len(seconds), dtype = np.float64)
+        free = [(0., w) for w in range(min(int(workers), len(seconds)))]
+        for job in order:
+            start[job], worker[job] = heapq.heappop(free)
+            heapq.heappush(free, (start[job] + seconds[job], worker[job]))
+
+        batch = OrderedDict()
+        batch["order"] = order.astype(np.int64)
+        batch["seconds"] = seconds
+        batch["worker"] = worker
+        batch["start"] = start
+        batch["finish"] = start + seconds
+        return batch
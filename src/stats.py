@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Vectorized statistics for HyPhy results, e.g. multiple-testing correction, likelihood ratio tests, and Akaike weights.
+"""
+
+import sys
+import math
+import numpy as np
+
+if __name__ == "__main__":
+    print("\nThis is the Stats module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+
+
+_PVALUE_METHODS = {"BH": "BH", "FDR": "BH", "FDR_BH": "BH", "HOLM": "HOLM", "BONFERRONI": "BONFERRONI"}
+
+
+
+def _segmented_accumulate(ufunc, values, groups, reverse = False):
+    """
+        Private function: Apply a cumulative min or max within each run of `groups` (which must be sorted ascending), without crossing run boundaries.
+        Values are replaced by their integer ranks so that groups can be separated by an exact integer offset.
+    """
+    unique, ranks = np.unique(values, return_inverse = True)
+    offset = groups.astype(np.int64) * len(unique)
+    keys = ranks.astype(np.int64) + offset
+    if reverse:
+        keys = ufunc.accumulate(keys[::-1])[::-1]
+    else:
+        keys = ufunc.accumulate(keys)
+    return unique[keys - offset]
+
+
+
+def adjust_pvalues(pvalues, method = "BH", groups = None):
+    """
+        Return an array of multiple-testing corrected P-values, aligned to the input. NaN entries (e.g. untested sites) are ignored, i.e. they do not count as tests, and remain NaN.
+
+        Required arguments:
+            1. **pvalues**, an array of P-values
+
+        Optional keyword arguments:
+            1. **method**, The correction to apply, one of (case insensitive):
+                + "BH" (or "FDR"), Benjamini-Hochberg false discovery rate
+                + "Holm", Holm-Bonferroni family-wise error rate
+                + "Bonferroni", Bonferroni family-wise error rate
+               Default: "BH".
+            2. **groups**, an array of non-negative integer group labels (e.g. genes), aligned to `pvalues`. If provided, the correction is performed separately within each group. Default: None, i.e. all P-values are one family.
+
+        **Examples:**
+
+           >>> adjust_pvalues([0.01, 0.04, 0.03, 0.2])
+           array([0.04      , 0.05333333, 0.05333333, 0.2       ])
+           >>> adjust_pvalues([0.01, 0.04, 0.03, 0.2], method = "holm", groups = [0, 0, 1, 1])
+           array([0.02, 0.04, 0.06, 0.2 ])
+    """
+    method = str(method).upper()
+    assert(method in _PVALUE_METHODS), "\n[ERROR]: Argument `method` must be one of 'BH', 'Holm', or 'Bonferroni'."
+    method = _PVALUE_METHODS[method]
+
+    pvalues = np.asarray(pvalues, dtype = np.float64)
+    adjusted = np.full(pvalues.shape, np.nan)
+    valid = ~np.isnan(pvalues)
+    p = pvalues[valid]
+    if len(p) == 0:
+        return adjusted
+    if groups is None:
+        g = np.zeros(len(p), dtype = np.int64)
+    else:
+        groups = np.asarray(groups, dtype = np.int64)
+        assert(groups.shape == pvalues.shape), "\n[ERROR]: Arguments `pvalues` and `groups` must have the same shape."
+        assert((groups >= 0).all()), "\n[ERROR]: Argument `groups` must contain non-negative integers."
+        g = groups[valid]
+
+    ### Sort by group, and by P-value within each group
+    order = np.lexsort((p, g))
+    p = p[order]
+    g = g[order]
+    counts = np.bincount(g)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(1, len(p) + 1) - starts[g]
+    ntests = counts[g]
+
+    if method == "BONFERRONI":
+        sorted_adjusted = np.minimum(p * ntests, 1.)
+    elif method == "HOLM":
+        sorted_adjusted = np.minimum((ntests - rank + 1) * p, 1.)
+        sorted_adjusted = _segmented_accumulate(np.maximum, sorted_adjusted, g)
+    else:
+        sorted_adjusted = np.minimum(p * ntests / rank, 1.)
+        sorted_adjusted = _segmented_accumulate(np.minimum, sorted_adjusted, g, reverse = True)
+
+    result = np.empty(len(p))
+    result[order] = sorted_adjusted
+    adjusted[valid] = result
+    return adjusted
+
+
+
+def chi2_sf(x, df):
+    """
+        Return the survival function (upper tail probability) of the chi-squared distribution, i.e. P(X >= x), for integer degrees of freedom. Arguments are broadcast against each other, so that many statistics (each with its own degrees of freedom) are evaluated in one call. NaN entries remain NaN.
+        This uses the closed form for integer degrees of freedom (a finite series, plus :code:`erfc` for odd degrees of freedom), so that scipy is not required.
+
+        Required arguments:
+            1. **x**, an array of chi-squared statistics
+            2. **df**, an array of positive integer degrees of freedom
+
+        **Examples:**
+
+           >>> chi2_sf([3.84, 10.], [1, 2])
+           array([0.05004352, 0.00673795])
+    """
+    x, df = np.broadcast_arrays(np.asarray(x, dtype = np.float64), np.asarray(df, dtype = np.float64))
+    sf = np.full(x.shape, np.nan)
+    valid = ~(np.isnan(x) | np.isnan(df))
+    assert((df[valid] > 0).all() and (df[valid] == np.round(df[valid])).all()), "\n[ERROR]: Degrees of freedom must be positive integers."
+    x = np.maximum(x[valid], 0.)
+    half = df[valid] / 2.
+    y = x / 2.
+    positive = y > 0
+    logy = np.log(np.where(positive, y, 1.))
+
+    ### Odd degrees of freedom start from the 1 degree of freedom tail, erfc(sqrt(y)), and both then add terms exp(-y) y^j / j! for j = df/2 - 1, df/2 - 2, ... >= 0
+    odd = (df[valid] % 2) == 1
+    result = np.zeros(len(y))
+    result[odd] = np.vectorize(math.erfc, otypes = [np.float64])(np.sqrt(y[odd])) if odd.any() else 0.
+    j = half - 1.
+    while (j >= 0).any():
+        terms = j >= 0
+        logterm = -y[terms] + j[terms] * logy[terms] - np.vectorize(math.lgamma, otypes = [np.float64])(j[terms] + 1.)
+        result[terms] += np.where(positive[terms] | (j[terms] == 0), np.exp(logterm), 0.)
+        j = j - 1.
+    sf[valid] = np.minimum(result, 1.)
+    return sf
+
+
+
+def lrt_pvalues(null_logl, alternative_logl, df):
+    """
+        Return the likelihood ratio test statistics and their chi-squared P-values for many pairs of nested model fits at once, as a tuple of arrays aligned to the input. Statistics are :code:`2 * (alternative_logl - null_logl)`, with negative values (an alternative fit slightly worse than its null) set to 0. NaN entries (e.g. missing fits) remain NaN.
+
+        Required arguments:
+            1. **null_logl**, an array of log likelihoods of the null models
+            2. **alternative_logl**, an array of log likelihoods of the alternative models
+            3. **df**, the degrees of freedom of the tests, either a single integer or an array aligned to the log likelihoods (e.g. differences in estimated parameters)
+
+        **Examples:**
+
+           >>> lrt_pvalues([-14342.33586145556], [-14337.24586131138], 1) ## RELAX null and alternative
+           (array([10.18000029]), array([0.00141972]))
+    """
+    lrt = 2. * (np.asarray(alternative_logl, dtype = np.float64) - np.asarray(null_logl, dtype = np.float64))
+    lrt = np.where(lrt < 0, 0., lrt)
+    return lrt, chi2_sf(lrt, df)
+
+
+
+def delta_aicc(aicc, axis = -1):
+    """
+        Return the AICc differences of a set of model fits, i.e. each fit's AICc minus the smallest AICc along the given axis, so that one call handles many sets of fits (e.g. a genes x models array). NaN entries (missing fits) are ignored and remain NaN.
+
+        Required arguments:
+            1. **aicc**, an array of AICc (or AIC) values
+
+        Optional keyword arguments:
+            1. **axis**, the axis along which models vary. Default: -1 (the last axis).
+
+        **Examples:**
+
+           >>> delta_aicc([[100., 102., 110.], [50., np.nan, 49.]])
+           array([[ 0.,  2., 10.],
+                  [ 1., nan,  0.]])
+    """
+    aicc = np.asarray(aicc, dtype = np.float64)
+    best = np.min(np.where(np.isnan(aicc), np.inf, aicc), axis = axis, keepdims = True)
+    best[np.isinf(best)] = np.nan
+    return aicc - best
+
+
+
+def akaike_weights(aicc, axis = -1):
+    """
+        Return the Akaike weights of a set of model fits, i.e. the relative likelihoods :code:`exp(-delta / 2)` normalized to sum to 1, where :code:`delta` is each fit's AICc minus the smallest AICc (see :code:`delta_aicc()`). Weights are computed along the given axis, so that one call handles many sets of fits (e.g. a genes x models array). NaN entries (missing fits) are ignored and remain NaN.
+
+        Required arguments:
+            1. **aicc**, an array of AICc (or AIC) values
+
+        Optional keyword arguments:
+            1. **axis**, the axis along which models vary. Default: -1 (the last axis).
+
+        **Examples:**
+
+           >>> akaike_weights([[100., 102., 110.], [50., np.nan, 49.]])
+           array([[0.72747516, 0.26762315, 0.00490169],
+                  [0.37754067,        nan, 0.62245933]])
+    """
+    relative = np.exp(-delta_aicc(aicc, axis = axis) / 2.)
+    total = np.sum(np.where(np.isnan(relative), 0., relative), axis = axis, keepdims = True)
+    with np.errstate(invalid = "ignore"):
+        return relative / total
+
+
+
+def site_lrt(alternative_logl, null_logl):
+    """
+        Return per-site likelihood ratio statistics, :code:`2 * (alternative_logl - null_logl)`, e.g. from BUSTED site log likelihoods (see :code:`Extractor.extract_site_logl_array()`). Arrays of any (matching) shape are accepted, e.g. the sites of many genes at once. Unlike :code:`lrt_pvalues()`, negative values are kept: per-site statistics are descriptive, not tests.
+
+        Required arguments:
+            1. **alternative_logl**, an array of site log likelihoods under the alternative (e.g. unconstrained) model
+            2. **null_logl**, an array of site log likelihoods under the null (e.g. constrained) model
+
+        **Examples:**
+
+           >>> site_lrt([-3.82, -10.5], [-3.81, -12.0])
+           array([-0.02,  3.  ])
+    """
+    return 2. * (np.asarray(alternative_logl, dtype = np.float64) - np.asarray(null_logl, dtype = np.float64))
+
+
+
+def evidence_ratios(alternative_logl, null_logl):
+    """
+        Return per-site evidence ratios, :code:`exp(alternative_logl - null_logl)`, i.e. the likelihood ratios which BUSTED reports as "Evidence Ratios". Arrays of any (matching) shape are accepted. Ratios too large to represent are inf.
+
+        Required arguments:
+            1. **alternative_logl**, an array of site log likelihoods under the alternative (e.g. unconstrained) model
+            2. **null_logl**, an array of site log likelihoods under the null (e.g. constrained) model
+
+        **Examples:**
+
+           >>> evidence_ratios([-3.82, -10.5], [-3.81, -12.0])
+           array([0.99004983, 4.48168907])
+    """
+    with np.errstate(over = "ignore"):
+        return np.exp(np.asarray(alternative_logl, dtype = np.float64) - np.asarray(null_logl, dtype = np.float64))
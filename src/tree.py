@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Array-backed representations of the phylogenies found in HyPhy output.
+"""
+
+import sys
+import re
+import numpy as np
+
+if __name__ == "__main__":
+    print("\nThis is the Tree module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+
+### Characters which ete3 replaces with "_" in newick names and NHX values
+_ILLEGAL_NEWICK = re.compile("[:;(),\\[\\]\t\n\r=]")
+### Newick tokens: structural characters, or the label text (name and length) between them. Bracketed comments (e.g. NHX) are removed before tokenizing.
+_NEWICK_TOKENS  = re.compile("[(),;]|[^(),;]+")
+_NEWICK_COMMENT = re.compile("\\[[^\\]]*\\]")
+
+
+
+class NodeIndex():
+    """
+        This class maps the HyPhy node names of a single tree to dense integers, in **postorder** (children always precede their parent, and the root is the final node).
+        Any per-node quantity (attributes, original names, branch sets, branch lengths) can then be stored as an array and joined by integer position.
+
+        Attributes:
+            + **names**, list of node names in postorder. The root is unnamed in HyPhy output, and is given the name "".
+            + **index**, dictionary mapping node name to its integer position
+            + **parent**, int64 array of each node's parent position (-1 for the root)
+            + **child_offsets**, **children**, int64 arrays in compressed sparse row form: the children of node `i` are :code:`children[child_offsets[i]:child_offsets[i+1]]`, in newick order
+            + **lengths**, float64 array of input branch lengths (NaN for the root)
+            + **is_tip**, boolean array indicating which nodes are tips
+            + **root**, position of the root node
+    """
+
+    def __init__(self, names, parent, lengths):
+        """
+            Initialize a NodeIndex instance from postorder arrays. Generally this is created for you by an `Extractor`, see :code:`Extractor.extract_node_index()`, or with :code:`NodeIndex.from_ete()`.
+
+            Required arguments:
+                1. **names**, list of node names, in postorder
+                2. **parent**, list of parent positions for each node (-1 for the root)
+                3. **lengths**, list of branch lengths for each node
+        """
+        self.names   = [str(x) for x in names]
+        self.index   = dict( (name, i) for i, name in enumerate(self.names) )
+        self.parent  = np.asarray(parent, dtype = np.int64)
+        self.lengths = np.asarray(lengths, dtype = np.float64)
+        self.nnodes  = len(self.names)
+        assert(self.nnodes > 0 and self.parent[-1] == -1), "\n[ERROR]: Nodes must be provided in postorder, ending with the root."
+        self.root    = self.nnodes - 1
+
+        counts = np.bincount(self.parent[:-1], minlength = self.nnodes)
+        self.child_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        ### Stable sort keeps children in their original (newick) order
+        self.children = np.argsort(self.parent[:-1], kind = "mergesort").astype(np.int64)
+        self.is_tip = counts == 0
+        self._template = None
+        self._escaped_names = None
+
+
+    @classmethod
+    def from_newick(cls, newick):
+        """
+            Return a NodeIndex parsed from a newick string, with node names and branch lengths read as ete3 reads `format = 1`: every node may have a name and a length, and nodes without a length are given 1.
+            Bracketed comments, such as NHX features, are ignored.
+
+            Required arguments:
+                1. **newick**, the newick tree string
+
+            **Examples:**
+
+               >>> index = NodeIndex.from_newick("((a:0.1,b:0.2)Node1:0.3,c:0.4);")
+               >>> index.names
+               ['a', 'b', 'Node1', 'c', '']
+        """
+        newick = re.sub("[\n\r\t]+", "", _NEWICK_COMMENT.sub("", str(newick))).strip()
+        assert(newick.count("(") == newick.count(")")), "\n[ERROR]: Parentheses do not match in newick tree."
+
+        ### Nodes are first numbered in the order they appear in the string (i.e. preorder)
+        parent = []
+        names = []
+        lengths = []
+        open_nodes = []
+        last = None ## the node which a label would belong to: the leaf just read, or the internal node just closed
+        for token in _NEWICK_TOKENS.findall(newick):
+            if token == "(":
+                parent.append(open_nodes[-1] if open_nodes else -1)
+                names.append("")
+                lengths.append(1.)
+                open_nodes.append(len(parent) - 1)
+                last = None
+            elif token == "," or token == ")":
+                assert(last is not None and open_nodes), "\n[ERROR]: Empty leaf node found in newick tree."
+                last = open_nodes.pop() if token == ")" else None
+            elif token == ";":
+                break
+            else:
+                token = token.strip()
+                if not token:
+                    continue
+                if last is None:
+                    parent.append(open_nodes[-1] if open_nodes else -1)
+                    names.append("")
+                    lengths.append(1.)
+                    last = len(parent) - 1
+                name, colon, length = token.partition(":")
+                names[last] = name.strip()
+                if colon:
+                    try:
+                        lengths[last] = float(length)
+                    except ValueError:
+                        raise AssertionError("\n[ERROR]: Unexpected branch length in newick tree: " + token)
+        assert(len(parent) > 0 and parent.count(-1) == 1 and not open_nodes), "\n[ERROR]: Malformed newick tree."
+
+        ### Reorder into postorder: a preorder walk which visits children right-to-left, reversed
+        children = [[] for i in range(len(parent))]
+        for i in range(1, len(parent)):
+            children[parent[i]].append(i)
+        walk = []
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            walk.append(i)
+            stack.extend(children[i])
+        order = walk[::-1]
+        position = [0] * len(order)
+        for i, node in enumerate(order):
+            position[node] = i
+        lengths[0] = np.nan
+        return cls([names[node] for node in order], [-1 if parent[node] == -1 else position[parent[node]] for node in order], [lengths[node] for node in order])
+
+
+    @classmethod
+    def from_ete(cls, etree):
+        """
+            Return a NodeIndex built from a single ete3 `Tree`.
+
+            Required arguments:
+                1. **etree**, the ete3 tree to index
+        """
+        position = {}
+        names = []
+        lengths = []
+        nodes = []
+        for node in etree.traverse("postorder"):
+            position[id(node)] = len(nodes)
+            nodes.append(node)
+            names.append(node.name)
+            lengths.append(np.nan if node.is_root() else node.dist)
+        parent = [-1 if node.up is None else position[id(node.up)] for node in nodes]
+        return cls(names, parent, lengths)
+
+
+    def __len__(self):
+        return self.nnodes
+
+
+    def position(self, name):
+        """
+            Return the integer position of a node.
+
+            Required arguments:
+                1. **name**, the HyPhy node name
+        """
+        return self.index[name]
+
+
+    def children_of(self, i):
+        """
+            Return an array of the positions of the children of node `i`.
+
+            Required arguments:
+                1. **i**, the position of the node of interest
+        """
+        return self.children[self.child_offsets[i]:self.child_offsets[i+1]]
+
+
+    def align(self, values, default = None):
+        """
+            Return a list of the given values aligned to the node order, i.e. entry `i` is :code:`values[names[i]]`.
+
+            Required arguments:
+                1. **values**, a dictionary keyed by node name
+
+            Optional keyword arguments:
+                1. **default**, the value used for nodes which are absent from `values`. Default: None.
+        """
+        return [values.get(name, default) for name in self.names]
+
+
+    def _obtain_template(self):
+        """
+            Private method: Return the newick template of the tree, built on first use: a format string of the tree's structure (parentheses and commas) with one `%s` slot per node in newick order, and a list of the node position filling each slot.
+            The root's slot comes last, just before the closing ";".
+        """
+        if self._template is None:
+            ### Iterative preorder walk: non-negative entries open a node, -1 is a comma, and -(i+2) closes node i
+            pieces = []
+            order = []
+            stack = [self.root]
+            while stack:
+                i = stack.pop()
+                if i == -1:
+                    pieces.append(",")
+                elif i < -1:
+                    pieces.append(")%s")
+                    order.append(-i-2)
+                elif self.is_tip[i]:
+                    pieces.append("%s")
+                    order.append(i)
+                else:
+                    pieces.append("(")
+                    stack.append(-i-2)
+                    children = self.children_of(i)
+                    for j in range(len(children) - 1, 0, -1):
+                        stack.append(int(children[j]))
+                        stack.append(-1)
+                    stack.append(int(children[0]))
+            pieces.append(";")
+            self._template = ("".join(pieces), order)
+        return self._template
+
+
+    def freeze(self):
+        """
+            Build the newick template and escaped node names straight away, and make the per-node arrays read-only, so that the NodeIndex is only ever read from afterwards (e.g. when shared by threads or forked workers). Returns the NodeIndex itself.
+        """
+        self._obtain_template()
+        if self._escaped_names is None:
+            self._escaped_names = [_ILLEGAL_NEWICK.sub("_", name) for name in self.names]
+        for array in (self.parent, self.lengths, self.child_offsets, self.children, self.is_tip):
+            array.flags.writeable = False
+        return self
+
+
+    def write(self, lengths = None, names = None, features = None, root_features = None):
+        """
+            Return the tree as a newick string, formatted exactly as ete3 writes `format = 1` (node names, and branch lengths with 6 significant digits; the root has neither).
+            The NodeIndex itself is never modified: replacement branch lengths, names, and NHX features are given per call as sequences aligned to the node order (see :code:`align()`), and are filled into a template of the tree which is built only once.
+
+            Optional keyword arguments:
+                1. **lengths**, branch lengths for each node. Default: the input branch lengths.
+                2. **names**, names for each node. Default: the HyPhy node names.
+                3. **features**, a list of (label, values) tuples, one per feature, written as `[&&NHX:label=value:...]` for every node but the root. Default: None.
+                4. **root_features**, a list of (label, value) tuples written as an NHX block for the root. Default: None, i.e. nothing is written for the root.
+
+            **Examples:**
+
+               >>> index = e.extract_node_index() ## For a single-partition Extractor e
+               >>> index.write(lengths = [1] * len(index))
+        """
+        template, order = self._obtain_template()
+        nbranches = self.nnodes - 1
+
+        if names is None:
+            if self._escaped_names is None:
+                self._escaped_names = [_ILLEGAL_NEWICK.sub("_", name) for name in self.names]
+            names = self._escaped_names
+        else:
+            assert(len(names) == self.nnodes), "\n[ERROR]: Names must be aligned to the node index."
+            names = [_ILLEGAL_NEWICK.sub("_", str(name)) for name in names]
+
+        if lengths is None:
+            lengths = self.lengths
+        assert(len(lengths) == self.nnodes), "\n[ERROR]: Branch lengths must be aligned to the node index."
+        try:
+            labels = [name + ":%0.6g" % float(length) for name, length in zip(names[:nbranches], lengths[:nbranches])]
+        except (TypeError, ValueError):
+            for i in range(nbranches):
+                try:
+                    float(lengths[i])
+                except (TypeError, ValueError):
+                    raise AssertionError("\n[ERROR]: Branch length for node " + self.names[i] + " is not a number.")
+            ### Every length is a number, so the labels themselves could not be built
+            raise
+
+        if features:
+            escaped = {}
+            columns = []
+            for label, values in features:
+                assert(len(values) == self.nnodes), "\n[ERROR]: Feature values must be aligned to the node index."
+                column = []
+                for value in values[:nbranches]:
+                    value = str(value)
+                    if value not in escaped:
+                        escaped[value] = _ILLEGAL_NEWICK.sub("_", value)
+                    column.append(label + "=" + escaped[value])
+                columns.append(column)
+            labels = [label + "[&&NHX:" + ":".join(parts) + "]" for label, parts in zip(labels, zip(*columns))]
+
+        root = ""
+        if root_features:
+            root = "[&&NHX:" + ":".join( [label + "=" + _ILLEGAL_NEWICK.sub("_", str(value)) for label, value in root_features] ) + "]"
+        labels.append(root)
+        return template % tuple([labels[i] for i in order])
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+##############################################################################
+##  phyhy: *P*ython *HyPhy*: Facilitating the execution and parsing of standard HyPhy analyses.
+##
+##  Written by Stephanie J. Spielman (stephanie.spielman@temple.edu)
+##############################################################################
+"""
+    Streaming writers for tabular `phyphy` output, including compressed files.
+"""
+
+import sys
+import io
+import csv
+import gzip
+from contextlib import contextmanager
+
+if __name__ == "__main__":
+    print("\nThis is the Writers module in `phyphy`. Please consult docs for `phyphy` usage." )
+    sys.exit()
+
+
+
+_COMPRESSION_EXTENSIONS = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+_BUFFER_SIZE = 1 << 20
+
+
+
+def infer_compression(target):
+    """
+        Return the compression ("gzip", "zstd", or None) implied by a file name's extension.
+
+        Required arguments:
+            1. **target**, a file name, or a file-like object (for which None is returned)
+    """
+    if hasattr(target, "write"):
+        return None
+    target = str(target).lower()
+    for extension in _COMPRESSION_EXTENSIONS:
+        if target.endswith(extension):
+            return _COMPRESSION_EXTENSIONS[extension]
+    return None
+
+
+
+@contextmanager
+def open_output(target, compression = "infer"):
+    """
+        Context manager yielding a buffered text stream for writing tabular output.
+        File-like targets are written to directly and are **not** closed. File names are opened (and closed) here, optionally with compression.
+
+        Required arguments:
+            1. **target**, a file name, or an open file-like object with a :code:`write()` method
+
+        Optional keyword arguments:
+            1. **compression**, One of "infer" (Default, determine from the file name extension, i.e. `.gz` or `.zst`), "gzip", "zstd", or None. Zstandard compression requires the `zstandard` package.
+
+        **Examples:**
+
+           >>> with open_output("sites.csv.gz") as f:
+           ...     f.write("site,p-value\\n")
+    """
+    if hasattr(target, "write"):
+        assert(compression in ("infer", None)), "\n[ERROR]: Compression can only be applied when writing to a file name."
+        yield target
+        return
+
+    if compression == "infer":
+        compression = infer_compression(target)
+    assert(compression in ("gzip", "zstd", None)), "\n[ERROR]: Argument `compression` must be one of 'infer', 'gzip', 'zstd', or None."
+
+    if compression == "gzip":
+        handle = gzip.open(target, "wt", compresslevel = 6, newline = "")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("\n[ERROR]: The `zstandard` package is required for zstd output.")
+        raw = open(target, "wb")
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd = True)
+        handle = io.TextIOWrapper(io.BufferedWriter(stream, _BUFFER_SIZE), newline = "")
+    else:
+        handle = open(target, "w", newline = "", buffering = _BUFFER_SIZE)
+    try:
+        yield handle
+    finally:
+        handle.close()
+
+
+
+def write_delimited(target, header, rows, delim = ",", compression = "infer"):
+    """
+        Stream a header and rows to a delimited file, one row at a time. Lines are separated by newlines, with no newline after the last row.
+        With a single-character delimiter, fields are written with :code:`csv.writer` semantics (fields containing the delimiter or quotes are quoted). Longer delimiters are written between fields as they are, without quoting.
+        Rows may be any iterable, including a generator, so the full output is never held in memory.
+
+        Required arguments:
+            1. **target**, a file name, or an open file-like object
+            2. **header**, a list of column names
+            3. **rows**, an iterable of rows, each a list of values
+
+        Optional keyword arguments:
+            1. **delim**, The delimiter. Default: ","
+            2. **compression**, see :code:`open_output()`. Default: "infer"
+
+        **Examples:**
+
+           >>> write_delimited("out.tsv.gz", ["site", "p-value"], [[1, 0.2], [2, 0.04]], delim = "\\t")
+    """
+    assert(len(delim) > 0), "\n[ERROR]: Argument `delim` must not be empty."
+    with open_output(target, compression = compression) as handle:
+        if len(delim) > 1:
+            handle.write( delim.join(str(x) for x in header) )
+            for row in rows:
+                handle.write( "\n" + delim.join(str(x) for x in row) )
+            return
+        
+        ### Every row but the last is written straight to the output; the last is written without its line terminator
+        writer = csv.writer(handle, delimiter = delim, lineterminator = "\n")
+        last = header
+        for row in rows:
+            writer.writerow(last)
+            last = row
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter = delim, lineterminator = "\n").writerow(last)
+        handle.write( buffer.getvalue()[:-1] )
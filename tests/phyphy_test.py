@@ -14,6 +14,26 @@
 import unittest
 import os
 import csv
+import io
+import gzip
+import json
+import pickle
+import shutil
+import tempfile
+import numpy as np
+try:
+    import pandas
+except ImportError:
+    pandas = None
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+try:
+    from ete3 import Tree
+except ImportError:
+    Tree = None
 from phyphy import *
 
 
@@ -342,6 +362,981 @@ class test_extractor_extract_reveal(unittest.TestCase):
 
 
 
+class test_extractor_columns(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel = Extractor(self.data_path + "FEL.json")
+        self.fel_mult = Extractor(self.data_path + "FEL_multipartitions.json")
+        self.absrel = Extractor(self.data_path + "ABSREL.json")
+
+    def test_numeric_column(self):
+        values, missing = self.fel.extract_branch_attribute_array("Global MG94xREV")
+        nodes = self.fel.extract_branch_columns().nodes
+        self.assertEqual("float64", str(values.dtype), msg = "Branch lengths should be stored as floats")
+        self.assertFalse(missing[:-1].any(), msg = "No branch lengths should be missing")
+        self.assertTrue(missing[-1], msg = "The root has no branch length and should be masked")
+        self.assertEqual(0.192554792970548, values[nodes.index("Pig")], msg = "Could not extract typed branch attribute")
+
+    def test_integer_column(self):
+        values, missing = self.absrel.extract_branch_attribute_array("Rate classes")
+        self.assertEqual("int64", str(values.dtype), msg = "Rate classes should be stored as integers")
+        self.assertEqual(2, self.absrel.extract_branch_columns().value("Rate classes", "Separator"), msg = "Could not extract single typed value")
+
+    def test_missing_mask(self):
+        values, missing = self.fel.extract_branch_attribute_array("original name")
+        nodes = self.fel.extract_branch_columns().nodes
+        self.assertTrue(missing[nodes.index("Node3")], msg = "Internal nodes have no original name and should be masked")
+        self.assertEqual("Pig~gy", values[nodes.index("Pig")], msg = "Could not extract node label column")
+
+    def test_multiple_partitions(self):
+        columns = self.fel_mult.extract_branch_attribute_array("Global MG94xREV")
+        self.assertEqual([0,1,2,3], sorted(columns.keys()), msg = "Should return columns for all partitions")
+        values, missing = self.fel_mult.extract_branch_attribute_array("Global MG94xREV", partition = 1)
+        nodes = self.fel_mult.extract_branch_columns(partition = 1).nodes
+        self.assertAlmostEqual(0.011078118042, values[nodes.index("AF231114")], msg = "Could not extract typed attribute for specific partition")
+
+
+
+
+
+
+class test_extractor_node_index(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel = Extractor(self.data_path + "FEL.json")
+        self.fel_mult = Extractor(self.data_path + "FEL_multipartitions.json")
+
+    def test_postorder(self):
+        idx = self.fel.extract_node_index()
+        self.assertEqual(["Pig", "Cow", "Node3", "Horse", "Cat", "Node2"], idx.names[:6], msg = "Node index is not in postorder")
+        self.assertEqual(idx.root, len(idx) - 1, msg = "Root should be the last node")
+        self.assertEqual(-1, idx.parent[idx.root], msg = "Root should have no parent")
+        self.assertTrue((idx.parent[:-1] > np.arange(len(idx) - 1)).all(), msg = "Children must precede their parents")
+
+    def test_children(self):
+        idx = self.fel.extract_node_index()
+        children = [idx.names[i] for i in idx.children_of(idx.position("Node2"))]
+        self.assertEqual(["Node3", "Horse", "Cat"], children, msg = "Could not obtain children from node index")
+        self.assertEqual(10, idx.is_tip.sum(), msg = "Could not identify tips")
+        self.assertAlmostEqual(0.085099, idx.lengths[idx.position("Node3")], msg = "Could not obtain input branch lengths")
+
+    def test_partitions(self):
+        self.assertEqual([0,1,2,3], sorted(self.fel_mult.extract_node_index().keys()), msg = "Should return an index per partition")
+        idx = self.fel_mult.extract_node_index(partition = 2)
+        self.assertEqual(idx.names, self.fel_mult.extract_branch_columns(partition = 2).nodes, msg = "Branch columns should follow the node index")
+
+    def test_branch_set_labels(self):
+        labels = self.fel.extract_branch_set_labels()
+        self.assertEqual(["test"] * 16 + [""], list(labels), msg = "Could not align branch sets to node index")
+
+    @unittest.skipIf(Tree is None, "ete3 is not installed")
+    def test_write_matches_ete(self):
+        idx = self.fel.extract_node_index()
+        self.assertEqual(self.fel.input_tree_ete[0].write(format = 1), idx.write(), msg = "Node index does not write the same newick as ete3")
+        lengths = np.arange(len(idx)) / 7.
+        nodes = list(self.fel.input_tree_ete[0].traverse("postorder"))
+        for node, length in zip(nodes, lengths):
+            node.add_feature("rank", length)
+        self.assertEqual(Tree(self.fel.input_tree[0], format = 1).write(format = 1), idx.write(), msg = "Writing should not modify the node index")
+        for node, length in zip(nodes[:-1], lengths):
+            node.dist = length
+        self.assertEqual(self.fel.input_tree_ete[0].write(format = 1, features = ["rank"]), idx.write(lengths = lengths, features = [("rank", lengths)]), msg = "Node index does not write the same NHX as ete3")
+
+    def test_write_template(self):
+        idx = NodeIndex.from_newick("((a:1,b:2)x:3,c:4);")
+        self.assertEqual("((a:1,b_b:2)x:3,c:4);", idx.write(names = ["a", "b;b", "x", "c", ""]), msg = "Illegal newick characters in names should be replaced")
+        self.assertEqual("((a:1[&&NHX:f=0],b:2[&&NHX:f=1])x:3[&&NHX:f=2],c:4[&&NHX:f=3])[&&NHX:f=root];", idx.write(features = [("f", range(5))], root_features = [("f", "root")]), msg = "Could not write root features")
+        self.assertEqual("((a:1,b:2)x:3,c:4);", idx.write(), msg = "Template should be reused unchanged across calls")
+        with self.assertRaises(AssertionError):
+            idx.write(lengths = [1, "b", 3, 4, 0])
+
+    def test_write_label_error(self):
+        class Flaky():
+            calls = 0
+            def __float__(self):
+                Flaky.calls += 1
+                if Flaky.calls == 1:
+                    raise ValueError("first call")
+                return 1.
+        idx = NodeIndex.from_newick("((a:1,b:2)x:3,c:4);")
+        with self.assertRaises(ValueError):
+            idx.write(lengths = [Flaky(), 2, 3, 4, 0])
+
+    def test_from_newick(self):
+        idx = NodeIndex.from_newick("((a:0.5,b)Node1:2[&&NHX:f=1],(c:1e-10)Node2:0);")
+        self.assertEqual(["a", "b", "Node1", "c", "Node2", ""], idx.names, msg = "Could not parse newick into postorder")
+        self.assertEqual([2, 2, 5, 4, 5, -1], list(idx.parent), msg = "Could not parse newick parents")
+        self.assertEqual([0.5, 1., 2., 1e-10, 0.], list(idx.lengths[:-1]), msg = "Could not parse newick lengths, or missing lengths should be 1")
+        self.assertRaises(AssertionError, NodeIndex.from_newick, "((a,b),c;")
+        self.assertRaises(AssertionError, NodeIndex.from_newick, "((a,),c);")
+
+    @unittest.skipIf(Tree is None, "ete3 is not installed")
+    def test_from_newick_matches_ete(self):
+        for partition, newick in self.fel_mult.input_tree.items():
+            idx = NodeIndex.from_newick(newick)
+            ete_idx = NodeIndex.from_ete(Tree(newick, format = 1))
+            self.assertEqual(ete_idx.names, idx.names, msg = "Parsed node order differs from ete3")
+            self.assertTrue((ete_idx.parent == idx.parent).all() and np.allclose(ete_idx.lengths[:-1], idx.lengths[:-1]), msg = "Parsed tree differs from ete3")
+
+    def test_import_without_ete(self):
+        import subprocess
+        import sys
+        code = "import sys; import phyphy; e = phyphy.Extractor('" + self.data_path + "FEL.json'); e.extract_model_tree('Global MG94xREV'); print('ete3' in sys.modules)"
+        output = subprocess.check_output([sys.executable, "-c", code]).decode().strip()
+        self.assertEqual("False", output, msg = "ete3 should only be imported when ete3 trees are requested")
+
+    def test_original_names(self):
+        self.fel.original_names["Pig"] = "Pig~gy"
+        tree = self.fel.extract_model_tree("Global MG94xREV", original_names = True)
+        self.assertTrue(tree.startswith("((((Pig~gy:0.192555,Cow:"), msg = "Could not write tree with original names")
+        self.assertEqual("Pig~gy", self.fel._node_names(0, original_names = True)[0], msg = "Original names should be aligned to the node index")
+        self.assertEqual(tree, self.fel.extract_model_tree("Global MG94xREV", original_names = True), msg = "Cached original names give a different tree")
+        self.assertIsNone(pickle.loads(pickle.dumps(self.fel))._original_node_names, msg = "Cached original names should not be pickled")
+
+    def test_mapping_does_not_modify(self):
+        before = self.fel_mult.extract_input_tree()
+        self.fel_mult.map_branch_attribute("Global MG94xREV", original_names = True)
+        self.fel_mult.extract_feature_tree("Global MG94xREV", update_branch_lengths = "Global MG94xREV", partition = 1)
+        self.assertEqual(before, self.fel_mult.extract_input_tree(), msg = "Mapping attributes modified the input trees")
+        self.assertEqual(before[2], self.fel_mult.extract_node_index(partition = 2).write(), msg = "Mapping attributes modified the node index")
+
+
+
+
+
+
+class test_extractor_attribute_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.absrel = Extractor(self.data_path + "ABSREL.json")
+        self.fel_mult = Extractor(self.data_path + "FEL_multipartitions.json")
+
+    def test_returns_copies(self):
+        rates = self.absrel.extract_branch_attribute("Rate classes")
+        rates["Node7"] = "100"
+        self.assertEqual("1", self.absrel.extract_branch_attribute("Rate classes")["Node7"], msg = "Modifying a returned attribute dictionary should not affect the Extractor")
+        self.assertEqual(self.fel_mult.extract_branch_attribute("Global MG94xREV")[2], self.fel_mult.extract_branch_attribute("Global MG94xREV", partition = 2), msg = "Memoized partitions disagree")
+
+    def test_invalidated(self):
+        self.assertEqual("1", self.absrel.extract_branch_attribute("Rate classes")["0564_7"], msg = "Could not look up attribute")
+        columns = self.absrel._attribute_columns[0]
+        columns.values["Rate classes"][columns.node_index["0564_7"]] = 3
+        self.absrel._reset_attribute_caches()
+        self.assertEqual("3", self.absrel.extract_branch_attribute("Rate classes")["0564_7"], msg = "Memoized attributes were not invalidated")
+        self.assertTrue("Rateclasses=3" in self.absrel.extract_feature_tree("Rate classes"), msg = "Changed attributes were not seen by feature trees")
+
+    def test_stored_as_columns(self):
+        with open(self.data_path + "FEL_multipartitions.json", "r") as f:
+            raw = json.load(f)["branch attributes"]
+        self.assertDictEqual(raw, self.fel_mult.json["branch attributes"], msg = "Storing columns should leave the JSON unchanged")
+        attributes = self.fel_mult.branch_attributes
+        self.assertEqual(sorted(int(x) for x in raw if x != "attributes"), sorted(attributes.keys()), msg = "Partitions lost")
+        for x in attributes:
+            self.assertDictEqual(raw[str(x)], attributes[x], msg = "Branch attributes do not match the JSON")
+            self.assertDictEqual(raw[str(x)], self.fel_mult._attribute_columns[x].to_dict(), msg = "Branch attributes were not recovered from columns")
+        fel = Extractor(self.data_path + "FEL.json")
+        self.assertIs(int, type(fel.branch_attributes[0]["Human"]["Global MG94xREV"]), msg = "Integer values should be recovered as integers")
+        self.assertEqual("0", fel.extract_branch_attribute("Global MG94xREV")["Human"], msg = "Integer values should be written as integers")
+
+    def test_single_pass(self):
+        lengths, rates = self.absrel._aligned_attributes(["Full adaptive model", "Rate classes"], 0)
+        self.assertEqual(self.absrel._aligned_attribute("Rate classes", 0), rates, msg = "Attributes gathered together and alone disagree")
+        self.assertEqual("", lengths[-1], msg = "The root should have no value")
+
+
+
+
+class test_extractor_model_trees(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel = Extractor(self.data_path + "FEL.json")
+        self.fel_mult = Extractor(self.data_path + "FEL_multipartitions.json")
+        self.busted = Extractor(self.data_path + "BUSTED.json")
+
+    def test_matrix(self):
+        m = self.fel.extract_branch_length_matrix()
+        self.assertEqual(["Nucleotide GTR", "Global MG94xREV"], m["models"], msg = "Wrong default models")
+        self.assertEqual((len(m["branches"]), 2), m["lengths"].shape, msg = "Wrong matrix shape")
+        lengths = self.fel.extract_branch_attribute("Global MG94xREV")
+        self.assertTrue(np.allclose([float(lengths[b]) for b in m["branches"]], m["lengths"][:,1]), msg = "Matrix column disagrees with branch attribute")
+        self.assertEqual(4, len(self.fel_mult.extract_branch_length_matrix()), msg = "Should return all partitions by default")
+        self.assertEqual(["Global MG94xREV"], self.fel_mult.extract_branch_length_matrix("Global MG94xREV", partition = 2)["models"], msg = "Could not select a model and partition")
+
+    def test_model_trees(self):
+        for e in (self.fel, self.fel_mult):
+            for original_names in (False, True):
+                trees = e.extract_model_trees(original_names = original_names)
+                for model in trees:
+                    self.assertEqual(e.extract_model_tree(model, original_names = original_names), trees[model], msg = "Model trees disagree with extract_model_tree")
+        self.assertEqual(self.fel_mult.extract_model_tree("Global MG94xREV", partition = 2), self.fel_mult.extract_model_trees(partition = 2)["Global MG94xREV"], msg = "Could not select a partition")
+
+    def test_busted_models(self):
+        trees = self.busted.extract_model_trees(["Unconstrained model", "Constrained model"])
+        self.assertEqual(self.busted.extract_model_tree("Unconstrained model"), trees["Unconstrained model"], msg = "Could not extract BUSTED model trees")
+        with self.assertRaises(AssertionError):
+            self.fel.extract_model_trees(["Not a model"])
+
+
+
+
+class test_extractor_serialize(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel_mult = Extractor(self.data_path + "FEL_multipartitions.json")
+
+    @unittest.skipIf(Tree is None, "ete3 is not installed")
+    def test_pickle_roundtrip(self):
+        self.fel_mult.input_tree_ete ## force the ete trees to be built before pickling
+        restored = pickle.loads(pickle.dumps(self.fel_mult))
+        self.assertIsNone(restored._input_tree_ete, msg = "Derived ete trees should not be pickled")
+        self.assertEqual(self.fel_mult.extract_model_tree("Global MG94xREV"), restored.extract_model_tree("Global MG94xREV"), msg = "Pickled Extractor does not reproduce model trees")
+
+    def test_to_from_bytes(self):
+        restored = Extractor.from_bytes(self.fel_mult.to_bytes())
+        self.assertEqual(self.fel_mult.input_tree, restored.input_tree, msg = "Could not restore Extractor from bytes")
+        self.assertEqual(self.fel_mult.extract_model_logl("Global MG94xREV"), restored.extract_model_logl("Global MG94xREV"), msg = "Could not restore Extractor from bytes")
+
+    def test_compact_bytes(self):
+        for name in ("MEME.json", "SLAC.json"):
+            with open(self.data_path + name, "r") as f:
+                raw = json.load(f)
+            e = Extractor(self.data_path + name)
+            payload = e.to_bytes()
+            self.assertLess(len(payload), 0.6 * len(pickle.dumps(raw)), msg = "Serialized Extractor should be much smaller than its JSON")
+            restored = Extractor.from_bytes(payload)
+            self.assertEqual(pickle.dumps(e.json), pickle.dumps(restored.json), msg = "Packed JSON was not restored exactly")
+            self.assertEqual(pickle.dumps(e.branch_attributes), pickle.dumps(restored.branch_attributes), msg = "Branch attributes were not restored exactly")
+            self.assertDictEqual(e.original_names, restored.original_names, msg = "Original names were not restored")
+
+
+
+
+class test_extractor_site_table(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel = Extractor(self.data_path + "FEL.json")
+        self.fel_mult = Extractor(self.data_path + "FEL_multipartitions.json")
+        self.slac = Extractor(self.data_path + "SLAC.json")
+
+    def test_columns(self):
+        table = self.fel.extract_site_table()
+        self.assertEqual(list(table.keys()), ["partition", "site", "alpha", "beta", "alpha=beta", "LRT", "p-value", "Total_branch_length"], msg = "Bad site table columns")
+        self.assertEqual(table["site"].dtype, np.int64, msg = "Site column should be integer")
+        self.assertEqual(len(table["p-value"]), 187, msg = "Bad site table length")
+        self.assertTrue(np.isclose(table["p-value"][0], 0.41759108), msg = "Bad site table value")
+
+    def test_matches_csv(self):
+        self.fel_mult.extract_csv("temp.csv")
+        with open("temp.csv", "r") as f:
+            lines = f.readlines()[1:]
+        os.remove("temp.csv")
+        table = self.fel_mult.extract_site_table()
+        self.assertEqual(len(lines), len(table["site"]), msg = "Site table and CSV differ in length")
+        last = lines[-1].strip().split(",")
+        self.assertEqual(int(last[0]), table["partition"][-1], msg = "Partition differs from CSV")
+        self.assertEqual(int(last[1]), table["site"][-1], msg = "Global site numbering differs from CSV")
+        self.assertTrue(np.isclose(float(last[6]), table["p-value"][-1]), msg = "Site table value differs from CSV")
+
+    def test_select_structured(self):
+        table = self.slac.extract_site_table(columns = ["dN", "dS"], slac_ancestral_type = "resolved", as_structured = True)
+        self.assertEqual(table.dtype.names, ("partition", "site", "dN", "dS"), msg = "Bad structured column selection")
+        full = self.slac.extract_site_table(slac_ancestral_type = "RESOLVED")
+        self.assertTrue(np.array_equal(table["dN"], full["dN"], equal_nan = True), msg = "Column selection changes values")
+
+    def test_bad_inputs(self):
+        with self.assertRaises(AssertionError):
+            self.fel.extract_site_table(columns = ["not_a_column"])
+        with self.assertRaises(AssertionError):
+            Extractor(self.data_path + "ABSREL.json").extract_site_table()
+
+
+
+
+class test_extractor_tables(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.absrel = Extractor(self.data_path + "ABSREL.json")
+        self.busted = Extractor(self.data_path + "BUSTED.json")
+        self.fel = Extractor(self.data_path + "FEL.json")
+
+    def test_absrel_table(self):
+        table = self.absrel.extract_absrel_table()
+        self.assertEqual(len(table["node"]), len(self.absrel.extract_branch_attribute("LRT")), msg = "aBSREL table should have one row per tested node")
+        i = list(table["node"]).index("0557_6")
+        self.assertTrue(np.isclose(table["LRT"][i], float(self.absrel.extract_branch_attribute("LRT")["0557_6"])), msg = "Bad aBSREL table value")
+        self.assertEqual(table["number_rate_classes"].dtype, np.int64, msg = "Rate classes should be integer")
+
+    def test_absrel_table_original_names(self):
+        table = self.absrel.extract_absrel_table(original_names = True)
+        original = self.absrel.extract_branch_attribute("original name")
+        self.assertTrue(set(original.values()) <= set(table["node"]), msg = "Bad original names in aBSREL table")
+        self.assertTrue("Node16" in table["node"], msg = "Nodes without original names should keep HyPhy names")
+
+    def test_model_fit_table(self):
+        table = self.fel.extract_model_fit_table()
+        self.assertEqual(list(table["model"]), self.fel.reveal_fitted_models(), msg = "Bad model fit table models")
+        self.assertTrue(np.allclose(table["AICc"], [self.fel.extract_model_aicc(m) for m in table["model"]]), msg = "Bad model fit table AICc")
+
+    def test_site_logl_table(self):
+        table = self.busted.extract_site_logl_table()
+        self.assertEqual(list(table.keys())[0], "site", msg = "Site column should come first")
+        self.assertTrue(np.allclose(table["constrained"], self.busted.extract_site_logl()["constrained"]), msg = "Bad site logl table")
+
+    def test_absrel_selection(self):
+        calls = self.absrel.extract_absrel_selection([0.01, 0.05, 0.3])
+        self.assertEqual((len(calls["node"]), 3), calls["selected"].shape, msg = "Bad selection matrix shape")
+        self.assertTrue(np.array_equal(calls["selected"].sum(axis = 0), [1, 3, 4]), msg = "Bad selection counts")
+        pvalues = self.absrel.extract_branch_attribute("Corrected P-value")
+        self.assertEqual([float(pvalues[n]) <= 0.05 for n in calls["node"]], list(calls["selected"][:, 1]), msg = "Selection calls disagree with corrected P-values")
+        before = (dict(self.absrel.attribute_names), self.absrel.extract_feature_tree("Rate classes"))
+        loose = self.absrel.extract_absrel_tree(p = 0.3, labels = ("yes", "no"))
+        self.assertNotEqual(self.absrel.extract_absrel_tree(p = 0.05), loose, msg = "Thresholds should change selection trees")
+        self.assertEqual(before, (self.absrel.attribute_names, self.absrel.extract_feature_tree("Rate classes")), msg = "Selection trees should not modify the Extractor")
+        self.assertFalse("Selected" in self.absrel.branch_attributes[0]["0564_3"], msg = "Selection trees should not modify branch attributes")
+        with self.assertRaises(AssertionError):
+            self.absrel.extract_absrel_selection([0.05, 2.])
+
+    def test_busted_site_arrays(self):
+        logl = self.busted.extract_site_logl_array()
+        raw = self.busted.extract_site_logl()
+        self.assertEqual(list(raw.keys()), logl["models"], msg = "Bad site log likelihood models")
+        self.assertTrue(np.array_equal(logl["values"], [raw[m] for m in logl["models"]]), msg = "Bad site log likelihood array")
+        ratios = self.busted.extract_evidence_ratio_array()
+        self.assertEqual((2, 949), ratios["values"].shape, msg = "Bad evidence ratio array shape")
+        self.assertTrue(np.allclose(ratios["values"][0], evidence_ratios(logl["values"][0], logl["values"][1])), msg = "Evidence ratios should be exp(unconstrained - constrained) site log likelihoods")
+        with self.assertRaises(AssertionError):
+            self.fel.extract_site_logl_array()
+
+    def test_rate_distribution_table(self):
+        table = self.fel.extract_rate_distribution_table()
+        gtr = self.fel.extract_model_rate_distributions("Nucleotide GTR")
+        for rate, value in gtr.items():
+            i = list(table["rate"]).index(rate)
+            self.assertEqual(value, table["value"][i], msg = "Rate table disagrees with extract_model_rate_distributions")
+        i = list(table["model"]).index("Global MG94xREV")
+        self.assertEqual(("test", "omega", 1.), (table["branch_set"][i], table["rate"][i], table["proportion"][i]), msg = "Bad omega row")
+        self.assertEqual(self.fel.extract_model_rate_distributions("Global MG94xREV")["test"]["omega"], table["value"][i], msg = "Bad omega value")
+        busted = self.busted.extract_rate_distribution_table(["Unconstrained model"])
+        raw = self.busted.extract_model_rate_distributions("Unconstrained model")["Test"]
+        self.assertTrue(np.array_equal(busted["rate_class"], [0, 1, 2]), msg = "Bad rate classes")
+        self.assertTrue(np.allclose(busted["proportion"], [raw[str(i)]["proportion"] for i in range(3)]), msg = "Bad rate class proportions")
+
+    def test_absrel_rate_classes(self):
+        classes = self.absrel.extract_absrel_rate_classes()
+        rates = self.absrel.extract_branch_attribute("Rate classes")
+        counts = np.diff(classes["offsets"])
+        self.assertEqual([int(rates[n]) for n in classes["node"]], list(counts), msg = "Offsets disagree with the number of rate classes")
+        self.assertEqual(len(classes["omega"]), classes["offsets"][-1], msg = "Bad ragged array length")
+        i = list(classes["node"]).index("0564_3")
+        self.assertTrue(np.allclose(classes["proportion"][classes["offsets"][i]:classes["offsets"][i+1]].sum(), 1.), msg = "Proportions of a branch should sum to 1")
+        with self.assertRaises(AssertionError):
+            self.fel.extract_absrel_rate_classes()
+
+
+
+@unittest.skipIf(pandas is None, "pandas is not installed")
+class test_extractor_dataframe(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+
+    def test_default_tables(self):
+        self.assertEqual(list(Extractor(self.data_path + "FEL.json").to_dataframe().columns)[:2], ["partition", "site"], msg = "Site methods should default to the site table")
+        self.assertEqual(list(Extractor(self.data_path + "ABSREL.json").to_dataframe().columns)[0], "node", msg = "aBSREL should default to the branch table")
+        self.assertEqual(len(Extractor(self.data_path + "BUSTED.json").to_dataframe()), 949, msg = "BUSTED should default to the site logl table")
+        self.assertEqual(list(Extractor(self.data_path + "RELAX.json").to_dataframe().columns), ["model", "logl", "estimated_parameters", "AICc"], msg = "Other methods should default to the fits table")
+
+    def test_dtypes_and_kwargs(self):
+        df = Extractor(self.data_path + "SLAC.json").to_dataframe("sites", columns = ["dN"], slac_ancestral_type = "RESOLVED")
+        self.assertEqual(list(df.columns), ["partition", "site", "dN"], msg = "Keyword arguments not passed to site table")
+        self.assertEqual(str(df["site"].dtype), "int64", msg = "DataFrame should keep integer types")
+
+    def test_bad_table(self):
+        with self.assertRaises(AssertionError):
+            Extractor(self.data_path + "FEL.json").to_dataframe("nope")
+
+
+
+
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class test_extractor_arrow(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel = Extractor(self.data_path + "FEL.json")
+        self.absrel = Extractor(self.data_path + "ABSREL.json")
+
+    def test_to_arrow_columns(self):
+        table = self.fel.to_arrow()
+        self.assertEqual(table.column_names[:5], ["method", "version", "input_file", "partition", "site"], msg = "Bad arrow metadata columns")
+        self.assertEqual(table.column("method").to_pylist()[0], "FEL", msg = "Bad method column")
+        self.assertEqual(table.column("version").to_pylist()[0], self.fel.extract_analysis_version(), msg = "Bad version column")
+        self.assertEqual(str(table.schema.field("site").type), "int64", msg = "Site should be typed as integer")
+        self.assertTrue(np.allclose(table.column("p-value").to_numpy(), self.fel.extract_site_table()["p-value"]), msg = "Bad arrow values")
+
+    def test_to_arrow_branches_fits(self):
+        branches = self.absrel.to_arrow()
+        self.assertEqual(branches.num_rows, len(self.absrel.extract_absrel_table()["node"]), msg = "Bad arrow branch table")
+        self.assertTrue("partition" in branches.column_names, msg = "Branch table should include partition")
+        fits = self.absrel.to_arrow("fits")
+        self.assertFalse("partition" in fits.column_names, msg = "Fits table should not include partition")
+        for table in ("rates", "site_logl"):
+            self.assertFalse("partition" in Extractor(self.data_path + "BUSTED.json").to_arrow(table).column_names, msg = "Tables spanning partitions should not include partition")
+        sites = Extractor(self.data_path + "FEL_multipartitions.json").to_arrow()
+        self.assertEqual([0, 1, 2, 3], sorted(set(sites.column("partition").to_pylist())), msg = "Site table should keep its partitions")
+
+    def test_parquet_roundtrip(self):
+        self.fel.extract_parquet("temp.parquet")
+        table = pyarrow.parquet.read_table("temp.parquet")
+        os.remove("temp.parquet")
+        self.assertTrue(table.equals(self.fel.to_arrow()), msg = "Parquet roundtrip changed the table")
+
+    def test_parquet_dataset(self):
+        root = "temp_dataset"
+        Extractor.extract_parquet_dataset([self.data_path + "FEL.json", self.absrel], root)
+        Extractor.extract_parquet_dataset([self.fel], root)
+        self.assertEqual(sorted(os.listdir(root)), ["method=ABSREL", "method=FEL"], msg = "Bad dataset partitioning")
+        nrows = pyarrow.parquet.read_table(os.path.join(root, "method=FEL")).num_rows
+        shutil.rmtree(root)
+        self.assertEqual(nrows, 2 * 187, msg = "Dataset writes should append")
+
+
+
+class test_extractor_slac_tensors(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.slac = Extractor(self.data_path + "SLAC.json")
+
+    def test_site_tensor(self):
+        tensor = self.slac.extract_slac_site_tensor()
+        self.assertEqual(tensor["values"].shape, (2, 1, 566, 11), msg = "Bad SLAC site tensor shape")
+        resolved = self.slac.extract_site_table(slac_ancestral_type = "RESOLVED")
+        self.assertTrue(np.array_equal(tensor["values"][1, 0, :, tensor["fields"].index("dN")], resolved["dN"], equal_nan = True), msg = "SLAC site tensor differs from site table")
+
+    def test_branch_tensor(self):
+        tensor = self.slac.extract_slac_branch_tensor()
+        self.assertEqual(tensor["values"].shape, (2, 323, 11), msg = "Bad SLAC by-branch shape")
+        self.assertEqual(tensor["substitutions"].shape, (566, 323, 2), msg = "Bad SLAC substitution tensor shape")
+        sites = self.slac.extract_site_table()
+        self.assertTrue(np.allclose(tensor["substitutions"][:, :, 1].sum(axis = 1), sites["N"]), msg = "Substitutions do not sum to per-site counts")
+        self.assertTrue(np.allclose(tensor["substitutions"][:, :, 0].sum(axis = 0), tensor["values"][0, :, tensor["fields"].index("S")]), msg = "Substitutions do not sum to per-branch counts")
+
+    def test_branch_tensor_missing_counts(self):
+        with open(self.data_path + "SLAC.json", "r") as f:
+            raw = json.load(f)
+        tensor = self.slac.extract_slac_branch_tensor()
+        branch = tensor["branches"][0]
+        del raw["branch attributes"]["0"][branch]["synonymous substitution count"]
+        tempdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tempdir, "SLAC.json")
+            with open(path, "w") as f:
+                json.dump(raw, f)
+            missing = Extractor(path).extract_slac_branch_tensor()
+        finally:
+            shutil.rmtree(tempdir)
+        self.assertTrue(np.isnan(missing["substitutions"][:, 0, 0]).all(), msg = "Missing synonymous counts should be NaN")
+        self.assertTrue(np.array_equal(tensor["substitutions"][:, 0, 1], missing["substitutions"][:, 0, 1]), msg = "Nonsynonymous counts should be unaffected")
+        self.assertTrue(np.array_equal(tensor["substitutions"][:, 1:], missing["substitutions"][:, 1:]), msg = "Other branches should be unaffected")
+
+    def test_not_slac(self):
+        with self.assertRaises(AssertionError):
+            Extractor(self.data_path + "FEL.json").extract_slac_site_tensor()
+
+
+
+class test_stats(unittest.TestCase):
+
+    def setUp(self):
+        self.pvalues = np.array([0.01, 0.04, 0.03, 0.2, np.nan])
+
+    def test_bh(self):
+        self.assertTrue(np.allclose(adjust_pvalues(self.pvalues)[:4], [0.04, 0.16/3, 0.16/3, 0.2]), msg = "Bad BH correction")
+        self.assertTrue(np.isnan(adjust_pvalues(self.pvalues)[4]), msg = "NaN P-values should remain NaN")
+
+    def test_holm_bonferroni(self):
+        self.assertTrue(np.allclose(adjust_pvalues(self.pvalues, method = "holm")[:4], [0.04, 0.09, 0.09, 0.2]), msg = "Bad Holm correction")
+        self.assertTrue(np.allclose(adjust_pvalues(self.pvalues, method = "Bonferroni")[:4], [0.04, 0.16, 0.12, 0.8]), msg = "Bad Bonferroni correction")
+
+    def test_groups(self):
+        grouped = adjust_pvalues(self.pvalues, groups = [0, 0, 1, 1, 1])
+        self.assertTrue(np.allclose(grouped[:2], adjust_pvalues(self.pvalues[:2])), msg = "Bad grouped correction")
+        self.assertTrue(np.allclose(grouped[2:4], adjust_pvalues(self.pvalues[2:4])), msg = "Bad grouped correction")
+
+    def test_tiny_pvalues(self):
+        self.assertTrue(np.allclose(adjust_pvalues([1e-300, 0.5], groups = [5, 5]), [2e-300, 0.5], rtol = 1e-12, atol = 0), msg = "Grouped correction lost precision")
+
+    def test_chi2_sf(self):
+        ### Reference values are the regularized upper incomplete gamma function, Q(df/2, x/2)
+        x = np.array([0.5, 3.84, 10., 20., 55., 0., np.nan])
+        df = np.array([1, 1, 2, 7, 12, 3, 2])
+        true = [0.4795001221869535, 0.050043521248705106, 0.006737946999085467, 0.005569683072945571, 1.8099213208598913e-07, 1., np.nan]
+        self.assertTrue(np.allclose(chi2_sf(x, df), true, rtol = 1e-10, atol = 0, equal_nan = True), msg = "Bad chi-squared survival function")
+        with self.assertRaises(AssertionError):
+            chi2_sf(1., 1.5)
+
+    def test_lrt_akaike(self):
+        lrt, p = lrt_pvalues([-14342.33586145556, -10.], [-14337.24586131138, -10.5], 1)
+        self.assertTrue(np.allclose(lrt, [10.18000028836104, 0.]), msg = "Bad LRT statistics")
+        self.assertTrue(np.allclose(p, [0.001419721590448342, 1.]), msg = "Bad LRT P-values")
+        weights = akaike_weights([[100., 102., np.nan], [np.nan, np.nan, np.nan]])
+        self.assertTrue(np.allclose(weights[0, :2], [1. / (1. + np.exp(-1.)), np.exp(-1.) / (1. + np.exp(-1.))]), msg = "Bad Akaike weights")
+        self.assertTrue(np.isnan(weights[0, 2]) and np.isnan(weights[1]).all(), msg = "Missing fits should remain NaN")
+        self.assertTrue(np.allclose(delta_aicc([100., 102., 99.]), [1., 3., 0.]), msg = "Bad delta AICc")
+
+    def test_site_lrt(self):
+        alternative = np.array([[-3.82, -10.5], [-1., -2.]])
+        null = np.array([[-3.81, -12.0], [-1., -1000.]])
+        self.assertTrue(np.allclose(site_lrt(alternative, null), [[-0.02, 3.], [0., 1996.]]), msg = "Bad site LRT")
+        ratios = evidence_ratios(alternative, null)
+        self.assertTrue(np.allclose(ratios[0], np.exp([-0.01, 1.5])), msg = "Bad evidence ratios")
+        self.assertTrue(np.isinf(ratios[1, 1]), msg = "Overflowing evidence ratios should be inf")
+
+
+
+class test_collection(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.fel = Extractor(self.data_path + "FEL.json")
+        self.meme = Extractor(self.data_path + "MEME.json")
+        self.collection = ExtractorCollection([self.fel, self.meme], names = ["fel", "meme"])
+
+    def test_offsets(self):
+        self.assertTrue(np.array_equal(self.collection.site_offsets(), [0, 187, 187 + 566]), msg = "Bad site offsets")
+        self.assertEqual(self.collection.gene_index()[187], 1, msg = "Bad gene index")
+
+    def test_site_table(self):
+        table = self.collection.extract_site_table()
+        self.assertEqual(list(table.keys()), ["gene", "partition", "site", "alpha", "LRT", "p-value", "Total_branch_length"], msg = "Collection site table should keep shared columns")
+        self.assertTrue(np.array_equal(table["p-value"][187:], self.meme.extract_site_table()["p-value"]), msg = "Collection site table is misaligned")
+
+    def test_adjust_pvalues(self):
+        pvalues = np.concatenate((self.fel.extract_site_table()["p-value"], self.meme.extract_site_table()["p-value"]))
+        self.assertTrue(np.allclose(self.collection.adjust_pvalues(), adjust_pvalues(pvalues)), msg = "Bad collection-wide correction")
+        by_gene = self.collection.adjust_pvalues(method = "holm", by_gene = True)
+        self.assertTrue(np.allclose(by_gene[:187], adjust_pvalues(pvalues[:187], method = "holm")), msg = "Bad per-gene correction")
+
+    def test_summary(self):
+        summary = self.collection.summarize_sites(alpha = 1.)
+        self.assertEqual(list(summary["gene"]), ["fel", "meme"], msg = "Bad summary genes")
+        self.assertTrue(np.array_equal(summary["significant"], [187, 566]), msg = "Bad summary counts")
+        self.assertTrue(np.array_equal(self.collection.count_per_gene(self.collection.gene_index() == 1), [0, 566]), msg = "Bad per-gene counts")
+
+    def test_model_fits(self):
+        c = ExtractorCollection([self.fel, Extractor(self.data_path + "RELAX.json"), Extractor(self.data_path + "BUSTED.json")])
+        fits = c.extract_model_fits(["Nucleotide GTR", "Global MG94xREV", "RELAX null"])
+        self.assertEqual((3, 3), fits["logL"].shape, msg = "Bad model fit array shape")
+        self.assertEqual(self.fel.extract_model_logl("Global MG94xREV"), fits["logL"][0, 1], msg = "Model fits are misaligned")
+        self.assertEqual(self.fel.extract_model_aicc("Nucleotide GTR"), fits["AICc"][0, 0], msg = "Model fits are misaligned")
+        self.assertEqual(86, fits["parameters"][1, 2], msg = "Model fits are misaligned")
+        self.assertTrue(np.isnan(fits["logL"][1, 1]), msg = "Missing models should be NaN")
+
+        relax = c.compare_models("RELAX null", "RELAX alternative")
+        self.assertTrue(np.allclose([relax["LRT"][1], relax["p-value"][1]], [10.18000028836104, 0.001419721590448342]), msg = "Collection LRT disagrees with RELAX")
+        self.assertTrue(np.isnan(relax["p-value"][[0, 2]]).all(), msg = "Genes without the models should be NaN")
+        busted = c.compare_models("Constrained model", "Unconstrained model", df = 2)
+        self.assertTrue(np.allclose(busted["p-value"][2], 0.001492592897096356), msg = "Collection LRT disagrees with BUSTED")
+        reversed_models = c.compare_models("RELAX alternative", "RELAX null")
+        self.assertTrue(np.isnan(reversed_models["df"][1]) and np.isnan(reversed_models["p-value"][1]), msg = "Models which are not nested should be NaN")
+        self.assertRaises(AssertionError, c.compare_models, "RELAX null", "RELAX alternative", df = 0)
+
+        weights = c.akaike_weights(["Nucleotide GTR", "Global MG94xREV"])
+        self.assertTrue(np.allclose(np.nansum(weights["weights"], axis = 1), 1.), msg = "Akaike weights should sum to 1")
+        self.assertEqual(0., np.nanmin(weights["delta AICc"][0]), msg = "Bad delta AICc")
+
+    def test_rate_distributions(self):
+        rates = self.collection.extract_rate_distribution_table(["Global MG94xREV"])
+        self.assertTrue(np.array_equal(rates["gene"], [0, 1]), msg = "Bad gene column")
+        self.assertEqual(self.meme.extract_model_rate_distributions("Global MG94xREV")["test"]["omega"], rates["value"][1], msg = "Collection rates are misaligned")
+        absrel = Extractor(self.data_path + "ABSREL.json").extract_absrel_rate_classes()
+        classes = ExtractorCollection([self.data_path + "ABSREL.json"] * 2).extract_absrel_rate_classes()
+        n = len(absrel["node"])
+        self.assertTrue(np.array_equal(classes["offsets"][n:] - classes["offsets"][n], absrel["offsets"]), msg = "Bad stacked offsets")
+        self.assertTrue(np.array_equal(classes["omega"][absrel["offsets"][-1]:], absrel["omega"]), msg = "Bad stacked rate classes")
+        self.assertEqual(1, classes["gene"][n], msg = "Bad gene column")
+
+    def test_lazy_sources(self):
+        c = ExtractorCollection([self.data_path + "FEL.json", self.data_path + "LEISR_deprecated.json", self.data_path + "MEME.json"], names = ["fel", "leisr", "meme"])
+        self.assertEqual(["fel", "meme"], c.names, msg = "Unparseable JSONs should be skipped")
+        self.assertEqual([self.data_path + "LEISR_deprecated.json"], [x[0] for x in c.skipped], msg = "Unparseable JSONs should be reported")
+        self.assertTrue("2.3.6" in c.skipped[0][1], msg = "Skipped JSONs should be reported with the reason")
+        self.assertFalse(any(isinstance(x, Extractor) for x in c.sources), msg = "Extractors of JSON files should not be kept")
+        for column in ("gene", "site", "p-value"):
+            self.assertTrue(np.array_equal(self.collection.extract_site_table()[column], c.extract_site_table()[column]), msg = "JSON files and Extractors give different site tables")
+        self.assertTrue(np.array_equal(self.collection.extract_model_fits()["logL"], c.extract_model_fits()["logL"]), msg = "JSON files and Extractors give different model fits")
+        self.assertEqual(2, len(c.extractors), msg = "Could not reload Extractors")
+
+    def test_busted_site_evidence(self):
+        busted = Extractor(self.data_path + "BUSTED.json")
+        c = ExtractorCollection([busted, busted])
+        logl = c.extract_busted_site_logl()
+        self.assertTrue(np.array_equal(logl["offsets"], [0, 949, 1898]), msg = "Bad BUSTED site offsets")
+        self.assertTrue(np.array_equal(logl["values"][:, 949:], busted.extract_site_logl_array()["values"]), msg = "BUSTED sites are misaligned")
+        evidence = c.busted_site_evidence(threshold = 100)
+        ratios = busted.extract_evidence_ratio_array()["values"][0]
+        self.assertTrue(np.allclose(evidence["ER"][949:], ratios), msg = "Collection evidence ratios disagree with BUSTED")
+        self.assertTrue(np.array_equal(evidence["max_site"], [np.argmax(ratios) + 1] * 2), msg = "Bad site of largest evidence ratio")
+        self.assertTrue(np.array_equal(evidence["sites_above"], [(ratios >= 100).sum()] * 2), msg = "Bad count of sites above threshold")
+        with self.assertRaises(AssertionError):
+            self.collection.extract_busted_site_logl()
+
+    def test_busted_site_evidence_nan(self):
+        with open(self.data_path + "BUSTED.json", "r") as f:
+            raw = json.load(f)
+        ratios = Extractor(self.data_path + "BUSTED.json").extract_evidence_ratio_array()["values"][0]
+        best = int(np.argmax(ratios))
+        tempdir = tempfile.mkdtemp()
+        try:
+            raw["Site Log Likelihood"]["constrained"][0][best] = float("nan")
+            with open(os.path.join(tempdir, "one.json"), "w") as f:
+                json.dump(raw, f)
+            raw["Site Log Likelihood"]["constrained"][0] = [float("nan")] * len(ratios)
+            with open(os.path.join(tempdir, "all.json"), "w") as f:
+                json.dump(raw, f)
+            evidence = ExtractorCollection([os.path.join(tempdir, "one.json"), os.path.join(tempdir, "all.json")]).busted_site_evidence()
+        finally:
+            shutil.rmtree(tempdir)
+        self.assertEqual(2, len(evidence["max_site"]), msg = "Every gene should have a site of largest evidence ratio")
+        masked = ratios.copy()
+        masked[best] = np.nan
+        self.assertEqual(np.nanargmax(masked) + 1, evidence["max_site"][0], msg = "NaN evidence ratios should be ignored")
+        self.assertEqual(-1, evidence["max_site"][1], msg = "Genes without evidence ratios should have no site")
+        self.assertTrue(np.isnan(evidence["max_ER"][1]), msg = "Genes without evidence ratios should have a NaN maximum")
+
+
+
+class test_runtime(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.sources = [self.data_path + x + ".json" for x in ("ABSREL", "BUSTED", "FEL", "FEL_multipartitions", "MEME", "RELAX", "SLAC", "v0.4.LEISR")]
+
+    def test_runtime_table(self):
+        self.assertEqual(451., Extractor(self.data_path + "ABSREL.json").extract_total_time())
+        self.assertIsNone(Extractor(self.data_path + "v0.4.LEISR.json").extract_total_time())
+        table = ExtractorCollection(self.sources).extract_runtime_table(cpus = 2)
+        self.assertEqual(["gene", "method", "sequences", "sites", "branches", "cpus", "seconds"], list(table.keys()))
+        self.assertTrue(np.array_equal([451., 165., 196., 325., 13821., 1137., 1178.], table["seconds"][:-1]), msg = "Bad total times")
+        self.assertTrue(np.isnan(table["seconds"][-1]), msg = "JSONs without timers should have NaN times")
+        self.assertTrue(np.array_equal([26., 877., 44., 2.], [table[x][0] for x in ("sequences", "sites", "branches", "cpus")]), msg = "Bad input dimensions")
+
+    def test_predict(self):
+        model = RuntimeModel(self.sources)
+        self.assertEqual(["ABSREL", "BUSTED", "FEL", "MEME", "RELAX", "SLAC"], model.methods)
+        self.assertTrue(np.array_equal([1, 1, 2, 1, 1, 1], model.nruns))
+        self.assertAlmostEqual(325., model.predict("fel", 13, 897, branches = 23), places = 4, msg = "Training run not reproduced")
+        predicted = model.predict(["FEL", "FEL", "MEME"], [10, 100, 10], [187, 187, 187])
+        self.assertEqual((3,), predicted.shape)
+        self.assertLess(predicted[0], predicted[1], msg = "Runtime should grow with the number of sequences")
+        self.assertAlmostEqual(0., model.slopes[0, 3], msg = "CPUs never varied, so should have no effect")
+        self.assertRaises(AssertionError, model.predict, "FUBAR", 10, 187)
+
+    def test_skipped(self):
+        model = RuntimeModel(self.sources + [self.data_path + "LEISR_deprecated.json"], cpus = [1] * len(self.sources) + [64])
+        self.assertEqual([self.data_path + "LEISR_deprecated.json"], [x[0] for x in model.skipped], msg = "Unparseable JSONs should be skipped")
+        self.assertTrue(np.allclose(RuntimeModel(self.sources).intercepts, model.intercepts), msg = "Skipped JSONs should not affect the model")
+
+    def test_plan(self):
+        model = RuntimeModel(ExtractorCollection(self.sources).extract_runtime_table())
+        jobs = (["MEME", "FEL", "FEL", "BUSTED"], [40, 40, 12, 20], [500, 500, 300, 400])
+        serial = model.plan(*jobs)
+        seconds = model.predict(*jobs)
+        self.assertTrue(np.array_equal(np.argsort(seconds), serial["order"]), msg = "Jobs should run shortest first")
+        self.assertAlmostEqual(seconds.sum(), serial["finish"].max(), msg = "A single worker runs the jobs back to back")
+        self.assertTrue(np.all(serial["worker"] == 0))
+        parallel = model.plan(*jobs, workers = 2)
+        self.assertTrue(np.allclose(parallel["finish"] - parallel["start"], seconds))
+        self.assertEqual({0, 1}, set(parallel["worker"]))
+        self.assertLess(parallel["finish"].max(), serial["finish"].max(), msg = "Two workers should finish sooner")
+
+
+
+class test_bulk(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.indir = tempfile.mkdtemp()
+        self.outdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.indir, "sub"))
+        shutil.copy(self.data_path + "FEL.json", self.indir)
+        shutil.copy(self.data_path + "BUSTED.json", self.indir)
+        shutil.copy(self.data_path + "ABSREL.json", os.path.join(self.indir, "sub"))
+
+    def tearDown(self):
+        shutil.rmtree(self.indir)
+        shutil.rmtree(self.outdir)
+
+    def test_per_file(self):
+        summary = bulk_export(self.indir, outdir = self.outdir, workers = 2)
+        self.assertEqual((summary["files"], summary["exported"]), (3, 2), msg = "Bad bulk export counts")
+        self.assertEqual(summary["skipped"][0][0], os.path.join(self.indir, "BUSTED.json"), msg = "BUSTED should be skipped")
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "sub", "ABSREL.csv")), msg = "Bulk export should mirror subdirectories")
+        Extractor(self.data_path + "FEL.json").extract_csv(os.path.join(self.outdir, "expected.csv"))
+        with open(os.path.join(self.outdir, "FEL.csv"), "r") as f, open(os.path.join(self.outdir, "expected.csv"), "r") as g:
+            self.assertEqual(f.read(), g.read(), msg = "Bulk CSV differs from extract_csv")
+
+    def test_combined(self):
+        combined = os.path.join(self.outdir, "all.csv")
+        summary = bulk_export(self.indir, combined = combined, workers = 1)
+        with open(combined, "r") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][:3], ["source", "site", "alpha"], msg = "Combined table should start with a source column")
+        self.assertEqual(len(rows) - 1, summary["rows"], msg = "Bad combined row count")
+        self.assertEqual(rows[-1][0], os.path.join(self.indir, "sub", "ABSREL.json"), msg = "Bad combined source column")
+        self.assertEqual(set([len(rows[0])]), set(len(row) for row in rows), msg = "Rows written before new columns appeared should be padded")
+        self.assertEqual(rows[1][rows[0].index("alpha")], str(Extractor(self.data_path + "FEL.json").extract_site_table()["alpha"][0]), msg = "Bad combined values")
+
+    def test_console(self):
+        self.assertEqual(bulk.main([self.indir, "-o", self.outdir, "-j", "1"]), 0, msg = "Console export failed")
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "FEL.csv")), msg = "Console export did not write CSV")
+
+
+
+class test_database(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.db = ResultsDatabase(":memory:")
+        self.sources = [self.data_path + "FEL.json", self.data_path + "MEME.json", self.data_path + "ABSREL.json"]
+        self.summary = self.db.ingest(self.sources, genes = ["geneA", "geneB", "geneC"])
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_ingest(self):
+        self.assertEqual(self.summary["ingested"], self.sources, msg = "Bad ingest")
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM sites")[0][0], 187 + 566, msg = "Bad number of site rows")
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM fits WHERE run_id = 1")[0][0], 2, msg = "Bad number of fit rows")
+
+    def test_incremental(self):
+        again = self.db.ingest(self.sources, genes = ["geneA", "geneB", "geneC"])
+        self.assertEqual((again["ingested"], again["unchanged"]), ([], self.sources), msg = "Unchanged files should be skipped")
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM runs")[0][0], 3, msg = "Unchanged files should not be duplicated")
+
+    def test_replace_changed(self):
+        tempdir = tempfile.mkdtemp()
+        path = os.path.join(tempdir, "geneD.FEL.json")
+        shutil.copy(self.data_path + "FEL.json", path)
+        self.db.ingest(path)
+        with open(path, "a") as f:
+            f.write("\n")
+        summary = self.db.ingest(path)
+        shutil.rmtree(tempdir)
+        self.assertEqual(summary["replaced"], [path], msg = "Changed file should be replaced")
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM sites WHERE gene = 'geneD'")[0][0], 187, msg = "Replaced file should not be duplicated")
+
+    def test_bad_path(self):
+        summary = self.db.ingest([self.data_path + "FEL.json", self.data_path + "nope.json"])
+        self.assertEqual(summary["unchanged"], [self.data_path + "FEL.json"], msg = "Good files should still be processed")
+        self.assertEqual([x[0] for x in summary["failed"]], [self.data_path + "nope.json"], msg = "Missing files should be recorded as failed")
+
+    def test_query_sites(self):
+        hits = self.db.query_sites(method = "MEME", max_pvalue = 0.05, fields = ["beta_pos"])
+        table = Extractor(self.data_path + "MEME.json").extract_site_table()
+        expected = table["site"][table["p-value"] <= 0.05]
+        self.assertTrue(np.array_equal(hits["site"], expected), msg = "Bad site query")
+        self.assertTrue(np.allclose(hits["beta_pos"], table["beta_pos"][expected - 1]), msg = "Bad site query fields")
+        self.assertEqual(len(self.db.query_sites(gene_range = ("geneA", "geneA"), sites = [1, 2])["site"]), 2, msg = "Bad gene range query")
+
+    def test_branches(self):
+        with open(self.data_path + "ABSREL.json", "r") as f:
+            raw = json.load(f)["branch attributes"]["0"]
+        rows = self.db.execute("SELECT node, original_name, pvalue, data FROM branches WHERE gene = 'geneC'")
+        self.assertEqual(sorted(raw.keys()), sorted(x[0] for x in rows), msg = "Bad branch rows")
+        for node, original_name, pvalue, data in rows:
+            scalars = dict((k, v) for k, v in raw[node].items() if not isinstance(v, (list, dict)))
+            self.assertDictEqual(scalars, json.loads(data), msg = "Branch data should hold all scalar attributes")
+            self.assertEqual((raw[node].get("original name"), raw[node]["Corrected P-value"]), (original_name, pvalue), msg = "Bad branch columns")
+        self.assertFalse("Rate Distributions" in rows[0][-1], msg = "List attributes should not be stored")
+
+    def test_indexes(self):
+        plan = self.db.execute("EXPLAIN QUERY PLAN SELECT * FROM sites WHERE method = 'MEME' AND pvalue < 0.05")
+        self.assertTrue("sites_method_pvalue" in plan[0][-1], msg = "P-value query should use its index")
+
+
+
+class test_extractor_parallel(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.serial = Extractor(self.data_path + "FEL_multipartitions.json")
+
+    def test_pools(self):
+        for pool in ("thread", "process"):
+            e = Extractor(self.data_path + "FEL_multipartitions.json", workers = 3, pool = pool)
+            self.assertEqual(self.serial.map_branch_attribute("Global MG94xREV"), e.map_branch_attribute("Global MG94xREV"), msg = "Parallel mapped trees differ from serial")
+            self.assertEqual(self.serial.extract_feature_tree("Nucleotide GTR", update_branch_lengths = "Global MG94xREV"), e.extract_feature_tree("Nucleotide GTR", update_branch_lengths = "Global MG94xREV"), msg = "Parallel feature trees differ from serial")
+            self.assertEqual(self.serial.extract_input_tree(original_names = True), e.extract_input_tree(original_names = True), msg = "Parallel input trees differ from serial")
+            self.assertEqual([0,1,2,3], list(e.map_branch_attribute("Global MG94xREV").keys()), msg = "Trees should be in partition order")
+            e.close()
+
+    def test_persistent_pool(self):
+        for pool in ("thread", "process"):
+            with Extractor(self.data_path + "FEL_multipartitions.json", workers = 2, pool = pool) as e:
+                first = e.map_branch_attribute("Global MG94xREV")
+                started = e._pool
+                self.assertIsNotNone(started, msg = "Pool should be kept after a call")
+                self.assertEqual(first, e.map_branch_attribute("Global MG94xREV"), msg = "Repeated parallel calls differ")
+                self.assertIs(started, e._pool, msg = "Pool should be reused")
+                self.assertIsNone(pickle.loads(pickle.dumps(e))._pool, msg = "Pools should not be pickled")
+            self.assertIsNone(e._pool, msg = "Pool should be shut down on exit")
+            self.assertEqual(first, e.map_branch_attribute("Global MG94xREV"), msg = "Closed Extractor should start a new pool")
+            e.close()
+
+    def test_arguments(self):
+        self.assertRaises(AssertionError, Extractor, self.data_path + "FEL.json", workers = 0)
+        self.assertRaises(AssertionError, Extractor, self.data_path + "FEL.json", pool = "gpu")
+
+    def test_shared_trees(self):
+        self.serial.input_tree[2] = self.serial.input_tree[0]
+        index = self.serial.extract_node_index()
+        self.assertIs(index[0], index[2], msg = "Identical trees should be parsed once")
+        self.assertIsNot(index[0], index[1], msg = "Distinct trees should not be shared")
+
+
+
+class test_extractor_frozen(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+
+    def test_no_side_effects(self):
+        e = Extractor(self.data_path + "FEL.json")
+        before = pickle.dumps((e.json, e.branch_attributes, e.attribute_names, sorted(e.__dict__)))
+        timers = e.extract_timers()
+        self.assertEqual(timers, e.extract_timers(), msg = "Repeated timers differ")
+        e.extract_csv(io.StringIO())
+        self.assertEqual(before, pickle.dumps((e.json, e.branch_attributes, e.attribute_names, sorted(e.__dict__))), msg = "Extraction modified the Extractor")
+
+    def test_frozen(self):
+        e = Extractor(self.data_path + "ABSREL.json", frozen = True)
+        self.assertTrue(e.frozen)
+        self.assertFalse(Extractor(self.data_path + "ABSREL.json").frozen)
+        with self.assertRaises(AttributeError):
+            e.branch_attributes = {}
+        with self.assertRaises(AttributeError):
+            del e.json
+        self.assertFalse(e.extract_node_index().parent.flags.writeable, msg = "Frozen node index should be read-only")
+        self.assertFalse(e.extract_branch_columns().column("Corrected P-value")[0].flags.writeable, msg = "Frozen columns should be read-only")
+        reference = Extractor(self.data_path + "ABSREL.json")
+        self.assertEqual(reference.extract_absrel_tree(original_names = True), e.extract_absrel_tree(original_names = True), msg = "Frozen Extractor gives a different tree")
+        self.assertTrue(pickle.loads(pickle.dumps(e)).frozen, msg = "Frozen Extractor should stay frozen when pickled")
+
+    def test_read_only_columns(self):
+        e = Extractor(self.data_path + "ABSREL.json")
+        values, missing = e.extract_branch_attribute_array("Corrected P-value")
+        self.assertFalse(values.flags.writeable or missing.flags.writeable, msg = "Attribute arrays should be read-only")
+        with self.assertRaises(ValueError):
+            e.extract_branch_columns().column("Corrected P-value")[0][0] = 0.
+        self.assertTrue(np.array_equal(values, e.extract_branch_attribute_array("Corrected P-value")[0], equal_nan = True), msg = "Columns were modified through a returned array")
+        e.extract_branch_columns().values.clear()
+        self.assertTrue("Corrected P-value" in e.extract_branch_columns().values, msg = "Columns were modified through a returned object")
+
+    def test_frozen_copies(self):
+        e = Extractor(self.data_path + "BUSTED.json", frozen = True)
+        reference = Extractor(self.data_path + "BUSTED.json")
+        e.extract_model_component("Unconstrained model", "Rate Distributions").clear()
+        e.extract_model_rate_distributions("Unconstrained model").clear()
+        e.extract_site_logl()["constrained"][0] = 0.
+        e.extract_evidence_ratios()["constrained"][0] = 0.
+        self.assertEqual(reference.extract_model_rate_distributions("Unconstrained model"), e.extract_model_rate_distributions("Unconstrained model"), msg = "Frozen Extractor returned its shared rate distributions")
+        self.assertEqual(reference.extract_site_logl(), e.extract_site_logl(), msg = "Frozen Extractor returned its shared site log likelihoods")
+        self.assertEqual(reference.extract_evidence_ratios(), e.extract_evidence_ratios(), msg = "Frozen Extractor returned its shared evidence ratios")
+
+    def test_threads(self):
+        from multiprocessing.pool import ThreadPool
+        for frozen in (False, True):
+            e = Extractor(self.data_path + "FEL_multipartitions.json", frozen = frozen)
+            jobs = [("Global MG94xREV", True), ("Nucleotide GTR", False)] * 8
+            reference = [Extractor(self.data_path + "FEL_multipartitions.json").extract_model_tree(model, original_names = names) for model, names in jobs]
+            pool = ThreadPool(4)
+            try:
+                trees = pool.map(lambda job: e.extract_model_tree(job[0], original_names = job[1]), jobs)
+            finally:
+                pool.close()
+                pool.join()
+            self.assertEqual(reference, trees, msg = "Concurrent queries differ from serial queries")
+
+
+
+
+class test_lazy_import(unittest.TestCase):
+
+    ### Heavy dependencies must not be imported at all; import times are measured by benchmarks/import_time.py instead, as wall-clock budgets are unreliable on loaded machines
+    def imported_modules(self, statement):
+        import subprocess
+        import sys
+        code = "import sys; " + statement + "; print(' '.join(sorted(sys.modules)))"
+        return subprocess.check_output([sys.executable, "-c", code]).decode().split()
+
+    def test_import_package(self):
+        modules = self.imported_modules("import phyphy")
+        for heavy in ("phyphy.extractor", "pandas", "pyarrow", "ete3", "numpy"):
+            self.assertNotIn(heavy, modules, msg = "Importing phyphy should not import " + heavy)
+
+    def test_import_extractor(self):
+        modules = self.imported_modules("from phyphy import Extractor")
+        for heavy in ("pandas", "pyarrow", "ete3", "sqlite3", "multiprocessing"):
+            self.assertNotIn(heavy, modules, msg = "Importing Extractor should not import " + heavy)
+
+    def test_lazy_names(self):
+        import phyphy
+        self.assertIs(phyphy.Extractor, phyphy.extractor.Extractor, msg = "Lazy name does not resolve to its module")
+        self.assertTrue(set(["Extractor", "NodeIndex", "bulk_export", "bulk"]) <= set(dir(phyphy)), msg = "Lazy names should be listed")
+        self.assertRaises(AttributeError, getattr, phyphy, "not_a_name")
+
+
+
+
+class test_extractor_csv_stream(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = "tests/test_data/"
+        self.slac = Extractor(self.data_path + "SLAC.json")
+        self.slac.extract_csv("temp.csv")
+        with open("temp.csv", "r") as f:
+            self.expected = f.read()
+        os.remove("temp.csv")
+
+    def test_file_like(self):
+        buffer = io.StringIO()
+        self.slac.extract_csv(buffer)
+        self.assertEqual(buffer.getvalue(), self.expected, msg = "CSV written to file-like object differs")
+        self.assertFalse(buffer.closed, msg = "File-like targets should not be closed")
+
+    def test_gzip(self):
+        self.slac.extract_csv("temp.csv.gz")
+        with gzip.open("temp.csv.gz", "rt") as f:
+            content = f.read()
+        os.remove("temp.csv.gz")
+        self.assertEqual(content, self.expected, msg = "Gzipped CSV differs")
+
+    def test_quoting(self):
+        buffer = io.StringIO()
+        write_delimited(buffer, ["node", "value"], [["a,b", 1]])
+        self.assertEqual(buffer.getvalue(), 'node,value\n"a,b",1', msg = "Fields containing the delimiter should be quoted")
+
+    def test_long_delim(self):
+        buffer = io.StringIO()
+        self.slac.extract_csv(buffer, delim = "::")
+        self.assertEqual(buffer.getvalue(), self.expected.replace(",", "::"), msg = "Multi-character delimiters should be written as they are")
+        buffer = io.StringIO()
+        write_delimited(buffer, ["node"], [])
+        self.assertEqual(buffer.getvalue(), "node", msg = "Header-only output should have no trailing newline")
+
+
+
 class test_extractor_csv(unittest.TestCase):
 
 